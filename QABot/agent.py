@@ -2,20 +2,68 @@
 from utils import *
 from config import *
 from prompt import *
+from entity_matcher import get_entity_matcher, aget_entity_matcher
+from entity_linker import get_entity_linker, aget_entity_linker
+from intent_index import get_intent_index, mask_query
+from symptom_index import get_symptom_index, aget_symptom_index
+from tool_router import get_tool_router
+from streaming import FINAL_ANSWER_PREFIX, emit_status, stream_callbacks
 import urllib.parse
+import contextvars
+import asyncio
+import aiohttp
+from bs4 import BeautifulSoup
 
 import os
 from langchain.chains import LLMChain, LLMRequestsChain
+from langchain.chains.llm_requests import DEFAULT_HEADERS as SEARCH_HEADERS
 from langchain.prompts import PromptTemplate
 from langchain.vectorstores.chroma import Chroma
-from langchain.vectorstores.faiss import FAISS
 from langchain.schema import Document
 from langchain.agents import ZeroShotAgent, AgentExecutor, Tool
 from langchain.memory import ConversationBufferMemory
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser
 
+# 当前请求的用户问题：工具在启动时只创建一次，各请求（线程）通过上下文变量拿到自己的问题
+_current_query = contextvars.ContextVar('current_query', default='')
+# 当前请求调用过的工具名，供答案缓存按工具失效
+_used_tools = contextvars.ContextVar('used_tools', default=None)
+# 工具的输出是否就是最终答案（向量路由直接调用工具时），是则流式输出工具中大模型的token
+_stream_tool_output = contextvars.ContextVar('stream_tool_output', default=False)
+# 当前请求的命名实体识别结果{问题: 识别结果}：路由的graph_func没有答案、退回ReAct后Agent再次选择graph_func时不重复识别
+_ner_results = contextvars.ContextVar('ner_results', default=None)
+
+# 检索结果为空时填入提示词的内容
+NO_RESULT = '没有查到'
+# 可以推测执行的工具：检索阶段不调用大模型作答，结果为空时可以换另一路
+SPECULATIVE_TOOLS = ('graph_func', 'retrival_func')
+# AgentExecutor达到max_iterations后（early_stopping_method='force'）返回的固定输出，不是真正的答案
+AGENT_STOPPED_OUTPUT = 'Agent stopped due to iteration limit or time limit.'
+
+AGENT_PREFIX = '''请用中文，尽你所能回答以下的问题。
+
+重要规则：
+1. 当你有足够的信息来回答问题时，必须使用 "Final Answer: [你的答案]" 格式直接回答，不要再调用工具。
+2. 只有当你需要使用工具获取更多信息时，才使用 "Action: [工具名称]" 格式。
+3. 不要重复调用同一个工具。
+4. 对于简单的问候，使用 generic_func 工具获取答案后，直接给出 Final Answer。
+
+回答格式：
+- 如果需要使用工具：Thought: [思考] Action: [工具名] Action Input: [输入]
+- 如果可以直接回答：Thought: [思考] Final Answer: [答案]
+
+您可以使用以下的工具：'''
+
+AGENT_SUFFIX = """Begin!
+
+Question: {input}
+Thought: {agent_scratchpad}"""
+
 
 class Agent():
+    """问答Agent：向量库、模型客户端、各工具的链和ZeroShotAgent在构造时创建一次，
+    多个请求并发共享；每次请求只创建记忆和AgentExecutor"""
+
     def __init__(self):
         # 定义向量库持久化目录
         self.db_path = os.path.join(os.path.dirname(__file__), './data/db/')
@@ -23,6 +71,42 @@ class Agent():
         self.embeddings = get_embeddings_model()
         # 初始化Chroma向量库
         self.vdb = self.init_chroma_db()
+        # 初始化大模型客户端和各工具使用的链
+        self.llm = get_llm_model()
+        self.init_chains()
+        # 初始化工具和Agent
+        self.tools = self.init_tools()
+        self.agent = self.init_agent()
+
+    def init_chains(self):
+        """创建各工具使用的链，链本身不保存请求状态，可并发复用"""
+        verbose = os.getenv('VERBOSE')
+        self.generic_chain = LLMChain(llm=self.llm, prompt=PromptTemplate.from_template(GENERIC_PROMPT_TPL),
+                                      verbose=verbose)
+        self.retrival_chain = LLMChain(llm=self.llm, prompt=PromptTemplate.from_template(RETRIVAL_PROMPT_TPL),
+                                       verbose=verbose)
+        self.graph_chain = LLMChain(llm=self.llm, prompt=PromptTemplate.from_template(GRAPH_PROMPT_TPL),
+                                    verbose=verbose)
+        self.search_chain = LLMRequestsChain(
+            llm_chain=LLMChain(llm=self.llm, prompt=PromptTemplate.from_template(SEARCH_PROMPT_TPL), verbose=verbose),
+            requests_key='query_result'
+        )
+        self.parse_tools_chain = LLMChain(llm=self.llm, prompt=PromptTemplate.from_template(PARSE_TOOLS_PROMPT_TPL),
+                                          verbose=verbose)
+
+        # 命名实体识别
+        response_schemas = [
+            ResponseSchema(type='list', name='disease', description='疾病名称实体'),
+            ResponseSchema(type='list', name='symptom', description='疾病症状实体'),
+            ResponseSchema(type='list', name='drug', description='药品名称实体'),
+        ]
+        self.ner_output_parser = StructuredOutputParser(response_schemas=response_schemas)
+        ner_prompt = PromptTemplate(
+            template=NER_PROMPT_TPL,
+            partial_variables={'format_instructions': structured_output_parser(response_schemas)},
+            input_variables=['query']
+        )
+        self.ner_chain = LLMChain(llm=self.llm, prompt=ner_prompt, verbose=verbose)
 
     def init_chroma_db(self):
         """
@@ -62,172 +146,216 @@ class Agent():
 
     def generic_func(self, x, query):
         # print(f'query{query}')
-        prompt = PromptTemplate.from_template(GENERIC_PROMPT_TPL)
-        llm_chain = LLMChain(
-            llm=get_llm_model(),
-            prompt=prompt,
-            verbose=os.getenv("VERBOSE")
-        )
-        return llm_chain.run(query)
+        return self.generic_chain.run(query, callbacks=self.tool_callbacks())
 
-    def retrival_func(self, x, query):
-        # 召回并过滤文档（k=5表示返回最相似的5条）
-        documents = self.vdb.similarity_search_with_relevance_scores(query, k=5)
+    async def ageneric_func(self, x, query):
+        return await self.generic_chain.arun(query, callbacks=self.tool_callbacks())
+
+    @staticmethod
+    def retrival_inputs(query, documents):
+        """过滤召回的文档并拼成提示词输入"""
         # 打印查询结果，方便调试（替换原来的print+exit）
         # print(f"\n原始查询结果（文档+相似度得分）：{documents}")
 
         # 过滤相似度得分>0.7的文档
         query_result = [doc[0].page_content for doc in documents if doc[1] > 0.5]
         # print(f"\n过滤后的有效文档：{query_result}")
-
-        # 填充答案
-        prompt = PromptTemplate.from_template(RETRIVAL_PROMPT_TPL)
-        retrival_chain = LLMChain(
-            llm=get_llm_model(),
-            prompt=prompt,
-            verbose=os.getenv('VERBOSE')
-        )
-        inputs = {
+        return {
             'query': query,
-            'query_result': '\n\n'.join(query_result) if len(query_result) else '没有查到'
+            'query_result': '\n\n'.join(query_result) if len(query_result) else NO_RESULT
         }
-        return retrival_chain.run(inputs)
 
-    def graph_func(self, x, query):
-        # 命名实体识别
-        response_schemas = [
-            ResponseSchema(type='list', name='disease', description='疾病名称实体'),
-            ResponseSchema(type='list', name='symptom', description='疾病症状实体'),
-            ResponseSchema(type='list', name='drug', description='药品名称实体'),
-        ]
-        output_parser = StructuredOutputParser(response_schemas=response_schemas)
-        format_instructions = structured_output_parser(response_schemas)
+    def retrival_func(self, x, query):
+        # 召回并过滤文档（k=5表示返回最相似的5条）
+        documents = self.vdb.similarity_search_with_relevance_scores(query, k=5)
+        # 填充答案
+        return self.retrival_chain.run(self.retrival_inputs(query, documents), callbacks=self.tool_callbacks())
 
-        ner_prompt = PromptTemplate(
-            template=NER_PROMPT_TPL,
-            partial_variables={'format_instructions': format_instructions},
-            input_variables=['query']
-        )
+    async def aretrival_evidence(self, query):
+        """检索阶段：只召回文档，不调用大模型"""
+        documents = await self.vdb.asimilarity_search_with_relevance_scores(query, k=5)
+        return self.retrival_inputs(query, documents)
 
-        ner_chain = LLMChain(
-            llm=get_llm_model(),
-            prompt=ner_prompt,
-            verbose=os.getenv('VERBOSE')
-        )
+    async def aretrival_func(self, x, query):
+        return await self.retrival_chain.arun(await self.aretrival_evidence(query),
+                                              callbacks=self.tool_callbacks())
 
-        result = ner_chain.run({
+    def llm_ner(self, query):
+        """LLM命名实体识别，词典匹配不到任何实体时作为兜底"""
+        result = self.ner_chain.run({
             'query': query
         })
+        return self.ner_output_parser.parse(result)
 
-        ner_result = output_parser.parse(result)
-        # print(ner_result)
-        # exit()
-
-
-        # 命名实体识别结果，填充模板
+    async def allm_ner(self, query):
+        result = await self.ner_chain.arun({
+            'query': query
+        })
+        return self.ner_output_parser.parse(result)
+
+    def graph_ner(self, query):
+        """命名实体识别：优先用图谱名称词典匹配，匹配不到时再调用LLM，同一请求内只识别一次"""
+        ner_results = _ner_results.get()
+        if ner_results is not None and query in ner_results:
+            return ner_results[query]
+        ner_result = get_entity_matcher().extract(query)
+        if not any(ner_result.values()):
+            # LLM抽取的名称不一定与图谱一致，先链接到标准名称，链接不上的不再查询
+            ner_result = get_entity_linker().link_entities(self.llm_ner(query))
+        if ner_results is not None:
+            ner_results[query] = ner_result
+        return ner_result
+
+    async def agraph_ner(self, query, use_llm_ner=True):
+        """graph_ner的异步版本；use_llm_ner=False且词典匹配不到实体时返回None，不记入本次请求的结果"""
+        ner_results = _ner_results.get()
+        if ner_results is not None and query in ner_results:
+            return ner_results[query]
+        ner_result = (await aget_entity_matcher()).extract(query)
+        if not any(ner_result.values()):
+            if not use_llm_ner:
+                return None
+            ner_result = (await aget_entity_linker()).link_entities(await self.allm_ner(query))
+        if ner_results is not None:
+            ner_results[query] = ner_result
+        return ner_result
+
+    @staticmethod
+    def graph_candidates(ner_result):
+        """槽位已填充的模板才可能被选中；多个症状时用症状索引联合诊断，不再逐个症状罗列全部疾病"""
+        symptoms = ner_result.get('symptom') or []
+        multi_symptom = len(symptoms) > 1
+        candidates = [key for key, template in GRAPH_TEMPLATE.items()
+                      if ner_result.get(template['slots'][0]) and not (multi_symptom and key == 'symptom')]
+        return candidates, symptoms if multi_symptom else []
+
+    def graph_templates(self, ner_result, candidates, query_vector):
+        """计算问题相似度，筛选最相关的模板意图，并用命名实体识别结果填充选中的模板"""
+        intent_keys = get_intent_index(self.embeddings).rank(query_vector, candidates) if candidates else []
+        # print(intent_keys)
         graph_templates = []
-        for key, template in GRAPH_TEMPLATE.items():
+        for key in intent_keys:
+            template = GRAPH_TEMPLATE[key]
             slot = template['slots'][0]
-            slot_values = ner_result[slot]
-            # print(slot_values)
-            # exit()
-            for value in slot_values:
-                graph_templates.append({
-                    'question': replace_token_in_string(template['question'], {slot: value}),
-                    'cypher': replace_token_in_string(template['cypher'], {slot: value}),
-                    'answer': replace_token_in_string(template['answer'], {slot: value}),
-                })
-            # print(graph_templates)
-            # exit()
-        if not graph_templates:
-            return
-
-        # 计算问题相似度，筛选最相关问题
-        graph_documents = [
-            Document(page_content=template['question'], metadata=template)
-            for template in graph_templates
-        ]
-        # print(graph_documents)
-        # exit()
-        db = FAISS.from_documents(graph_documents, get_embeddings_model())
-        graph_documents_filter = db.similarity_search_with_relevance_scores(query, k=5)
-        # print(graph_documents_filter)
+            for value in ner_result[slot]:
+                graph_templates.append(render_graph_template(key, template, {slot: value}))
+        return graph_templates
 
-        # 执行CQL，拿到结果
+    def graph_inputs(self, query, symptoms, graph_templates, results, symptom_index=None):
+        """把图谱查询结果（和多症状诊断结果）拼成提示词输入"""
         query_result = []
-        neo4j_conn = get_neo4j_conn()
-        # result = neo4j_conn.run("CALL dbms.components() YIELD versions, name RETURN name, versions[0] as version").data()
-        # if result:
-        #     print(f"✅ Neo4j连接成功（py2neo）！")
-        #     print(f"📌 数据库信息：{result[0]['name']} {result[0]['version']}")
-        # print(neo4j_conn)
-        for document in graph_documents_filter:
-            question = document[0].page_content
-            cypher = document[0].metadata['cypher']
-            answer = document[0].metadata['answer']
-            # print(cypher)
-            try:
-                result = neo4j_conn.run(cypher).data()
-                if result and any(value for value in result[0].values()):
-                    answer_str = replace_token_in_string(answer, list(result[0].items()))
-                    # print(answer_str)
-                    # exit()
-                    query_result.append(f'问题: {question}\n答案: {answer_str}')
-            except:
-                pass
+        if symptoms:
+            query_result.append(self.diagnose_symptoms(symptoms, symptom_index))
+        for template, result in zip(graph_templates, results):
+            question = template['question']
+            answer = template['answer']
+            if isinstance(result, Exception):
+                print(f'图谱查询失败：{question}，错误：{str(result)}')
+                continue
+            if result and any(value for value in result[0].values()):
+                values = {key: '' if value is None else str(value) for key, value in result[0].items()}
+                answer_str = replace_token_in_string(answer, values)
+                query_result.append(f'问题: {question}\n答案: {answer_str}')
         print(query_result)
         # exit()
-
-        # 总结答案
-        prompt = PromptTemplate.from_template(GRAPH_PROMPT_TPL)
-        graph_chain = LLMChain(
-            llm=get_llm_model(),
-            prompt=prompt,
-            verbose=os.getenv('VERBOSE')
-        )
-        inputs = {
+        return {
             'query': query,
-            'query_result': "\n\n".join(query_result) if len(query_result) else "没有查到"
+            'query_result': "\n\n".join(query_result) if len(query_result) else NO_RESULT
         }
-        return graph_chain.run(inputs)
 
-    def search_func(self, query):
-        # // 网络搜索的模块
-        prompt = PromptTemplate.from_template(SEARCH_PROMPT_TPL)
-        llm_chain = LLMChain(
-            llm=get_llm_model(),
-            prompt=prompt,
-            verbose=os.getenv('VERBOSE')
-        )
-        llm_request_chain = LLMRequestsChain(
-            llm_chain=llm_chain,
-            requests_key='query_result'
-        )
+    def graph_func(self, x, query):
+        # 命名实体识别
+        ner_result = self.graph_ner(query)
+        # print(ner_result)
+        # exit()
+
+        candidates, symptoms = self.graph_candidates(ner_result)
+        if not candidates and not symptoms:
+            return
+
+        # 模板向量已预先计算，这里只对遮盖实体后的问题做一次嵌入
+        query_vector = self.embeddings.embed_query(mask_query(query, ner_result)) if candidates else None
+        graph_templates = self.graph_templates(ner_result, candidates, query_vector)
+
+        # 执行查询，拿到结果：Neo4j后端把选中的模板合并为一次网络往返，memory后端在进程内计算
+        results = get_graph_backend().run_templates(graph_templates)
+
+        # 总结答案
+        return self.graph_chain.run(self.graph_inputs(query, symptoms, graph_templates, results),
+                                    callbacks=self.tool_callbacks())
+
+    async def agraph_evidence(self, query, use_llm_ner=True):
+        """检索阶段：实体识别 + 图谱查询，不调用大模型作答；没有可用模板时返回None
+
+        use_llm_ner=False时只用词典匹配，匹配不到实体直接返回None（推测执行时不为可能被取消的分支付费调用大模型）
+        """
+        ner_result = await self.agraph_ner(query, use_llm_ner=use_llm_ner)
+        if ner_result is None:
+            return None
+
+        candidates, symptoms = self.graph_candidates(ner_result)
+        if not candidates and not symptoms:
+            return None
+
+        query_vector = await aembed_query(self.embeddings, mask_query(query, ner_result)) if candidates else None
+        graph_templates = self.graph_templates(ner_result, candidates, query_vector)
+        results = await (await aget_graph_backend()).arun_templates(graph_templates)
+        symptom_index = await aget_symptom_index() if symptoms else None
+        return self.graph_inputs(query, symptoms, graph_templates, results, symptom_index)
+
+    async def agraph_func(self, x, query):
+        inputs = await self.agraph_evidence(query)
+        if inputs is None:
+            return
+        return await self.graph_chain.arun(inputs, callbacks=self.tool_callbacks())
+
+    def diagnose_symptoms(self, symptoms, symptom_index=None):
+        """多症状联合诊断，返回与模板结果相同格式的问答文本；异步路径传入已加载的症状索引"""
+        diseases, full_matches = (symptom_index or get_symptom_index()).diagnose(symptoms)
+        question = f"同时出现【{'、'.join(symptoms)}】症状可能是什么病？"
+        if not diseases:
+            return f'问题: {question}\n答案: 没有查到'
+        answer_str = '、'.join(f"{disease['name']}（符合{'、'.join(disease['matched'])}）" for disease in diseases)
+        if full_matches:
+            answer_str = f'同时符合全部症状的疾病共{full_matches}种，最可能的是：' + answer_str
+        else:
+            answer_str = '没有同时符合全部症状的疾病，符合部分症状的有：' + answer_str
+        return f'问题: {question}\n答案: {answer_str}'
+
+    @staticmethod
+    def search_inputs(query):
         encoded_query = urllib.parse.quote(query)
         baidu_url = f'https://www.baidu.com/s?wd={encoded_query}&rn=10'
         c360_url = f'https://www.so.com/s?q='+query.replace(' ','+')
-        inputs = {
+        return {
             'query': query,
             # 'url': 'https://www.google.com/search?q=' + query.replace(' ', '+')
             'url': c360_url
         }
-        return llm_request_chain.run(inputs)
+
+    def search_func(self, query):
+        # // 网络搜索的模块
+        return self.search_chain.run(self.search_inputs(query), callbacks=self.tool_callbacks())
+
+    async def asearch_func(self, query):
+        # LLMRequestsChain只有同步实现，这里用aiohttp抓取页面，再按同样的方式截取正文交给大模型
+        inputs = self.search_inputs(query)
+        async with aiohttp.ClientSession(headers=SEARCH_HEADERS) as session:
+            async with session.get(inputs['url']) as response:
+                html = await response.text()
+        text = BeautifulSoup(html, 'html.parser').get_text()[:self.search_chain.text_length]
+        return await self.search_chain.llm_chain.arun(query=query, query_result=text,
+                                                      callbacks=self.tool_callbacks())
 
 
     def parse_tools(self, tools, query):
-        prompt = PromptTemplate.from_template(PARSE_TOOLS_PROMPT_TPL)
-        llm_chain = LLMChain(
-            llm=get_llm_model(),
-            prompt=prompt,
-            verbose=os.getenv('VERBOSE')
-        )
         # 拼接工具描述参数
         tools_description = ''
         for tool in tools:
             tools_description += tool.name + ':' + tool.description + '\n'
         # print(tools_description)
         # exit()
-        result = llm_chain.invoke({'tools_description': tools_description, 'query': query})
+        result = self.parse_tools_chain.invoke({'tools_description': tools_description, 'query': query})
         # print(result)
         # exit()
         # 解析工具函数
@@ -236,70 +364,271 @@ class Agent():
                 return tool
         return tools[0]
 
-    def query(self, query):
-        tools = [
+    @staticmethod
+    def tool_callbacks():
+        """工具输出即最终答案且有订阅方时，返回流式输出回调"""
+        return stream_callbacks() if _stream_tool_output.get() else None
+
+    @staticmethod
+    def record_tool(name):
+        """记录当前请求用到的工具"""
+        used = _used_tools.get()
+        if used is not None:
+            used.append(name)
+
+    @staticmethod
+    def track_tool(name, func):
+        """包装工具函数，记录当前请求用到的工具"""
+        def wrapper(x):
+            Agent.record_tool(name)
+            return func(x)
+        return wrapper
+
+    @staticmethod
+    def track_tool_async(name, coroutine):
+        """track_tool的异步版本，供AgentExecutor.arun调用"""
+        async def wrapper(x):
+            Agent.record_tool(name)
+            return await coroutine(x)
+        return wrapper
+
+    def init_tools(self):
+        """创建工具：问题不再被闭包捕获，执行时从上下文变量读取当前请求的问题"""
+        return [
             Tool.from_function(
                 name="generic_func",
-                func=lambda x: self.generic_func(x, query),
+                func=self.track_tool("generic_func", lambda x: self.generic_func(x, _current_query.get())),
+                coroutine=self.track_tool_async("generic_func", lambda x: self.ageneric_func(x, _current_query.get())),
                 description="可以解答通用领域的知识，例如打招呼、问你是谁等问题"
             ),
             Tool.from_function(
                 name="retrival_func",
-                func=lambda x: self.retrival_func(x, query),
+                func=self.track_tool("retrival_func", lambda x: self.retrival_func(x, _current_query.get())),
+                coroutine=self.track_tool_async("retrival_func", lambda x: self.aretrival_func(x, _current_query.get())),
                 description="用于回答寻医问药网相关问题"
             ),
             Tool(
                 name="graph_func",
-                func=lambda x: self.graph_func(x, query),
+                func=self.track_tool("graph_func", lambda x: self.graph_func(x, _current_query.get())),
+                coroutine=self.track_tool_async("graph_func", lambda x: self.agraph_func(x, _current_query.get())),
                 description="用于回答疾病、症状、药物等医疗相关问题"
             ),
             Tool(
                 name="search_func",
-                func=self.search_func,
+                func=self.track_tool("search_func", self.search_func),
+                coroutine=self.track_tool_async("search_func", self.asearch_func),
                 description="其他工具没有正确答案时，通过搜索引擎回答通用类问题"
             )
         ]
-        # tool = self.parse_tools(tools,query=query)
-        # return tool.func(query)
-
-        prefix = '''请用中文，尽你所能回答以下的问题。
-
-重要规则：
-1. 当你有足够的信息来回答问题时，必须使用 "Final Answer: [你的答案]" 格式直接回答，不要再调用工具。
-2. 只有当你需要使用工具获取更多信息时，才使用 "Action: [工具名称]" 格式。
-3. 不要重复调用同一个工具。
-4. 对于简单的问候，使用 generic_func 工具获取答案后，直接给出 Final Answer。
-
-回答格式：
-- 如果需要使用工具：Thought: [思考] Action: [工具名] Action Input: [输入]
-- 如果可以直接回答：Thought: [思考] Final Answer: [答案]
-
-您可以使用以下的工具：'''
-        suffix = """Begin!
-
-Question: {input}
-Thought: {agent_scratchpad}"""
 
+    def init_agent(self):
+        """创建ZeroShotAgent，提示词和链只构建一次"""
         agent_prompt = ZeroShotAgent.create_prompt(
-            tools=tools,
-            prefix=prefix,
-            suffix=suffix,
+            tools=self.tools,
+            prefix=AGENT_PREFIX,
+            suffix=AGENT_SUFFIX,
             input_variables=['input', 'agent_scratchpad', 'chat_history']
         )
+        llm_chain = LLMChain(llm=self.llm, prompt=agent_prompt)
+        return ZeroShotAgent(llm_chain=llm_chain)
+
+    def warmup(self):
+        """预加载图谱问答用到的本地索引，并检查图谱后端连接，避免第一个请求承担加载耗时"""
+        get_entity_matcher()
+        get_entity_linker()
+        get_symptom_index()
+        get_intent_index(self.embeddings)
+        get_tool_router(self.embeddings, self.tools)
+        if os.getenv('GRAPH_BACKEND', 'neo4j').lower() == 'neo4j':
+            try:
+                get_neo4j_pool().verify()
+            except Exception as e:
+                print(f'Neo4j连接检查失败：{str(e)}')
 
-        llm_chain = LLMChain(llm=get_llm_model(), prompt=agent_prompt)
-        agent = ZeroShotAgent(llm_chain=llm_chain)
-        memory = ConversationBufferMemory(memory_key='chat_history')
+    def route(self, query, query_vector=None):
+        """向量路由：问题与工具质心足够接近时直接调用该工具，返回答案；置信度不足时返回None
+
+        query_vector为调用方已计算的问题向量（如答案缓存查找时），避免重复嵌入
+        """
+        router = get_tool_router(self.embeddings, self.tools)
+        if query_vector is None:
+            query_vector = self.embeddings.embed_query(query)
+        name, score = router.route(query_vector)
+        if name is None:
+            print(f'路由置信度不足（{score:.3f}），交给Agent选择工具')
+            return None
+        print(f'路由到{name}（{score:.3f}）')
+        emit_status(f'正在调用工具：{name}')
+        tool = next(tool for tool in self.tools if tool.name == name)
+        token = _stream_tool_output.set(True)
+        try:
+            return tool.func(query)
+        finally:
+            _stream_tool_output.reset(token)
+
+    async def aroute(self, query, query_vector=None):
+        """route的异步版本"""
+        router = get_tool_router(self.embeddings, self.tools)
+        if query_vector is None:
+            query_vector = await aembed_query(self.embeddings, query)
+        name, score = router.route(query_vector)
+        if name is None:
+            print(f'路由置信度不足（{score:.3f}），交给Agent选择工具')
+            return None
+        print(f'路由到{name}（{score:.3f}）')
+        return await self.acall_tool(name, query)
+
+    async def acall_tool(self, name, query):
+        """直接调用工具，工具的输出即最终答案"""
+        emit_status(f'正在调用工具：{name}')
+        tool = next(tool for tool in self.tools if tool.name == name)
+        token = _stream_tool_output.set(True)
+        try:
+            return await tool.coroutine(query)
+        finally:
+            _stream_tool_output.reset(token)
+
+    async def evidence_or_none(self, name, query, use_llm_ner=False):
+        """执行一路检索阶段，出错时返回None，不影响另一路"""
+        try:
+            if name == 'graph_func':
+                return await self.agraph_evidence(query, use_llm_ner=use_llm_ner)
+            return await self.aretrival_evidence(query)
+        except Exception as e:
+            print(f'{name}检索失败：{str(e)}')
+            return None
+
+    async def aspeculate(self, query, query_vector=None):
+        """推测执行：路由决策的同时并发执行图谱和向量库两路检索阶段
+
+        路由到其中一路时优先采用它的结果；置信度不足时按路由得分从高到低采用第一份非空的结果。
+        采用后取消其余分支，只用选中的链调用一次大模型作答；两路都为空时返回None交给ReAct Agent
+        """
+        branches = {name: asyncio.create_task(self.evidence_or_none(name, query)) for name in SPECULATIVE_TOOLS}
+
+        def cancel(keep=None):
+            for name, task in branches.items():
+                if name != keep and not task.done():
+                    task.cancel()
+
+        try:
+            router = get_tool_router(self.embeddings, self.tools)
+            if query_vector is None:
+                query_vector = await aembed_query(self.embeddings, query)
+            name, score = router.route(query_vector)
+            if name is not None and name not in branches:
+                # 路由到不需要检索的工具，两路检索都作废
+                cancel()
+                print(f'路由到{name}（{score:.3f}）')
+                return await self.acall_tool(name, query)
+
+            scores = router.scores(query_vector)
+            order = sorted(branches, key=lambda branch: (branch != name, -scores.get(branch, 0.0)))
+            for branch in order:
+                inputs = await branches[branch]
+                if inputs is None and branch == 'graph_func' and name == branch:
+                    # 已确定路由到图谱，不再是推测执行，词典匹配不到实体时再用大模型识别
+                    inputs = await self.evidence_or_none(branch, query, use_llm_ner=True)
+                if inputs is None or inputs['query_result'] == NO_RESULT:
+                    print(f'{branch}没有检索到结果')
+                    continue
+                cancel(keep=branch)
+                print(f'采用{branch}的检索结果（{scores.get(branch, 0.0):.3f}）')
+                emit_status(f'正在调用工具：{branch}')
+                self.record_tool(branch)
+                chain = self.graph_chain if branch == 'graph_func' else self.retrival_chain
+                return await chain.arun(inputs, callbacks=stream_callbacks())
+            print('两路检索都没有结果，交给Agent选择工具')
+            return None
+        finally:
+            cancel()
+
+    def query(self, query, query_vector=None):
+        return self.query_with_tools(query, query_vector)[0]
+
+    async def aquery(self, query, query_vector=None):
+        return (await self.aquery_with_tools(query, query_vector))[0]
+
+    def query_with_tools(self, query, query_vector=None):
+        """回答问题，返回(答案, 本次调用过的工具名列表, 是否正常完成)
+
+        正常完成指路由的工具给出了答案，或ReAct Agent给出了Final Answer；
+        达到迭代上限等兜底输出不算完成，调用方不应缓存
+        """
+        # tool = self.parse_tools(self.tools, query=query)
+        # return tool.func(query)
 
-        agent_chain = AgentExecutor.from_agent_and_tools(
-            agent=agent,
-            tools=tools,
+        # 每次请求只创建记忆和执行器，Agent、工具和链复用启动时创建的实例
+        used_tools = []
+        query_token = _current_query.set(query)
+        tools_token = _used_tools.set(used_tools)
+        ner_token = _ner_results.set({})
+        try:
+            answer, finished = self.run_query(query, query_vector)
+            return answer, used_tools, finished
+        finally:
+            _ner_results.reset(ner_token)
+            _used_tools.reset(tools_token)
+            _current_query.reset(query_token)
+
+    async def aquery_with_tools(self, query, query_vector=None):
+        """query_with_tools的异步版本：大模型、嵌入、向量库、图谱和网页请求都不阻塞事件循环"""
+        used_tools = []
+        query_token = _current_query.set(query)
+        tools_token = _used_tools.set(used_tools)
+        ner_token = _ner_results.set({})
+        try:
+            answer, finished = await self.arun_query(query, query_vector)
+            return answer, used_tools, finished
+        finally:
+            _ner_results.reset(ner_token)
+            _used_tools.reset(tools_token)
+            _current_query.reset(query_token)
+
+    def new_executor(self):
+        """每次请求新建记忆和执行器"""
+        memory = ConversationBufferMemory(memory_key='chat_history')
+        return AgentExecutor.from_agent_and_tools(
+            agent=self.agent,
+            tools=self.tools,
             memory=memory,
             handle_parsing_errors=True,
             max_iterations=3,  # 限制最大迭代次数，防止无限循环
             verbose=os.getenv('VERBOSE')
         )
-        return agent_chain.run({'input':query})
+
+    @staticmethod
+    def agent_finished(answer):
+        """ReAct Agent是否给出了Final Answer，而不是达到迭代上限后的兜底输出"""
+        return bool(answer) and answer.strip() != AGENT_STOPPED_OUTPUT
+
+    def run_query(self, query, query_vector=None):
+        """先尝试向量路由，置信度不足或没有答案时交给ReAct Agent，返回(答案, 是否正常完成)"""
+        # 优先向量路由，省去ReAct选择工具的LLM调用；ROUTER_ENABLED=0时关闭
+        if os.getenv('ROUTER_ENABLED', '1') != '0':
+            answer = self.route(query, query_vector)
+            # graph_func识别不到实体时没有答案，同样退回Agent
+            if answer:
+                return answer, True
+
+        agent_chain = self.new_executor()
+        # ReAct中工具的输出只是中间观察结果，只流式输出Agent的Final Answer
+        answer = agent_chain.run({'input':query}, callbacks=stream_callbacks(prefix=FINAL_ANSWER_PREFIX))
+        return answer, self.agent_finished(answer)
+
+    async def arun_query(self, query, query_vector=None):
+        """run_query的异步版本；SPECULATIVE_ENABLED不为0（默认）时路由与两路检索并发执行"""
+        if os.getenv('ROUTER_ENABLED', '1') != '0':
+            if os.getenv('SPECULATIVE_ENABLED', '1') != '0':
+                answer = await self.aspeculate(query, query_vector)
+            else:
+                answer = await self.aroute(query, query_vector)
+            if answer:
+                return answer, True
+
+        agent_chain = self.new_executor()
+        answer = await agent_chain.arun({'input':query}, callbacks=stream_callbacks(prefix=FINAL_ANSWER_PREFIX))
+        return answer, self.agent_finished(answer)
 
 if __name__ == '__main__':
     agent = Agent()
@@ -0,0 +1,235 @@
+# answer_cache.py
+"""
+问答结果的语义缓存
+以规范化后（已结合历史改写）的问题为键：先按哈希精确查找，未命中时用问题向量做最近邻查找，
+相似度超过阈值、且识别出的实体和否定词都一致时才复用答案（“糖尿病能吃什么”和“糖尿病不能吃什么”、
+“高血压”和“低血压”的向量非常接近，答案却不能互换）。LRU淘汰 + TTL过期，按回答所用的工具失效
+（图谱重新导入后通过graph_cache的代际文件自动清除graph_func的答案），并统计命中率
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from graph_cache import GENERATION_FILE, GENERATION_CHECK_INTERVAL, generation_stamp
+from intent_index import normalize
+from entity_matcher import get_entity_matcher
+
+DEFAULT_CACHE_SIZE = 2048
+DEFAULT_CACHE_TTL = 3600.0
+# 语义命中所需的最低余弦相似度
+DEFAULT_THRESHOLD = 0.95
+# 默认不缓存的工具：搜索结果时效性强
+DEFAULT_EXCLUDE_TOOLS = 'search_func'
+# 没有调用工具、由Agent直接给出的答案
+AGENT_TOOL = 'agent'
+# 图谱数据重新导入后需要失效的工具
+GRAPH_TOOL = 'graph_func'
+
+PUNCTUATION = re.compile(r'[\s?？!！。.,，、~～…]+')
+# 否定词：是否出现必须一致才能语义命中
+NEGATION_TOKENS = ('不', '别', '禁')
+
+
+def normalize_query(query):
+    """全角转半角、转小写、去掉空白和标点"""
+    return PUNCTUATION.sub('', unicodedata.normalize('NFKC', query or '').lower())
+
+
+def query_hash(query):
+    return hashlib.md5(normalize_query(query).encode('utf-8')).hexdigest()
+
+
+def query_signature(query):
+    """语义命中时必须完全一致的部分：(实体集合, 各否定词是否出现)；实体词典不可用时返回None"""
+    try:
+        entities = get_entity_matcher().extract(query)
+    except Exception as e:
+        print(f'实体词典不可用，图谱答案只允许精确命中：{str(e)}')
+        return None
+    names = frozenset((slot, name) for slot, values in entities.items() for name in values)
+    normalized = normalize_query(query)
+    return names, tuple(token in normalized for token in NEGATION_TOKENS)
+
+
+def semantic_allowed(entry, signature):
+    """条目能否被签名为signature的问题语义复用；签名缺失时图谱答案只允许精确命中"""
+    if signature is None or entry['signature'] is None:
+        return GRAPH_TOOL not in entry['tools']
+    return entry['signature'] == signature
+
+
+class AnswerCache:
+    """线程安全的语义答案缓存：entries为哈希 -> 条目，vectors与keys按行对应，用于最近邻查找"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL, threshold=DEFAULT_THRESHOLD,
+                 exclude_tools=(), generation_path=GENERATION_FILE, signature=query_signature):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.exclude_tools = set(exclude_tools)
+        self.generation_path = generation_path
+        self.signature = signature
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys = []
+        self.matrix = None
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self.generation = generation_stamp(generation_path)
+        self.generation_checked = time.monotonic()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def check_generation(self, now):
+        """图谱数据重新导入后清除图谱答案，调用方需持有锁"""
+        if now - self.generation_checked < GENERATION_CHECK_INTERVAL:
+            return
+        self.generation_checked = now
+        generation = generation_stamp(self.generation_path)
+        if generation != self.generation:
+            self.generation = generation
+            self.remove_where(lambda entry: GRAPH_TOOL in entry['tools'])
+
+    def remove_where(self, predicate):
+        """删除满足条件的条目，调用方需持有锁"""
+        removed = [key for key, entry in self.entries.items() if predicate(entry)]
+        for key in removed:
+            del self.entries[key]
+        if removed:
+            self.matrix = None
+            self.invalidations += len(removed)
+        return len(removed)
+
+    def nearest(self, vector, signature):
+        """在允许语义复用的条目中做最近邻查找，返回(哈希, 相似度)，调用方需持有锁"""
+        if not self.entries:
+            return None, 0.0
+        if self.matrix is None:
+            self.keys = list(self.entries)
+            self.matrix = np.stack([self.entries[key]['vector'] for key in self.keys])
+        allowed = np.array([semantic_allowed(self.entries[key], signature) for key in self.keys])
+        if not allowed.any():
+            return None, 0.0
+        similarities = np.where(allowed, self.matrix @ vector, -np.inf)
+        best = int(np.argmax(similarities))
+        return self.keys[best], float(similarities[best])
+
+    def lookup_exact(self, query):
+        """按哈希精确查找，返回条目或None"""
+        key = query_hash(query)
+        now = time.monotonic()
+        with self.lock:
+            self.check_generation(now)
+            entry = self.entries.get(key)
+            if entry is not None and entry['expires'] > now:
+                self.entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry
+        return None
+
+    def lookup_vector(self, query, vector):
+        """按问题向量做最近邻查找，返回(答案或None, 归一化后的问题向量)"""
+        vector = normalize(np.asarray(vector, dtype=np.float32))
+        signature = self.signature(query)
+        now = time.monotonic()
+        with self.lock:
+            nearest_key, similarity = self.nearest(vector, signature)
+            entry = self.entries.get(nearest_key)
+            if entry is not None and similarity >= self.threshold and entry['expires'] > now:
+                self.entries.move_to_end(nearest_key)
+                self.semantic_hits += 1
+                return entry['answer'], vector
+            self.misses += 1
+        return None, vector
+
+    def lookup(self, query, embed):
+        """查找答案，返回(答案或None, 问题向量)；问题向量只在精确查找未命中时计算，供后续路由和写入复用"""
+        if not self.enabled:
+            return None, None
+        entry = self.lookup_exact(query)
+        if entry is not None:
+            return entry['answer'], entry['vector']
+        return self.lookup_vector(query, embed(query))
+
+    async def alookup(self, query, aembed):
+        """lookup的异步版本，aembed为返回问题向量的协程函数"""
+        if not self.enabled:
+            return None, None
+        entry = self.lookup_exact(query)
+        if entry is not None:
+            return entry['answer'], entry['vector']
+        return self.lookup_vector(query, await aembed(query))
+
+    def put(self, query, vector, answer, tools):
+        """写入答案；空答案、没有向量或使用了排除工具的答案不缓存"""
+        tools = set(tools) or {AGENT_TOOL}
+        if not self.enabled or not answer or vector is None or tools & self.exclude_tools:
+            return
+        key = query_hash(query)
+        signature = self.signature(query)
+        with self.lock:
+            now = time.monotonic()
+            # 顺带清理过期条目，避免过期答案占用最近邻结果
+            self.remove_where(lambda entry: entry['expires'] <= now)
+            self.entries[key] = {'answer': answer, 'vector': vector, 'tools': tools, 'signature': signature,
+                                 'expires': now + self.ttl}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self.matrix = None
+
+    def invalidate(self, tool=None):
+        """按工具失效答案，tool为None时清空；返回删除的条目数"""
+        with self.lock:
+            if tool is None:
+                return self.remove_where(lambda entry: True)
+            return self.remove_where(lambda entry: tool in entry['tools'])
+
+    def stats(self):
+        """返回命中统计"""
+        with self.lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """获取进程级共享的答案缓存，由ANSWER_CACHE_SIZE、ANSWER_CACHE_TTL、ANSWER_CACHE_THRESHOLD、
+    ANSWER_CACHE_EXCLUDE（逗号分隔的工具名）配置"""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                exclude = os.getenv('ANSWER_CACHE_EXCLUDE', DEFAULT_EXCLUDE_TOOLS)
+                _answer_cache = AnswerCache(
+                    maxsize=int(os.getenv('ANSWER_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+                    ttl=float(os.getenv('ANSWER_CACHE_TTL', DEFAULT_CACHE_TTL)),
+                    threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', DEFAULT_THRESHOLD)),
+                    exclude_tools=[tool.strip() for tool in exclude.split(',') if tool.strip()],
+                )
+    return _answer_cache
@@ -1,9 +1,22 @@
+import os
 import gradio as gr
-from service import Service
+from service import get_service
 
-def doctor_bot(message, history):
-    service = Service()
-    return service.answer(message, history)
+# 启动时创建并预热Service，所有会话共享同一实例（SERVICE_WARMUP=0时跳过预热）
+service = get_service(warmup=os.getenv('SERVICE_WARMUP', '1') != '0')
+# 输出第一个token之前是否显示中间状态（STREAM_STATUS=0时关闭）
+SHOW_STATUS = os.getenv('STREAM_STATUS', '1') != '0'
+
+async def doctor_bot(message, history):
+    partial = ''
+    async for kind, value in service.astream_answer(message, history):
+        if kind == 'token':
+            partial += value
+            yield partial
+        elif kind == 'status' and SHOW_STATUS and not partial:
+            yield f'_{value}..._'
+        elif kind == 'done':
+            yield value or partial
 
 CSS = """
 .gradio-container {
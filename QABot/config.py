@@ -1,85 +1,182 @@
+import os
+
 GRAPH_TEMPLATE = {
     'desc': {
         'slots': ['disease'],
         'question': '什么叫%disease%? / %disease%是一种什么病？',
-        'cypher': "MATCH (n:Disease) WHERE n.name='%disease%' RETURN n.desc AS RES",
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease RETURN n.desc AS RES",
         'answer': '【%disease%】的定义：%RES%',
     },
     'cause': {
         'slots': ['disease'],
         'question': '%disease%一般是由什么引起的？/ 什么会导致%disease%？',
-        'cypher': "MATCH (n:Disease) WHERE n.name='%disease%' RETURN n.cause AS RES",
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease RETURN n.cause AS RES",
         'answer': '【%disease%】的病因：%RES%',
     },
     'disease_symptom': {
         'slots': ['disease'],
         'question': '%disease%会有哪些症状？/ %disease%有哪些临床表现？',
-        'cypher': "MATCH (n:Disease)-[:DISEASE_SYMPTOM]->(m) WHERE n.name='%disease%' RETURN SUBSTRING(REDUCE(s = '', x IN COLLECT(m.name) | s + '、' + x), 1) AS RES",
-        'answer': '【%disease%】的症状：%RES%',
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease "
+                  "WITH CASE WHEN n.agg_symptom IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_SYMPTOM]->(m) WITH DISTINCT m ORDER BY COUNT { (m)--() } DESC, m.name RETURN m.name } ELSE n.agg_symptom END AS names "
+                  "RETURN SUBSTRING(REDUCE(s = '', x IN names[..$limit] | s + '、' + x), 1) AS RES, size(names) AS TOTAL",
+        'answer': '【%disease%】的症状（共%TOTAL%个）：%RES%',
     },
     'symptom': {
         'slots': ['symptom'],
         'question': '%symptom%可能是得了什么病？',
-        'cypher': "MATCH (n)-[:DISEASE_SYMPTOM]->(m:Symptom) WHERE m.name='%symptom%' RETURN SUBSTRING(REDUCE(s = '', x IN COLLECT(n.name) | s + '、' + x), 1) AS RES",
-        'answer': '可能出现【%symptom%】症状的疾病：%RES%',
+        'cypher': "MATCH (n:Symptom) WHERE n.name=$symptom "
+                  "WITH CASE WHEN n.agg_disease IS NULL THEN COLLECT { MATCH (n)<-[:DISEASE_SYMPTOM]-(m) WITH DISTINCT m ORDER BY COUNT { (m)--() } DESC, m.name RETURN m.name } ELSE n.agg_disease END AS names "
+                  "RETURN SUBSTRING(REDUCE(s = '', x IN names[..$limit] | s + '、' + x), 1) AS RES, size(names) AS TOTAL",
+        'answer': '可能出现【%symptom%】症状的疾病（共%TOTAL%种）：%RES%',
     },
     'cure_way': {
         'slots': ['disease'],
         'question': '%disease%吃什么药好得快？/ %disease%怎么治？',
         'cypher': '''
-            MATCH (n:Disease)-[:DISEASE_CUREWAY]->(m1),
-                (n:Disease)-[:DISEASE_DRUG]->(m2),
-                (n:Disease)-[:DISEASE_DO_EAT]->(m3)
-            WHERE n.name = '%disease%'
-            WITH COLLECT(DISTINCT m1.name) AS m1Names, 
-                COLLECT(DISTINCT m2.name) AS m2Names,
-                COLLECT(DISTINCT m3.name) AS m3Names
-            RETURN SUBSTRING(REDUCE(s = '', x IN m1Names | s + '、' + x), 1) AS RES1,
-                SUBSTRING(REDUCE(s = '', x IN m2Names | s + '、' + x), 1) AS RES2,
-                SUBSTRING(REDUCE(s = '', x IN m3Names | s + '、' + x), 1) AS RES3
+            MATCH (n:Disease) WHERE n.name = $disease
+            WITH CASE WHEN n.agg_cureway IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_CUREWAY]->(m1) WITH DISTINCT m1 ORDER BY COUNT { (m1)--() } DESC, m1.name RETURN m1.name } ELSE n.agg_cureway END AS m1Names,
+                CASE WHEN n.agg_drug IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_DRUG]->(m2) WITH DISTINCT m2 ORDER BY COUNT { (m2)--() } DESC, m2.name RETURN m2.name } ELSE n.agg_drug END AS m2Names,
+                CASE WHEN n.agg_do_eat IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_DO_EAT]->(m3) WITH DISTINCT m3 ORDER BY COUNT { (m3)--() } DESC, m3.name RETURN m3.name } ELSE n.agg_do_eat END AS m3Names
+            // 与原先的多路MATCH一致：三种关系都存在时才返回
+            WHERE size(m1Names) > 0 AND size(m2Names) > 0 AND size(m3Names) > 0
+            RETURN SUBSTRING(REDUCE(s = '', x IN m1Names[..$limit] | s + '、' + x), 1) AS RES1,
+                SUBSTRING(REDUCE(s = '', x IN m2Names[..$limit] | s + '、' + x), 1) AS RES2,
+                SUBSTRING(REDUCE(s = '', x IN m3Names[..$limit] | s + '、' + x), 1) AS RES3,
+                size(m1Names) AS TOTAL1, size(m2Names) AS TOTAL2, size(m3Names) AS TOTAL3
             ''',
-        'answer': '【%disease%】的治疗方法：%RES1%。\n可用药物：%RES2%。\n推荐食物：%RES3%',
+        'answer': '【%disease%】的治疗方法（共%TOTAL1%种）：%RES1%。\n可用药物（共%TOTAL2%种）：%RES2%。\n推荐食物（共%TOTAL3%种）：%RES3%',
     },
     'cure_department': {
         'slots': ['disease'],
         'question': '得了%disease%去医院挂什么科室的号？',
-        'cypher': "MATCH (n:Disease)-[:DISEASE_DEPARTMENT]->(m) WHERE n.name='%disease%' RETURN SUBSTRING(REDUCE(s = '', x IN COLLECT(m.name) | s + '、' + x), 1) AS RES",
-        'answer': '【%disease%】的就诊科室：%RES%',
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease "
+                  "WITH CASE WHEN n.agg_department IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_DEPARTMENT]->(m) WITH DISTINCT m ORDER BY COUNT { (m)--() } DESC, m.name RETURN m.name } ELSE n.agg_department END AS names "
+                  "RETURN SUBSTRING(REDUCE(s = '', x IN names[..$limit] | s + '、' + x), 1) AS RES, size(names) AS TOTAL",
+        'answer': '【%disease%】的就诊科室（共%TOTAL%个）：%RES%',
     },
     'prevent': {
         'slots': ['disease'],
         'question': '%disease%要怎么预防？',
-        'cypher': "MATCH (n:Disease) WHERE n.name='%disease%' RETURN n.prevent AS RES",
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease RETURN n.prevent AS RES",
         'answer': '【%disease%】的预防方法：%RES%',
     },
     'not_eat': {
         'slots': ['disease'],
         'question': '%disease%换着有什么禁忌？/ %disease%不能吃什么？',
-        'cypher': "MATCH (n:Disease)-[:DISEASE_NOT_EAT]->(m) WHERE n.name='%disease%' RETURN SUBSTRING(REDUCE(s = '', x IN COLLECT(m.name) | s + '、' + x), 1) AS RES",
-        'answer': '【%disease%】的患者不能吃的食物：%RES%',
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease "
+                  "WITH CASE WHEN n.agg_not_eat IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_NOT_EAT]->(m) WITH DISTINCT m ORDER BY COUNT { (m)--() } DESC, m.name RETURN m.name } ELSE n.agg_not_eat END AS names "
+                  "RETURN SUBSTRING(REDUCE(s = '', x IN names[..$limit] | s + '、' + x), 1) AS RES, size(names) AS TOTAL",
+        'answer': '【%disease%】的患者不能吃的食物（共%TOTAL%种）：%RES%',
     },
     'check': {
         'slots': ['disease'],
         'question': '%disease%要做哪些检查？',
-        'cypher': "MATCH (n:Disease)-[:DISEASE_CHECK]->(m) WHERE n.name='%disease%' RETURN SUBSTRING(REDUCE(s = '', x IN COLLECT(m.name) | s + '、' + x), 1) AS RES",
-        'answer': '【%disease%】的检查项目：%RES%',
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease "
+                  "WITH CASE WHEN n.agg_check IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_CHECK]->(m) WITH DISTINCT m ORDER BY COUNT { (m)--() } DESC, m.name RETURN m.name } ELSE n.agg_check END AS names "
+                  "RETURN SUBSTRING(REDUCE(s = '', x IN names[..$limit] | s + '、' + x), 1) AS RES, size(names) AS TOTAL",
+        'answer': '【%disease%】的检查项目（共%TOTAL%项）：%RES%',
     },
     'cured_prob': {
         'slots': ['disease'],
         'question': '%disease%能治好吗？/ %disease%治好的几率有多大？',
-        'cypher': "MATCH (n:Disease) WHERE n.name='%disease%' RETURN n.cured_prob AS RES",
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease RETURN n.cured_prob AS RES",
         'answer': '【%disease%】的治愈率：%RES%',
     },
     'acompany': {
         'slots': ['disease'],
         'question': '%disease%的并发症有哪些？',
-        'cypher': "MATCH (n:Disease)-[:DISEASE_ACOMPANY]->(m) WHERE n.name='%disease%' RETURN SUBSTRING(REDUCE(s = '', x IN COLLECT(m.name) | s + '、' + x), 1) AS RES",
-        'answer': '【%disease%】的并发症：%RES%',
+        'cypher': "MATCH (n:Disease) WHERE n.name=$disease "
+                  "WITH CASE WHEN n.agg_acompany IS NULL THEN COLLECT { MATCH (n)-[:DISEASE_ACOMPANY]->(m) WITH DISTINCT m ORDER BY COUNT { (m)--() } DESC, m.name RETURN m.name } ELSE n.agg_acompany END AS names "
+                  "RETURN SUBSTRING(REDUCE(s = '', x IN names[..$limit] | s + '、' + x), 1) AS RES, size(names) AS TOTAL",
+        'answer': '【%disease%】的并发症（共%TOTAL%种）：%RES%',
     },
     'indications': {
         'slots': ['drug'],
         'question': '%drug%能治那些病？',
-        'cypher': "MATCH (n:Disease)-[:DISEASE_DRUG]->(m:Drug) WHERE m.name='%drug%' RETURN SUBSTRING(REDUCE(s = '', x IN COLLECT(n.name) | s + '、' + x), 1) AS RES",
-        'answer': '【%drug%】能治疗的疾病有：%RES%',
+        'cypher': "MATCH (n:Drug) WHERE n.name=$drug "
+                  "WITH CASE WHEN n.agg_disease IS NULL THEN COLLECT { MATCH (n)<-[:DISEASE_DRUG]-(m) WITH DISTINCT m ORDER BY COUNT { (m)--() } DESC, m.name RETURN m.name } ELSE n.agg_disease END AS names "
+                  "RETURN SUBSTRING(REDUCE(s = '', x IN names[..$limit] | s + '、' + x), 1) AS RES, size(names) AS TOTAL",
+        'answer': '【%drug%】能治疗的疾病（共%TOTAL%种）：%RES%',
     },
-}
\ No newline at end of file
+}
+
+# 列表类模板最多返回的名称数（按邻居节点的度数降序、名称升序排列），总数单独以TOTAL列返回；
+# 模板可用'limit'单独覆盖，环境变量GRAPH_RESULT_LIMIT可覆盖默认值
+GRAPH_RESULT_LIMIT = 20
+
+
+# 该函数用于将字符串中的占位符替换为实际的值
+def replace_token_in_string(string, slots):
+    # 如果 slots 是列表，转换为字典
+    if isinstance(slots, list):
+        slots = dict(slots)
+    
+    for key, value in slots.items():
+        string = string.replace('%' + key + '%', value)
+    return string
+
+# 用实体填充图谱模板：问题和答案做文本替换，Cypher保持参数化（$disease等），
+# 实体值放在params中随查询一起发送，Neo4j可按模板复用执行计划；
+# $limit为列表类模板返回的名称数上限
+def render_graph_template(key, template, slots):
+    limit = template.get('limit', int(os.getenv('GRAPH_RESULT_LIMIT', GRAPH_RESULT_LIMIT)))
+    return {
+        'key': key,
+        'question': replace_token_in_string(template['question'], slots),
+        'cypher': template['cypher'],
+        'params': dict(slots, limit=limit),
+        'answer': replace_token_in_string(template['answer'], slots),
+    }
+
+
+# 导入时预计算的聚合属性：标签 -> {属性名: (关系类型, 方向)}
+# 属性值为按邻居度数降序排列的名称列表，GRAPH_TEMPLATE优先读取这些属性，属性不存在时再实时遍历关系
+MATERIALIZED_PROPERTIES = {
+    'Disease': {
+        'agg_symptom': ('DISEASE_SYMPTOM', 'out'),
+        'agg_cureway': ('DISEASE_CUREWAY', 'out'),
+        'agg_drug': ('DISEASE_DRUG', 'out'),
+        'agg_do_eat': ('DISEASE_DO_EAT', 'out'),
+        'agg_department': ('DISEASE_DEPARTMENT', 'out'),
+        'agg_not_eat': ('DISEASE_NOT_EAT', 'out'),
+        'agg_check': ('DISEASE_CHECK', 'out'),
+        'agg_acompany': ('DISEASE_ACOMPANY', 'out'),
+    },
+    'Symptom': {
+        'agg_disease': ('DISEASE_SYMPTOM', 'in'),
+    },
+    'Drug': {
+        'agg_disease': ('DISEASE_DRUG', 'in'),
+    },
+}
+
+# 节点类型配置
+NODE_CONFIGS = {
+    'Category': {'file': 'Category.csv', 'properties': ['name']},
+    'Check': {'file': 'Check.csv', 'properties': ['name']},
+    'Cureway': {'file': 'Cureway.csv', 'properties': ['name']},
+    'Department': {'file': 'Department.csv', 'properties': ['name']},
+    'Disease': {
+        'file': 'Disease.csv',
+        'properties': ['name', 'desc', 'prevent', 'cause', 'yibao_status',
+                       'get_prob', 'get_way', 'cure_lasttime', 'cured_prob', 'cost_money']
+    },
+    'Dishes': {'file': 'Dishes.csv', 'properties': ['name']},
+    'Drug': {'file': 'Drug.csv', 'properties': ['name']},
+    'Food': {'file': 'Food.csv', 'properties': ['name']},
+    'Symptom': {'file': 'Symptom.csv', 'properties': ['name']}
+}
+
+# 关系类型配置
+RELATIONSHIP_CONFIGS = {
+    'DISEASE_ACOMPANY': {'from_type': 'Disease', 'to_type': 'Disease', 'file': 'DISEASE_ACOMPANY.csv'},
+    'DISEASE_CATEGORY': {'from_type': 'Disease', 'to_type': 'Category', 'file': 'DISEASE_CATEGORY.csv'},
+    'DISEASE_CHECK': {'from_type': 'Disease', 'to_type': 'Check', 'file': 'DISEASE_CHECK.csv'},
+    'DISEASE_CUREWAY': {'from_type': 'Disease', 'to_type': 'Cureway', 'file': 'DISEASE_CUREWAY.csv'},
+    'DISEASE_DEPARTMENT': {'from_type': 'Disease', 'to_type': 'Department', 'file': 'DISEASE_DEPARTMENT.csv'},
+    'DISEASE_DISHES': {'from_type': 'Disease', 'to_type': 'Dishes', 'file': 'DISEASE_DISHES.csv'},
+    'DISEASE_DO_EAT': {'from_type': 'Disease', 'to_type': 'Food', 'file': 'DISEASE_DO_EAT.csv'},
+    'DISEASE_DRUG': {'from_type': 'Disease', 'to_type': 'Drug', 'file': 'DISEASE_DRUG.csv'},
+    'DISEASE_NOT_EAT': {'from_type': 'Disease', 'to_type': 'Food', 'file': 'DISEASE_NOT_EAT.csv'},
+    'DISEASE_SYMPTOM': {'from_type': 'Disease', 'to_type': 'Symptom', 'file': 'DISEASE_SYMPTOM.csv'}
+}
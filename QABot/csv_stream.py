@@ -0,0 +1,141 @@
+# csv_stream.py
+"""
+流式CSV读取工具
+只用文件前缀探测编码，之后用增量解码器逐块解码并逐行交给csv.DictReader，
+内存占用与文件大小无关；前缀之后解码失败时换用下一个候选编码从头重新解码，
+仍然失败时报告出错的字节偏移和行号
+"""
+
+import csv
+import codecs
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 编码探测读取的前缀字节数
+SNIFF_BYTES = 64 * 1024
+# 流式解码每次读取的字节数
+CHUNK_BYTES = 256 * 1024
+# 依次尝试的编码（gb2312是gbk的子集，无需单独尝试）
+ENCODINGS_TO_TRY = ['utf-8', 'gbk']
+
+
+class CSVDecodeError(UnicodeDecodeError):
+    """带文件位置信息的解码错误"""
+
+    def __init__(self, file_path, error, byte_offset, line_number):
+        super().__init__(error.encoding, error.object, error.start, error.end, error.reason)
+        self.file_path = file_path
+        self.byte_offset = byte_offset
+        self.line_number = line_number
+
+    def __str__(self):
+        return (f"无法以{self.encoding}编码解码文件：{self.file_path}，"
+                f"字节偏移{self.byte_offset}（第{self.line_number}行），原因：{self.reason}")
+
+
+def sniff_encoding(file_path, sniff_bytes=SNIFF_BYTES):
+    """根据文件前缀探测编码，带UTF-8 BOM时返回utf-8-sig"""
+    with open(file_path, 'rb') as f:
+        prefix = f.read(sniff_bytes)
+    if prefix.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for encoding in ENCODINGS_TO_TRY:
+        try:
+            # final=False允许前缀在多字节字符中间截断
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"无法识别文件编码：{file_path}")
+
+
+def iter_decoded_lines(file_path, encoding, chunk_bytes=CHUNK_BYTES):
+    """按块读取并增量解码，逐行产出（保留换行符）"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    byte_offset = 0
+    line_number = 1
+    pending = ''
+
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            final = not chunk
+            buffered = len(decoder.getstate()[0])
+            try:
+                text = decoder.decode(chunk, final=final)
+            except UnicodeDecodeError as e:
+                error_offset = byte_offset - buffered + e.start
+                error_line = line_number + text_before(e).count('\n')
+                raise CSVDecodeError(file_path, e, error_offset, error_line) from e
+            byte_offset += len(chunk)
+
+            pending += text
+            lines = pending.split('\n')
+            pending = lines.pop()
+            for line in lines:
+                line_number += 1
+                yield line + '\n'
+
+            if final:
+                break
+
+    if pending:
+        yield pending
+
+
+def iter_lines_with_fallback(file_path, encoding, chunk_bytes=CHUNK_BYTES):
+    """逐行解码，前缀探测出的编码在后续内容上失败时，换用ENCODINGS_TO_TRY中的下一个编码从头重新解码
+
+    已经产出的行在新编码下必须完全一致（按哈希比较），否则抛出最初的解码错误
+    """
+    candidates = ENCODINGS_TO_TRY[ENCODINGS_TO_TRY.index(encoding) + 1:] if encoding in ENCODINGS_TO_TRY else []
+    digest = hashlib.sha1()
+    produced = 0
+    first_error = None
+
+    while True:
+        lines = iter_decoded_lines(file_path, encoding, chunk_bytes)
+        try:
+            if produced and not same_prefix(lines, produced, digest.digest()):
+                raise first_error
+            for line in lines:
+                digest.update(line.encode('utf-8'))
+                produced += 1
+                yield line
+            return
+        except CSVDecodeError as e:
+            if e is first_error or not candidates:
+                raise
+            first_error = first_error or e
+            next_encoding = candidates.pop(0)
+            logger.warning(f"文件{file_path}第{e.line_number}行无法以{encoding}编码解码，改用{next_encoding}重新解码")
+            encoding = next_encoding
+
+
+def same_prefix(lines, count, expected):
+    """消费lines的前count行，判断其哈希是否与expected一致"""
+    digest = hashlib.sha1()
+    for _ in range(count):
+        line = next(lines, None)
+        if line is None:
+            return False
+        digest.update(line.encode('utf-8'))
+    return digest.digest() == expected
+
+
+def text_before(error):
+    """尽力解码出错位置之前的内容，用于计算出错行号"""
+    return error.object[:error.start].decode(error.encoding, errors='ignore')
+
+
+def iter_csv_rows(file_path, encoding=None):
+    """流式读取CSV，返回(行字典生成器, 编码)
+
+    未指定编码时按前缀探测，返回探测到的编码，后续内容解码失败时自动换用下一个候选编码
+    """
+    if encoding:
+        return csv.DictReader(iter_decoded_lines(file_path, encoding)), encoding
+    encoding = sniff_encoding(file_path)
+    return csv.DictReader(iter_lines_with_fallback(file_path, encoding)), encoding
@@ -0,0 +1,141 @@
+# data_validation.py
+"""
+导入前的引用完整性校验
+在内存中加载各类节点的名称集合，与每个关系文件做哈希连接，
+统计并过滤悬空端点、重复关系和自环，避免无效行占用Neo4j网络往返
+"""
+
+import os
+import time
+import logging
+from config import NODE_CONFIGS, RELATIONSHIP_CONFIGS
+from csv_stream import iter_csv_rows
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NODES_PATH = os.path.join(BASE_DIR, 'doctor', 'nodes')
+RELATIONS_PATH = os.path.join(BASE_DIR, 'doctor', 'relations')
+
+# 报告中保留的悬空名称样例数
+DANGLING_SAMPLES = 5
+
+
+def new_report():
+    """创建单个关系文件的校验统计"""
+    return {
+        'rows': 0,
+        'valid': 0,
+        'empty': 0,
+        'dangling_from': 0,
+        'dangling_to': 0,
+        'duplicates': 0,
+        'self_loops': 0,
+        'dangling_samples': [],
+    }
+
+
+def filter_relation_rows(rows, from_names, to_names, report):
+    """过滤关系行：去掉空端点、悬空端点、自环和重复关系，统计写入report"""
+    seen = set()
+    samples = report['dangling_samples']
+    for row in rows:
+        report['rows'] += 1
+        from_name = (row.get('from') or '').strip()
+        to_name = (row.get('to') or '').strip()
+        if not from_name or not to_name:
+            report['empty'] += 1
+            continue
+        if from_name not in from_names or to_name not in to_names:
+            if from_name not in from_names:
+                report['dangling_from'] += 1
+            if to_name not in to_names:
+                report['dangling_to'] += 1
+            if len(samples) < DANGLING_SAMPLES:
+                samples.append(f'{from_name} -> {to_name}')
+            continue
+        if from_name == to_name:
+            report['self_loops'] += 1
+            continue
+        key = (from_name, to_name)
+        if key in seen:
+            report['duplicates'] += 1
+            continue
+        seen.add(key)
+        report['valid'] += 1
+        yield {'from': from_name, 'to': to_name}
+
+
+class RelationValidator:
+    """关系文件引用完整性校验器"""
+
+    def __init__(self, nodes_path=NODES_PATH, relations_path=RELATIONS_PATH):
+        self.nodes_path = nodes_path
+        self.relations_path = relations_path
+        self.node_names = None
+        self.reports = {}
+
+    def load_node_names(self):
+        """加载各节点类型的名称集合，缺失的节点文件视为空集合"""
+        if self.node_names is not None:
+            return self.node_names
+
+        self.node_names = {}
+        for label, config in NODE_CONFIGS.items():
+            file_path = os.path.join(self.nodes_path, config['file'])
+            if not os.path.exists(file_path):
+                logger.warning(f"节点文件不存在：{config['file']}，引用{label}的关系将全部视为悬空关系")
+                self.node_names[label] = set()
+                continue
+            reader, _ = iter_csv_rows(file_path)
+            self.node_names[label] = {name for name in ((row.get('name') or '').strip() for row in reader) if name}
+        return self.node_names
+
+    def filter_rows(self, rel_type, rows):
+        """按关系类型过滤行，统计累计到该类型的报告中"""
+        config = RELATIONSHIP_CONFIGS[rel_type]
+        node_names = self.load_node_names()
+        report = new_report()
+        self.reports[rel_type] = report
+        return filter_relation_rows(rows, node_names[config['from_type']], node_names[config['to_type']], report)
+
+    def validate_file(self, rel_type):
+        """只做统计的完整扫描，返回单个关系文件的校验报告"""
+        config = RELATIONSHIP_CONFIGS[rel_type]
+        file_path = os.path.join(self.relations_path, config['file'])
+        reader, _ = iter_csv_rows(file_path)
+        for _ in self.filter_rows(rel_type, reader):
+            pass
+        return self.reports[rel_type]
+
+    def validate_all(self):
+        """校验全部关系文件并输出报告，返回{关系类型: 报告}"""
+        logger.info("开始导入前引用完整性校验...")
+        start = time.perf_counter()
+        self.load_node_names()
+
+        reports = {}
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            if not os.path.exists(os.path.join(self.relations_path, config['file'])):
+                logger.warning(f"文件不存在：{config['file']}")
+                continue
+            report = self.validate_file(rel_type)
+            reports[rel_type] = report
+            message = (f"{rel_type}：共{report['rows']}行，有效{report['valid']}，"
+                       f"悬空起点{report['dangling_from']}，悬空终点{report['dangling_to']}，"
+                       f"重复{report['duplicates']}，自环{report['self_loops']}，空行{report['empty']}")
+            if report['valid'] < report['rows']:
+                logger.warning(message + (f"，悬空样例：{report['dangling_samples']}" if report['dangling_samples'] else ''))
+            else:
+                logger.info(message)
+
+        total = sum(report['rows'] for report in reports.values())
+        valid = sum(report['valid'] for report in reports.values())
+        logger.info(f"✅ 引用完整性校验完成，共{total}行，有效{valid}行，过滤{total - valid}行，"
+                    f"耗时{time.perf_counter() - start:.2f}秒")
+        return reports
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    RelationValidator().validate_all()
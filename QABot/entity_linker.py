@@ -0,0 +1,174 @@
+# entity_linker.py
+"""
+实体链接索引
+GRAPH_TEMPLATE要求节点名称完全一致，NER结果差一个字就会查空。
+这里对每类节点名称建立字符二元组倒排表，先用倒排表召回共享二元组最多的候选，
+再用编辑距离校验打分，把抽取出的名称映射为图谱中的标准名称。
+允许的编辑次数随名称长度变化：两个字及以下的名称只接受精确匹配（“头疼”不能链接到“龟头疼”），
+更长的名称得分需达到阈值（“阿莫西林”不会链接到“阿莫西林胶囊”）
+"""
+
+import os
+import numpy as np
+from graph_engine import csv_signature
+from entity_matcher import load_entity_names
+from index_cache import load_cached, SharedInstance
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, 'data', 'entity_linker.pkl')
+CACHE_VERSION = 3
+
+# 链接得分下限（1 - 编辑距离 / 较长名称长度）
+DEFAULT_THRESHOLD = 0.75
+# 不超过该长度的名称只接受精确匹配：两个字的名称改一个字就是另一个词
+EXACT_ONLY_LENGTH = 2
+# 进入编辑距离校验的候选数
+MAX_CANDIDATES = 20
+
+
+def char_ngrams(text):
+    """带首尾标记的字符二元组，短名称也至少有两个二元组"""
+    padded = '^' + text + '$'
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def max_edits(length, threshold):
+    """得分达到阈值时，较长名称为length个字所允许的最大编辑距离"""
+    return int(length * (1 - threshold) + 1e-9)
+
+
+def edit_distance(a, b, max_distance):
+    """Levenshtein编辑距离，超过max_distance时提前返回max_distance + 1"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class EntityLinker:
+    """按槽位划分的名称索引：names[槽位]为名称列表，lengths[槽位]为名称长度数组，
+    postings[槽位][二元组]为名称ID的有序数组"""
+
+    def __init__(self):
+        self.names = {}
+        self.ids = {}
+        self.lengths = {}
+        self.postings = {}
+
+    def build(self, names_by_slot):
+        """由{槽位: 名称列表}构建倒排索引"""
+        for slot, names in names_by_slot.items():
+            names = sorted(set(names))
+            self.names[slot] = names
+            self.ids[slot] = {name: i for i, name in enumerate(names)}
+            self.lengths[slot] = np.array([len(name) for name in names], dtype=np.int32)
+            postings = {}
+            for i, name in enumerate(names):
+                for gram in char_ngrams(name):
+                    postings.setdefault(gram, []).append(i)
+            self.postings[slot] = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        return self
+
+    def link(self, slot, mention, limit=3, threshold=DEFAULT_THRESHOLD):
+        """返回mention在该槽位下的候选标准名称[(名称, 得分)]，按得分降序"""
+        mention = (mention or '').strip()
+        names = self.names.get(slot)
+        if not mention or not names:
+            return []
+        if mention in self.ids[slot]:
+            return [(mention, 1.0)]
+        if len(mention) <= EXACT_ONLY_LENGTH:
+            return []
+
+        # 倒排表召回：统计每个名称与mention共享的二元组数
+        grams = char_ngrams(mention)
+        postings = self.postings[slot]
+        lists = [postings[gram] for gram in grams if gram in postings]
+        if not lists:
+            return []
+        overlap = np.bincount(np.concatenate(lists), minlength=len(names))
+
+        # 长度和二元组过滤：每次编辑最多破坏mention的两个二元组，长度差不能超过允许的编辑距离
+        lengths = self.lengths[slot]
+        max_distance = (np.maximum(lengths, len(mention)) * (1 - threshold) + 1e-9).astype(np.int32)
+        mask = (lengths > EXACT_ONLY_LENGTH) & (np.abs(lengths - len(mention)) <= max_distance) \
+            & (overlap >= np.maximum(len(grams) - 2 * max_distance, 1))
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        candidates = candidates[np.lexsort((lengths[candidates], -overlap[candidates]))][:MAX_CANDIDATES]
+
+        # 编辑距离校验：得分达到阈值所允许的最大距离
+        results = []
+        for i in candidates.tolist():
+            name = names[i]
+            longest = max(len(name), len(mention))
+            max_distance = max_edits(longest, threshold)
+            distance = edit_distance(mention, name, max_distance)
+            if distance <= max_distance:
+                results.append((name, round(1 - distance / longest, 4)))
+        # 同分时优先公共前缀更长的名称（如“鼻炎病”优先链接到“鼻炎”而不是“鼻病”）
+        results.sort(key=lambda item: (-item[1], -len(os.path.commonprefix([mention, item[0]]))))
+        return results[:limit]
+
+    def link_entities(self, entities, threshold=DEFAULT_THRESHOLD):
+        """把NER结果{槽位: 名称列表}中的名称替换为得分最高的标准名称，链接不上的丢弃"""
+        linked = {}
+        for slot, mentions in entities.items():
+            # 大模型有时把单个名称输出为字符串而不是列表
+            if isinstance(mentions, str):
+                mentions = [mentions]
+            values = []
+            for mention in mentions or []:
+                candidates = self.link(slot, mention, limit=1, threshold=threshold)
+                if candidates and candidates[0][0] not in values:
+                    values.append(candidates[0][0])
+            linked[slot] = values
+        return linked
+
+
+def load_entity_linker(cache_path=CACHE_PATH, rebuild=False):
+    """加载链接索引：CSV未变化时直接读取序列化缓存，否则重新构建并写缓存"""
+    return load_cached(EntityLinker, cache_path, CACHE_VERSION, csv_signature(),
+                       lambda: EntityLinker().build(load_entity_names()), rebuild=rebuild, label='实体链接索引')
+
+
+_entity_linker = SharedInstance(load_entity_linker)
+
+
+def get_entity_linker():
+    """获取进程级共享的链接索引，首次调用时加载"""
+    return _entity_linker.get()
+
+
+async def aget_entity_linker():
+    """get_entity_linker的异步版本，加载不阻塞事件循环"""
+    return await _entity_linker.aget()
+
+
+def reload_entity_linker():
+    """数据更新后重新加载链接索引（CSV变化时会自动重建）"""
+    return _entity_linker.reload()
+
+
+if __name__ == '__main__':
+    import time
+    start = time.perf_counter()
+    linker = load_entity_linker(rebuild=True)
+    print(f'构建索引耗时：{time.perf_counter() - start:.3f}秒')
+    start = time.perf_counter()
+    linker = load_entity_linker()
+    print(f'从缓存加载耗时：{time.perf_counter() - start:.3f}秒')
+    for slot, mention in [('disease', '百日咳病'), ('disease', '感冒'), ('symptom', '头疼'), ('drug', '阿莫西林')]:
+        start = time.perf_counter()
+        result = linker.link(slot, mention)
+        print(f'{mention} -> {result}（{(time.perf_counter() - start) * 1000:.3f}毫秒）')
@@ -0,0 +1,134 @@
+# entity_matcher.py
+"""
+基于词典的医疗实体识别
+用图谱中已知的疾病、症状、药品名称构建Aho-Corasick自动机，一次扫描找出问句中的全部名称，
+重叠时取最左最长匹配；自动机可序列化到磁盘，CSV未变化时直接加载
+"""
+
+import os
+from graph_engine import csv_signature, load_graph_engine
+from index_cache import load_cached, SharedInstance
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, 'data', 'entity_matcher.pkl')
+CACHE_VERSION = 2
+
+# 模板槽位到节点标签的映射，与NER输出的字段保持一致
+ENTITY_LABELS = {'disease': 'Disease', 'symptom': 'Symptom', 'drug': 'Drug'}
+# 参与匹配的最短名称长度，单字名称误匹配太多
+MIN_NAME_LENGTH = 2
+
+
+class EntityMatcher:
+    """Aho-Corasick多模式匹配器：状态0为根，goto[s]为转移表，fail[s]为失败指针，
+    outputs[s]为在状态s结束的全部名称（长度, 槽位元组）"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [()]
+
+    def build(self, names_by_slot):
+        """由{槽位: 名称集合}构建自动机"""
+        slots_by_name = {}
+        for slot, names in names_by_slot.items():
+            for name in names:
+                if len(name) >= MIN_NAME_LENGTH:
+                    slots_by_name.setdefault(name, []).append(slot)
+
+        for name, slots in slots_by_name.items():
+            state = 0
+            for char in name:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                state = next_state
+            self.outputs[state] = ((len(name), tuple(sorted(slots))),)
+
+        # 按BFS顺序计算失败指针，并把失败链上的输出并入当前状态
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+        return self
+
+    def find_all(self, text):
+        """扫描文本，返回全部匹配(起始位置, 结束位置, 槽位元组)"""
+        matches = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, slots in self.outputs[state]:
+                matches.append((end - length, end, slots))
+        return matches
+
+    def extract(self, text):
+        """识别实体，返回与NER输出结构相同的{槽位: 名称列表}；重叠的匹配只保留最左最长的一个"""
+        result = {slot: [] for slot in ENTITY_LABELS}
+        position = 0
+        for start, end, slots in sorted(self.find_all(text), key=lambda match: (match[0], -match[1])):
+            if start < position:
+                continue
+            position = end
+            name = text[start:end]
+            for slot in slots:
+                if name not in result[slot]:
+                    result[slot].append(name)
+        return result
+
+    @property
+    def state_count(self):
+        return len(self.goto)
+
+
+def load_entity_names():
+    """从内存图读取各槽位的名称（与Neo4j一致，只包含节点文件中的名称）
+
+    不使用进程级共享的内存图：它加载后不会随CSV更新，用旧名称重建的词典会以新的CSV签名落盘，
+    之后一直被当作有效缓存。load_graph_engine()按当前CSV签名校验，CSV变化时会重建内存图
+    """
+    engine = load_graph_engine()
+    return {slot: engine.names.get(label, []) for slot, label in ENTITY_LABELS.items()}
+
+
+def load_entity_matcher(cache_path=CACHE_PATH, rebuild=False):
+    """加载自动机：CSV未变化时直接读取序列化缓存，否则重新构建并写缓存"""
+    return load_cached(EntityMatcher, cache_path, CACHE_VERSION, csv_signature(),
+                       lambda: EntityMatcher().build(load_entity_names()), rebuild=rebuild, label='实体词典')
+
+
+_entity_matcher = SharedInstance(load_entity_matcher)
+
+
+def get_entity_matcher():
+    """获取进程级共享的实体匹配器，首次调用时加载"""
+    return _entity_matcher.get()
+
+
+async def aget_entity_matcher():
+    """get_entity_matcher的异步版本，加载不阻塞事件循环"""
+    return await _entity_matcher.aget()
+
+
+if __name__ == '__main__':
+    import time
+    start = time.perf_counter()
+    matcher = load_entity_matcher(rebuild=True)
+    print(f'构建自动机耗时：{time.perf_counter() - start:.3f}秒，状态数：{matcher.state_count}')
+    start = time.perf_counter()
+    matcher = load_entity_matcher()
+    print(f'从缓存加载耗时：{time.perf_counter() - start:.3f}秒')
+    print(matcher.extract('感冒吃什么药好得快？可以吃阿莫西林吗？'))
+    print(matcher.extract('百日咳会有哪些症状？'))
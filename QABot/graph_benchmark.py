@@ -0,0 +1,242 @@
+# graph_benchmark.py
+"""
+GRAPH_TEMPLATE查询基准测试
+从CSV中抽样真实的疾病/症状/药品名称，对每个模板逐条执行查询，统计延迟分位数、
+空结果数和结果长度；Neo4j后端额外用PROFILE统计db hits和行数。
+报告输出为JSON和Markdown，可与上一次的报告对比发现查询性能回退
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import argparse
+from datetime import datetime
+from config import GRAPH_TEMPLATE, render_graph_template
+from entity_matcher import load_entity_names
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, 'benchmark')
+
+DEFAULT_SAMPLES = 20
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 42
+PERCENTILES = (50, 90, 99)
+
+
+def sample_entities(samples, seed):
+    """按槽位从CSV名称中抽样，名称排序后再抽样，相同种子结果一致"""
+    rng = random.Random(seed)
+    sampled = {}
+    for slot, names in load_entity_names().items():
+        names = sorted(names)
+        sampled[slot] = rng.sample(names, min(samples, len(names)))
+    return sampled
+
+
+def percentile(values, p):
+    """最近秩法计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(p / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(values):
+    """均值、最大值和分位数"""
+    if not values:
+        return {}
+    summary = {'mean': round(sum(values) / len(values), 4), 'max': round(max(values), 4)}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = round(percentile(values, p), 4)
+    return summary
+
+
+def profile_totals(plan):
+    """累加PROFILE执行计划树中各算子的db hits，返回(db hits, 根算子输出行数)"""
+    def db_hits(node):
+        return node.get('dbHits', 0) + sum(db_hits(child) for child in node.get('children', []))
+    return db_hits(plan), plan.get('rows', 0)
+
+
+def payload_size(rows):
+    """结果中字符串值的总长度，近似拼进提示词的大小"""
+    return sum(len(str(value)) for row in rows for value in row.values() if value is not None)
+
+
+class MemoryRunner:
+    """进程内图引擎"""
+    name = 'memory'
+
+    def __init__(self):
+        from graph_engine import load_graph_engine
+        self.engine = load_graph_engine()
+
+    def run(self, template):
+        return self.engine.run_template(template['key'], template['params'])
+
+    def profile(self, template):
+        return None
+
+
+class Neo4jRunner:
+    """Neo4j连接池，绕过结果缓存直接执行"""
+    name = 'neo4j'
+
+    def __init__(self):
+        from utils import get_neo4j_pool
+        self.pool = get_neo4j_pool()
+        self.pool.verify()
+
+    def run(self, template):
+        return self.pool.read(template['cypher'], template['params'])
+
+    def profile(self, template):
+        return profile_totals(self.pool.profile(template['cypher'], template['params']))
+
+
+def benchmark(runner, entities, repeat, keys):
+    """逐个模板、逐个实体执行查询，返回各模板的统计"""
+    report = {}
+    for key in keys:
+        template = GRAPH_TEMPLATE[key]
+        slot = template['slots'][0]
+        latencies, db_hits, rows, payloads = [], [], [], []
+        errors = empty = 0
+        for value in entities.get(slot, []):
+            rendered = render_graph_template(key, template, {slot: value})
+            try:
+                # 第一次执行用于预热（编译执行计划），不计入延迟
+                result = runner.run(rendered)
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    runner.run(rendered)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                profile = runner.profile(rendered)
+            except Exception as e:
+                errors += 1
+                logger.warning(f"{key}（{value}）执行失败：{str(e)}")
+                continue
+            if not result or not any(value for row in result for value in row.values()):
+                empty += 1
+            payloads.append(payload_size(result))
+            if profile is not None:
+                db_hits.append(profile[0])
+                rows.append(profile[1])
+
+        stats = {
+            'entities': len(entities.get(slot, [])),
+            'runs': len(latencies),
+            'errors': errors,
+            'empty': empty,
+            'latency_ms': summarize(latencies),
+            'payload_chars': summarize(payloads),
+        }
+        if db_hits:
+            stats['db_hits'] = summarize(db_hits)
+            stats['rows'] = summarize(rows)
+        report[key] = stats
+        latency = stats['latency_ms']
+        logger.info(f"✅ {key}：{stats['runs']}次，p50 {latency.get('p50')}ms，p99 {latency.get('p99')}ms，"
+                    f"空结果{empty}，失败{errors}" + (f"，db hits均值{stats['db_hits']['mean']}" if db_hits else ''))
+    return report
+
+
+def compare(report, baseline):
+    """与基线报告对比p50延迟和db hits均值，返回{模板key: 变化}"""
+    changes = {}
+    for key, stats in report['templates'].items():
+        old = baseline.get('templates', {}).get(key)
+        if not old:
+            continue
+        change = {}
+        for metric, field in (('latency_ms', 'p50'), ('db_hits', 'mean')):
+            new_value = stats.get(metric, {}).get(field)
+            old_value = old.get(metric, {}).get(field)
+            if new_value is not None and old_value:
+                change[f'{metric}.{field}'] = round((new_value - old_value) / old_value * 100, 1)
+        changes[key] = change
+    return changes
+
+
+def render_markdown(report):
+    """把报告渲染为Markdown表格"""
+    lines = [
+        f"# GRAPH_TEMPLATE基准测试（{report['backend']}）",
+        '',
+        f"每个槽位抽样{report['samples']}个实体，每个实体重复{report['repeat']}次，随机种子{report['seed']}，"
+        f"生成时间{report['generated_at']}",
+        '',
+        '| 模板 | 执行次数 | 失败 | 空结果 | p50(ms) | p90(ms) | p99(ms) | 最大(ms) | 结果长度均值 | db hits均值 | db hits最大 | 行数均值 | p50变化 | db hits变化 |',
+        '| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: |',
+    ]
+    changes = report.get('compare', {})
+    for key, stats in report['templates'].items():
+        latency = stats['latency_ms']
+        db_hits = stats.get('db_hits', {})
+        change = changes.get(key, {})
+        cells = [
+            key, stats['runs'], stats['errors'], stats['empty'],
+            latency.get('p50', '-'), latency.get('p90', '-'), latency.get('p99', '-'), latency.get('max', '-'),
+            stats['payload_chars'].get('mean', '-'), db_hits.get('mean', '-'), db_hits.get('max', '-'),
+            stats.get('rows', {}).get('mean', '-'),
+            f"{change['latency_ms.p50']:+}%" if 'latency_ms.p50' in change else '-',
+            f"{change['db_hits.mean']:+}%" if 'db_hits.mean' in change else '-',
+        ]
+        lines.append('| ' + ' | '.join(str(cell) for cell in cells) + ' |')
+    return '\n'.join(lines) + '\n'
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='GRAPH_TEMPLATE查询基准测试')
+    parser.add_argument('--backend', choices=['neo4j', 'memory'], default=os.getenv('GRAPH_BACKEND', 'neo4j').lower(),
+                        help='图谱后端，默认取GRAPH_BACKEND环境变量')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='每个槽位抽样的实体数')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个实体重复执行的次数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='抽样随机种子')
+    parser.add_argument('--templates', nargs='*', choices=list(GRAPH_TEMPLATE), help='只测试指定的模板')
+    parser.add_argument('--output', default=OUTPUT_DIR, help='报告输出目录')
+    parser.add_argument('--baseline', help='对比的基线JSON报告')
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    runner = MemoryRunner() if args.backend == 'memory' else Neo4jRunner()
+    entities = sample_entities(args.samples, args.seed)
+    keys = args.templates or list(GRAPH_TEMPLATE)
+
+    report = {
+        'backend': runner.name,
+        'samples': args.samples,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'templates': benchmark(runner, entities, args.repeat, keys),
+    }
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['compare'] = compare(report, json.load(f))
+
+    os.makedirs(args.output, exist_ok=True)
+    json_path = os.path.join(args.output, f'graph_benchmark_{runner.name}.json')
+    markdown_path = os.path.join(args.output, f'graph_benchmark_{runner.name}.md')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    with open(markdown_path, 'w', encoding='utf-8') as f:
+        f.write(render_markdown(report))
+    logger.info(f"✅ 报告已写入：{json_path}，{markdown_path}")
+
+
+if __name__ == "__main__":
+    main()
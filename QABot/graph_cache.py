@@ -0,0 +1,199 @@
+# graph_cache.py
+"""
+图谱模板查询结果缓存
+以(模板key, 实体参数)为键缓存图谱查询结果，LRU淘汰 + TTL过期，
+查不到的实体同样缓存（负缓存，使用单独的TTL），并统计命中/未命中次数。
+数据重新导入后调用invalidate_graph_cache()失效缓存：同进程内直接清空，
+其他进程通过代际文件的修改时间感知失效
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATION_FILE = os.path.join(BASE_DIR, 'data', 'graph_cache.generation')
+
+# 默认缓存条目数、正常结果TTL和负缓存TTL（秒）
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 3600.0
+DEFAULT_NEGATIVE_TTL = 300.0
+# 检查代际文件的最小间隔（秒）
+GENERATION_CHECK_INTERVAL = 1.0
+
+
+def cache_key(template):
+    """由渲染后的模板生成缓存键：(模板key, 排序后的参数)"""
+    return template['key'], tuple(sorted(template['params'].items()))
+
+
+def is_negative(result):
+    """空结果或全部列为空的结果视为实体不存在"""
+    return not result or not any(value for row in result for value in row.values())
+
+
+def generation_stamp(path=GENERATION_FILE):
+    """读取代际文件的修改时间，文件不存在时返回None"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class GraphResultCache:
+    """线程安全的LRU + TTL结果缓存"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 generation_path=GENERATION_FILE):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.generation_path = generation_path
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # 键 -> (过期时间, 结果)
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self.generation = generation_stamp(generation_path)
+        self.generation_checked = time.monotonic()
+
+    def check_generation(self, now):
+        """按间隔检查代际文件，其他进程导入数据后清空本地缓存，调用方需持有锁"""
+        if now - self.generation_checked < GENERATION_CHECK_INTERVAL:
+            return
+        self.generation_checked = now
+        generation = generation_stamp(self.generation_path)
+        if generation != self.generation:
+            self.generation = generation
+            self.entries.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        """查找缓存，返回(是否命中, 结果)"""
+        now = time.monotonic()
+        with self.lock:
+            self.check_generation(now)
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            result = entry[1]
+            if is_negative(result):
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, result
+
+    def put(self, key, result):
+        """写入结果，超过容量时淘汰最久未使用的条目"""
+        ttl = self.negative_ttl if is_negative(result) else self.ttl
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """清空本进程缓存"""
+        with self.lock:
+            self.entries.clear()
+            self.generation = generation_stamp(self.generation_path)
+            self.invalidations += 1
+
+    def stats(self):
+        """返回命中统计"""
+        with self.lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+class CachedGraphBackend:
+    """在图谱后端前加一层结果缓存，未命中的模板仍合并为一次批量查询"""
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+
+    def lookup(self, templates):
+        """返回(结果列表, 未命中的下标)，未命中的位置为None"""
+        results = [None] * len(templates)
+        missing = []
+        for idx, template in enumerate(templates):
+            hit, result = self.cache.get(cache_key(template))
+            if hit:
+                results[idx] = result
+            else:
+                missing.append(idx)
+        return results, missing
+
+    def fill(self, templates, results, missing, fetched):
+        for idx, result in zip(missing, fetched):
+            results[idx] = result
+            # 查询异常不缓存，下次重试
+            if not isinstance(result, Exception):
+                self.cache.put(cache_key(templates[idx]), result)
+        return results
+
+    def run_templates(self, templates):
+        results, missing = self.lookup(templates)
+        if missing:
+            fetched = self.backend.run_templates([templates[idx] for idx in missing])
+            self.fill(templates, results, missing, fetched)
+        return results
+
+    async def arun_templates(self, templates):
+        results, missing = self.lookup(templates)
+        if missing:
+            fetched = await self.backend.arun_templates([templates[idx] for idx in missing])
+            self.fill(templates, results, missing, fetched)
+        return results
+
+
+_graph_cache = None
+_graph_cache_lock = threading.Lock()
+
+
+def get_graph_cache():
+    """获取进程级共享缓存，容量和TTL由GRAPH_CACHE_SIZE、GRAPH_CACHE_TTL、GRAPH_CACHE_NEGATIVE_TTL配置"""
+    global _graph_cache
+    if _graph_cache is None:
+        with _graph_cache_lock:
+            if _graph_cache is None:
+                _graph_cache = GraphResultCache(
+                    maxsize=int(os.getenv('GRAPH_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+                    ttl=float(os.getenv('GRAPH_CACHE_TTL', DEFAULT_CACHE_TTL)),
+                    negative_ttl=float(os.getenv('GRAPH_CACHE_NEGATIVE_TTL', DEFAULT_NEGATIVE_TTL)),
+                )
+    return _graph_cache
+
+
+def invalidate_graph_cache():
+    """数据重新导入后调用：更新代际文件通知其他进程，并清空本进程缓存
+
+    内存图、实体词典等共享实例（index_cache.SharedInstance）同样监听代际文件，随后重新加载
+    """
+    os.makedirs(os.path.dirname(GENERATION_FILE), exist_ok=True)
+    with open(GENERATION_FILE, 'w', encoding='utf-8') as f:
+        f.write(str(time.time()))
+    if _graph_cache is not None:
+        _graph_cache.clear()
@@ -0,0 +1,241 @@
+# graph_engine.py
+"""
+进程内只读知识图谱引擎
+从doctor/nodes和doctor/relations加载数据，节点名称按标签驻留为整数ID，
+每种关系类型、每个方向各用一组CSR数组（偏移数组 + 目标数组）存储邻接表，
+不经过网络即可回答GRAPH_TEMPLATE中的全部意图；关系与导入时一样经过引用完整性过滤，
+查询结果与Neo4j中执行对应Cypher的结果一致
+"""
+
+import os
+from array import array
+from collections import Counter
+from itertools import accumulate
+from operator import itemgetter
+from config import NODE_CONFIGS, RELATIONSHIP_CONFIGS
+from csv_stream import iter_csv_rows
+from data_validation import new_report, filter_relation_rows
+from index_cache import load_cached, SharedInstance
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NODES_PATH = os.path.join(BASE_DIR, 'doctor', 'nodes')
+RELATIONS_PATH = os.path.join(BASE_DIR, 'doctor', 'relations')
+CACHE_PATH = os.path.join(BASE_DIR, 'data', 'graph_engine.pkl')
+CACHE_VERSION = 3
+
+# 模板意图到图查询的映射，语义与config.GRAPH_TEMPLATE中的Cypher保持一致：
+# 节点不存在时返回空列表（MATCH不到行）；
+# property：读取节点属性；out/in：沿关系正向/反向收集邻居名称；
+# out_all：多个关系同时存在时才返回（对应cure_way中的WHERE size(...) > 0）；
+# 名称列表按邻居节点的度数降序、名称升序排列，最多返回params['limit']个，总数放在TOTAL列
+TEMPLATE_QUERIES = {
+    'desc': {'kind': 'property', 'label': 'Disease', 'slot': 'disease', 'property': 'desc'},
+    'cause': {'kind': 'property', 'label': 'Disease', 'slot': 'disease', 'property': 'cause'},
+    'disease_symptom': {'kind': 'out', 'rel_type': 'DISEASE_SYMPTOM', 'slot': 'disease'},
+    'symptom': {'kind': 'in', 'rel_type': 'DISEASE_SYMPTOM', 'slot': 'symptom'},
+    'cure_way': {'kind': 'out_all', 'rel_types': ['DISEASE_CUREWAY', 'DISEASE_DRUG', 'DISEASE_DO_EAT'],
+                 'slot': 'disease', 'columns': ['RES1', 'RES2', 'RES3'], 'totals': ['TOTAL1', 'TOTAL2', 'TOTAL3']},
+    'cure_department': {'kind': 'out', 'rel_type': 'DISEASE_DEPARTMENT', 'slot': 'disease'},
+    'prevent': {'kind': 'property', 'label': 'Disease', 'slot': 'disease', 'property': 'prevent'},
+    'not_eat': {'kind': 'out', 'rel_type': 'DISEASE_NOT_EAT', 'slot': 'disease'},
+    'check': {'kind': 'out', 'rel_type': 'DISEASE_CHECK', 'slot': 'disease'},
+    'cured_prob': {'kind': 'property', 'label': 'Disease', 'slot': 'disease', 'property': 'cured_prob'},
+    'acompany': {'kind': 'out', 'rel_type': 'DISEASE_ACOMPANY', 'slot': 'disease'},
+    'indications': {'kind': 'in', 'rel_type': 'DISEASE_DRUG', 'slot': 'drug'},
+}
+
+
+def build_csr(pairs, size):
+    """由(源ID, 目标ID)列表构建CSR：offsets[i]:offsets[i+1]为源i的邻居区间
+
+    按源ID稳定排序后顺序写出目标，同一源的邻居保持原有顺序；计数和排序都在C层完成
+    """
+    counts = Counter(map(itemgetter(0), pairs))
+    offsets = array('I', accumulate((counts.get(i, 0) for i in range(size)), initial=0))
+    targets = array('I', map(itemgetter(1), sorted(pairs, key=itemgetter(0))))
+    return offsets, targets
+
+
+class GraphEngine:
+    """只读内存图：按标签驻留节点名称，按关系类型和方向存储CSR邻接表"""
+
+    def __init__(self):
+        self.names = {}         # 标签 -> ID对应的名称列表
+        self.ids = {}           # 标签 -> {名称: ID}
+        self.properties = {}    # 标签 -> {ID: 属性字典}（只保存name以外的属性）
+        self.adjacency = {}     # 关系类型 -> {'out': (offsets, targets), 'in': (offsets, targets)}
+        self.degrees = {}       # 标签 -> 各节点在全部关系类型上的度数，用作结果排序信号
+
+    def intern(self, label, name):
+        """返回名称在标签内的整数ID，不存在时分配新ID"""
+        ids = self.ids.setdefault(label, {})
+        node_id = ids.get(name)
+        if node_id is None:
+            names = self.names.setdefault(label, [])
+            node_id = len(names)
+            ids[name] = node_id
+            names.append(name)
+        return node_id
+
+    def node_id(self, label, name):
+        """查找节点ID，不存在时返回None"""
+        return self.ids.get(label, {}).get(name)
+
+    def node_count(self, label):
+        return len(self.names.get(label, []))
+
+    def load_csv(self, nodes_path=NODES_PATH, relations_path=RELATIONS_PATH):
+        """从CSV构建图；节点只来自节点文件，关系按导入时的规则过滤空端点、悬空端点、自环和重复行"""
+        for label, config in NODE_CONFIGS.items():
+            self.names.setdefault(label, [])
+            self.ids.setdefault(label, {})
+            file_path = os.path.join(nodes_path, config['file'])
+            if not os.path.exists(file_path):
+                continue
+            extra = [prop for prop in config['properties'] if prop != 'name']
+            props = self.properties.setdefault(label, {})
+            reader, _ = iter_csv_rows(file_path)
+            for row in reader:
+                name = (row.get('name') or '').strip()
+                if not name:
+                    continue
+                node_id = self.intern(label, name)
+                if extra:
+                    props[node_id] = {prop: (row.get(prop) or '').strip() or None for prop in extra}
+
+        edges = {}
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            file_path = os.path.join(relations_path, config['file'])
+            if not os.path.exists(file_path):
+                continue
+            from_ids = self.ids[config['from_type']]
+            to_ids = self.ids[config['to_type']]
+            reader, _ = iter_csv_rows(file_path)
+            edges[rel_type] = [(from_ids[row['from']], to_ids[row['to']])
+                               for row in filter_relation_rows(reader, from_ids, to_ids, new_report())]
+
+        # 所有节点驻留完成后再按最终节点数构建CSR
+        for rel_type, pairs in edges.items():
+            config = RELATIONSHIP_CONFIGS[rel_type]
+            self.adjacency[rel_type] = {
+                'out': build_csr(pairs, self.node_count(config['from_type'])),
+                'in': build_csr([(target, source) for source, target in pairs], self.node_count(config['to_type'])),
+            }
+
+        degree_counts = {label: Counter() for label in self.names}
+        for rel_type, pairs in edges.items():
+            config = RELATIONSHIP_CONFIGS[rel_type]
+            degree_counts[config['from_type']].update(map(itemgetter(0), pairs))
+            degree_counts[config['to_type']].update(map(itemgetter(1), pairs))
+        for label, counts in degree_counts.items():
+            self.degrees[label] = array('I', (counts.get(i, 0) for i in range(self.node_count(label))))
+        return self
+
+    def neighbor_ids(self, rel_type, node_id, direction='out'):
+        """返回节点在某关系类型某方向上的邻居ID区间"""
+        csr = self.adjacency.get(rel_type)
+        if csr is None or node_id is None:
+            return array('I')
+        offsets, targets = csr[direction]
+        if node_id + 1 >= len(offsets):
+            return array('I')
+        return targets[offsets[node_id]:offsets[node_id + 1]]
+
+    def neighbors(self, rel_type, name, direction='out'):
+        """按名称返回邻居名称列表，按邻居度数降序、名称升序排列"""
+        config = RELATIONSHIP_CONFIGS[rel_type]
+        source_label, target_label = (config['from_type'], config['to_type']) if direction == 'out' \
+            else (config['to_type'], config['from_type'])
+        target_names = self.names.get(target_label, [])
+        degrees = self.degrees.get(target_label, ())
+        ids = self.neighbor_ids(rel_type, self.node_id(source_label, name), direction)
+        return [target_names[i] for i in sorted(ids, key=lambda i: (-degrees[i], target_names[i]))]
+
+    def run_template(self, key, params):
+        """执行一个GRAPH_TEMPLATE意图，返回与Cypher结果相同结构的行列表"""
+        spec = TEMPLATE_QUERIES[key]
+        value = params[spec['slot']]
+        limit = params.get('limit')
+        kind = spec['kind']
+
+        if kind == 'property':
+            node_id = self.node_id(spec['label'], value)
+            if node_id is None:
+                return []
+            return [{'RES': self.properties.get(spec['label'], {}).get(node_id, {}).get(spec['property'])}]
+
+        if kind in ('out', 'in'):
+            config = RELATIONSHIP_CONFIGS[spec['rel_type']]
+            if self.node_id(config['from_type' if kind == 'out' else 'to_type'], value) is None:
+                return []
+            names = self.neighbors(spec['rel_type'], value, kind)
+            return [{'RES': '、'.join(names[:limit]), 'TOTAL': len(names)}]
+
+        if kind == 'out_all':
+            groups = [self.neighbors(rel_type, value) for rel_type in spec['rel_types']]
+            # 任一种关系不存在时WHERE过滤掉该行（节点不存在时同样没有邻居）
+            if not all(groups):
+                return []
+            row = {column: '、'.join(group[:limit]) for column, group in zip(spec['columns'], groups)}
+            row.update({total: len(group) for total, group in zip(spec['totals'], groups)})
+            return [row]
+
+        raise ValueError(f'未知的模板查询类型：{kind}')
+
+    def run_templates(self, templates):
+        """批量执行渲染后的模板（含key和params），单个失败以异常对象返回"""
+        results = []
+        for template in templates:
+            try:
+                results.append(self.run_template(template['key'], template['params']))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def arun_templates(self, templates):
+        """内存查询只需微秒级，直接在事件循环中执行"""
+        return self.run_templates(templates)
+
+
+def csv_signature(nodes_path=NODES_PATH, relations_path=RELATIONS_PATH):
+    """CSV文件的(路径, 大小, 修改时间)签名，用于判断缓存是否失效"""
+    signature = []
+    for path, configs in ((nodes_path, NODE_CONFIGS), (relations_path, RELATIONSHIP_CONFIGS)):
+        for config in configs.values():
+            file_path = os.path.join(path, config['file'])
+            if os.path.exists(file_path):
+                stat = os.stat(file_path)
+                signature.append((config['file'], stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def load_graph_engine(cache_path=CACHE_PATH, rebuild=False):
+    """加载内存图：CSV未变化时直接读取序列化缓存，否则从CSV重建并写缓存"""
+    return load_cached(GraphEngine, cache_path, CACHE_VERSION, csv_signature(), lambda: GraphEngine().load_csv(),
+                       rebuild=rebuild, label='图谱')
+
+
+_graph_engine = SharedInstance(load_graph_engine)
+
+
+def get_graph_engine():
+    """获取进程级共享的内存图，首次调用时加载；数据重新导入后（代际文件变化）重新加载，
+    避免GRAPH_BACKEND=memory时结果缓存失效后又从旧图上查到旧结果"""
+    return _graph_engine.get()
+
+
+async def aget_graph_engine():
+    """get_graph_engine的异步版本，加载不阻塞事件循环"""
+    return await _graph_engine.aget()
+
+
+if __name__ == '__main__':
+    import time
+    start = time.perf_counter()
+    engine = load_graph_engine(rebuild=True)
+    print(f'从CSV构建耗时：{time.perf_counter() - start:.3f}秒')
+    start = time.perf_counter()
+    engine = load_graph_engine()
+    print(f'从缓存加载耗时：{time.perf_counter() - start:.3f}秒')
+    print(engine.run_template('disease_symptom', {'disease': '百日咳'}))
+    print(engine.run_template('cure_way', {'disease': '百日咳'}))
@@ -0,0 +1,196 @@
+# import_progress.py
+"""
+导入断点与进度统计
+每个批次提交前记录正在提交的行数，提交后推进检查点（文件、行偏移、批次号），中断后可从最后提交的位置继续，
+中断时正在提交的批次由调用方幂等重放；失败的批次不推进检查点，--resume时从该批次重试。
+同时通过日志和JSON状态文件输出已完成行数、速度、预计剩余时间和失败行数
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_FILE = os.path.join(BASE_DIR, 'import_checkpoint.json')
+STATUS_FILE = os.path.join(BASE_DIR, 'import_status.json')
+
+# 进度日志和状态文件的最小刷新间隔（秒）
+PROGRESS_INTERVAL = 10.0
+
+
+def write_json_atomic(path, data):
+    """先写临时文件再替换，避免轮询方读到半截内容"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ImportProgress:
+    """导入检查点与进度统计，可被多个工作线程共享"""
+
+    def __init__(self, database_name, resume=False, checkpoint_path=CHECKPOINT_FILE,
+                 status_path=STATUS_FILE, interval=PROGRESS_INTERVAL):
+        self.database_name = database_name
+        self.checkpoint_path = checkpoint_path
+        self.status_path = status_path
+        self.interval = interval
+        self.lock = threading.Lock()
+
+        self.streams = {}
+        self.rows_total = 0
+        self.rows_done = 0
+        self.rows_resumed = 0
+        self.rows_failed = 0
+        self.current = None
+        self.started_at = time.time()
+        self.last_report = 0.0
+
+        # 只在续传时读取检查点；构造时不删除，增量导入、只计算聚合属性等不会影响未完成的全量导入
+        if resume:
+            self.load_checkpoint()
+
+    def reset(self):
+        """开始新的全量导入：丢弃旧检查点"""
+        with self.lock:
+            self.streams = {}
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+
+    def load_checkpoint(self):
+        """读取检查点，数据库不一致时忽略"""
+        if not os.path.exists(self.checkpoint_path):
+            logger.warning("未找到导入检查点")
+            return
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('database') != self.database_name:
+            logger.warning(f"检查点属于数据库{checkpoint.get('database')}，与当前数据库不一致，已忽略")
+            return
+        self.streams = checkpoint.get('streams', {})
+        done = sum(1 for stream in self.streams.values() if stream.get('done'))
+        logger.info(f"已加载导入检查点：{len(self.streams)}个数据流，其中{done}个已完成")
+
+    def save_checkpoint(self):
+        """持久化检查点，调用方需持有锁"""
+        write_json_atomic(self.checkpoint_path, {
+            'database': self.database_name,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'streams': self.streams,
+        })
+
+    def add_total(self, rows):
+        """累加预计导入的总行数"""
+        with self.lock:
+            self.rows_total += rows
+
+    def start_stream(self, key, file_hash):
+        """开始一个数据流（文件或文件分区），返回(已提交行偏移, 下一个批次号)，已完成时返回None
+
+        文件内容变化后检查点失效，该数据流从头开始
+        """
+        with self.lock:
+            stream = self.streams.get(key)
+            if stream and stream.get('file_hash') != file_hash:
+                logger.warning(f"{key}自上次导入后已变化，检查点失效，从头导入")
+                stream = None
+            if stream is None:
+                stream = {'file_hash': file_hash, 'row_offset': 0, 'batch_id': 0, 'pending': 0, 'done': False}
+                self.streams[key] = stream
+            else:
+                self.rows_resumed += stream['row_offset']
+                self.rows_done += stream['row_offset']
+                if stream['done']:
+                    logger.info(f"{key}已在上次导入中完成，跳过")
+                    return None
+                if stream['row_offset']:
+                    logger.info(f"{key}从第{stream['row_offset']}行（批次{stream['batch_id']}）继续导入")
+            self.current = key
+            return stream['row_offset'], stream['batch_id']
+
+    def pending_rows(self, key):
+        """上次中断时正在提交、不确定是否已写入的行数（从row_offset开始）"""
+        with self.lock:
+            return self.streams[key].get('pending', 0)
+
+    def begin_batch(self, key, rows):
+        """提交批次前记录其行数，提交成功前中断时续传方据此幂等重放"""
+        with self.lock:
+            self.streams[key]['pending'] = rows
+            self.save_checkpoint()
+
+    def commit_batch(self, key, rows):
+        """记录一个已提交的批次并推进检查点"""
+        with self.lock:
+            stream = self.streams[key]
+            stream['row_offset'] += rows
+            stream['batch_id'] += 1
+            stream['pending'] = 0
+            self.rows_done += rows
+            self.save_checkpoint()
+            self.report()
+
+    def fail_batch(self, key, rows):
+        """记录一个已回滚的失败批次：检查点停在该批次之前，调用方应停止该数据流"""
+        with self.lock:
+            self.streams[key]['pending'] = 0
+            self.rows_failed += rows
+            self.save_checkpoint()
+            self.report(force=True)
+
+    def complete(self):
+        """所有数据流是否都已完成（没有因失败批次停下的数据流）"""
+        with self.lock:
+            return all(stream['done'] for stream in self.streams.values())
+
+    def finish_stream(self, key):
+        """标记数据流完成"""
+        with self.lock:
+            self.streams[key]['done'] = True
+            self.save_checkpoint()
+
+    def snapshot(self, state='running'):
+        """生成当前进度的状态字典，调用方需持有锁"""
+        elapsed = time.time() - self.started_at
+        processed = self.rows_done - self.rows_resumed
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.rows_total - self.rows_done, 0)
+        return {
+            'state': state,
+            'database': self.database_name,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'current': self.current,
+            'rows_total': self.rows_total,
+            'rows_done': self.rows_done,
+            'rows_resumed': self.rows_resumed,
+            'rows_failed': self.rows_failed,
+            'rows_per_second': round(rate, 1),
+            'eta_seconds': round(remaining / rate, 1) if rate > 0 else None,
+            'elapsed_seconds': round(elapsed, 1),
+        }
+
+    def report(self, force=False):
+        """按间隔输出进度日志并刷新状态文件，调用方需持有锁"""
+        now = time.time()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        status = self.snapshot()
+        write_json_atomic(self.status_path, status)
+        percent = status['rows_done'] * 100 / status['rows_total'] if status['rows_total'] else 0.0
+        eta = f"{status['eta_seconds']:.0f}秒" if status['eta_seconds'] is not None else '未知'
+        logger.info(f"进度：{status['rows_done']}/{status['rows_total']}行（{percent:.1f}%），"
+                    f"失败{status['rows_failed']}行，速度{status['rows_per_second']}行/秒，预计剩余{eta}")
+
+    def finish(self, state='finished'):
+        """写入最终状态；成功完成时删除检查点"""
+        with self.lock:
+            write_json_atomic(self.status_path, self.snapshot(state))
+            if state == 'finished' and os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
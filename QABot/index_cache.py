@@ -0,0 +1,88 @@
+# index_cache.py
+"""
+由CSV派生的本地索引（内存图、实体词典、实体链接索引）的公共加载逻辑
+序列化缓存按版本号和CSV签名校验，失效时重建并原子写回；进程级共享实例在首次使用时加载，
+图谱数据重新导入（代际文件变化）后自动重新加载
+"""
+
+import os
+import time
+import pickle
+import asyncio
+import threading
+from graph_cache import GENERATION_FILE, GENERATION_CHECK_INTERVAL, generation_stamp
+
+
+def load_cached(cls, cache_path, version, signature, build, rebuild=False, label='索引'):
+    """读取序列化缓存：版本和签名都一致时直接恢复，否则调用build()重建并写缓存
+
+    只序列化对象的__dict__，恢复时新建cls实例再填充状态，类定义的路径变化不影响读取
+    """
+    if not rebuild and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('version') == version and cached.get('signature') == signature:
+                instance = cls()
+                instance.__dict__.update(cached['state'])
+                return instance
+        except Exception as e:
+            print(f'{label}缓存读取失败，重新构建：{str(e)}')
+
+    instance = build()
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': version, 'signature': signature, 'state': instance.__dict__}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return instance
+
+
+class SharedInstance:
+    """进程级共享实例：首次get()时调用loader加载（双重检查加锁），reload()显式重新加载
+
+    按间隔检查图谱代际文件（invalidate_graph_cache()更新），数据重新导入后下一次get()重新加载；
+    重新加载期间其他线程继续使用旧实例。异步请求路径使用aget()，加载在线程池中执行
+    """
+
+    def __init__(self, loader, generation_path=GENERATION_FILE):
+        self.loader = loader
+        self.generation_path = generation_path
+        self.instance = None
+        self.generation = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    def due(self):
+        return time.monotonic() - self.checked >= GENERATION_CHECK_INTERVAL
+
+    def get(self):
+        if self.instance is not None and not self.due():
+            return self.instance
+        with self.lock:
+            if self.instance is None or self.due():
+                self.checked = time.monotonic()
+                generation = generation_stamp(self.generation_path)
+                if self.instance is None or generation != self.generation:
+                    if self.instance is not None:
+                        print(f'图谱数据已更新，重新加载{self.loader.__name__}')
+                    self.instance = self.loader()
+                    self.generation = generation
+        return self.instance
+
+    async def aget(self):
+        """get()的异步版本：需要检查代际或（重新）加载时放到线程池执行，不阻塞事件循环"""
+        if self.instance is not None and not self.due():
+            return self.instance
+        return await asyncio.to_thread(self.get)
+
+    def reload(self):
+        """重新加载并替换共享实例"""
+        generation = generation_stamp(self.generation_path)
+        instance = self.loader()
+        with self.lock:
+            self.instance = instance
+            self.generation = generation
+            self.checked = time.monotonic()
+        return instance
@@ -0,0 +1,144 @@
+# intent_index.py
+"""
+图谱模板意图索引
+每个GRAPH_TEMPLATE的问题按“/”拆成若干问法，槽位替换为通用词（与具体实体无关），
+只在首次使用或嵌入模型变化时计算一次向量并持久化；
+每次请求只对（同样遮盖实体后的）用户问题做一次嵌入，用NumPy与固定矩阵计算余弦相似度
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from config import GRAPH_TEMPLATE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(BASE_DIR, 'data', 'intent_index.npz')
+
+# 槽位遮盖词：模板问法和用户问题中的实体都替换为对应的通用词
+SLOT_MASKS = {'disease': '某种疾病', 'symptom': '某种症状', 'drug': '某种药物'}
+# 每次请求选出的模板意图数
+DEFAULT_TOP_K = 5
+
+
+def mask_template(question):
+    """把模板问题中的%槽位%替换为遮盖词"""
+    for slot, mask in SLOT_MASKS.items():
+        question = question.replace(f'%{slot}%', mask)
+    return question
+
+
+def template_variants():
+    """展开全部模板问法，返回[(模板key, 遮盖后的问法)]"""
+    variants = []
+    for key, template in GRAPH_TEMPLATE.items():
+        for question in template['question'].split('/'):
+            question = question.strip()
+            if question:
+                variants.append((key, mask_template(question)))
+    return variants
+
+
+def mask_query(query, entities):
+    """把用户问题中识别出的实体替换为遮盖词，较长的名称先替换"""
+    replacements = [(value, SLOT_MASKS[slot]) for slot, values in entities.items()
+                    if slot in SLOT_MASKS for value in values or [] if value]
+    for value, mask in sorted(replacements, key=lambda item: -len(item[0])):
+        query = query.replace(value, mask)
+    return query
+
+
+def embedding_model_version():
+    """嵌入模型版本：模型名称变化后索引需要重建"""
+    return os.getenv('BAILIAN_EMBEDDINGS_MODEL') or 'default'
+
+
+def normalize(matrix):
+    """按行归一化，之后点积即为余弦相似度"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class IntentIndex:
+    """模板问法向量矩阵：keys[i]为第i行问法对应的模板key"""
+
+    def __init__(self, keys, texts, matrix, model, digest):
+        self.keys = keys
+        self.texts = texts
+        self.matrix = matrix
+        self.model = model
+        self.digest = digest
+
+    @classmethod
+    def build(cls, embeddings):
+        variants = template_variants()
+        keys = [key for key, _ in variants]
+        texts = [text for _, text in variants]
+        matrix = normalize(np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+        return cls(keys, texts, matrix, embedding_model_version(), templates_digest(texts))
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, matrix=self.matrix,
+                 meta=np.array(json.dumps({'keys': self.keys, 'texts': self.texts,
+                                           'model': self.model, 'digest': self.digest}, ensure_ascii=False)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta['keys'], meta['texts'], data['matrix'], meta['model'], meta['digest'])
+
+    def scores(self, query_vector):
+        """返回{模板key: 最高问法相似度}"""
+        similarities = self.matrix @ normalize(np.asarray(query_vector, dtype=np.float32))
+        scores = {}
+        for key, score in zip(self.keys, similarities.tolist()):
+            if score > scores.get(key, -1.0):
+                scores[key] = score
+        return scores
+
+    def rank(self, query_vector, candidates=None, k=DEFAULT_TOP_K):
+        """按相似度返回前k个模板key，candidates限定可选的模板（如实体槽位已填充的模板）"""
+        scores = self.scores(query_vector)
+        if candidates is not None:
+            scores = {key: scores[key] for key in candidates if key in scores}
+        return sorted(scores, key=lambda key: -scores[key])[:k]
+
+
+def templates_digest(texts):
+    """模板问法的摘要：GRAPH_TEMPLATE的问题变化后索引需要重建"""
+    return hashlib.md5('\n'.join(texts).encode('utf-8')).hexdigest()
+
+
+def load_intent_index(embeddings, path=INDEX_PATH, rebuild=False):
+    """加载意图索引：嵌入模型和模板问法都未变化时直接读取，否则重新计算并保存"""
+    if not rebuild and os.path.exists(path):
+        try:
+            index = IntentIndex.load(path)
+            texts = [text for _, text in template_variants()]
+            if index.model == embedding_model_version() and index.digest == templates_digest(texts):
+                return index
+        except Exception as e:
+            print(f'意图索引读取失败，重新构建：{str(e)}')
+
+    index = IntentIndex.build(embeddings)
+    index.save(path)
+    return index
+
+
+_intent_index = None
+_intent_index_lock = threading.Lock()
+
+
+def get_intent_index(embeddings):
+    """获取进程级共享的意图索引，首次调用时加载"""
+    global _intent_index
+    if _intent_index is None:
+        with _intent_index_lock:
+            if _intent_index is None:
+                _intent_index = load_intent_index(embeddings)
+    return _intent_index
@@ -0,0 +1,178 @@
+# neo4j_bulk_export.py
+"""
+Neo4j离线批量导入数据导出脚本
+将doctor/nodes和doctor/relations下的GBK编码CSV转换为neo4j-admin database import所需的
+表头文件 + 数据文件格式（UTF-8），用于全新数据库的冷启动构建
+"""
+
+import os
+import csv
+import shlex
+import hashlib
+import logging
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import NODE_CONFIGS, RELATIONSHIP_CONFIGS
+from csv_stream import iter_csv_rows
+from data_validation import new_report, filter_relation_rows
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NODES_PATH = os.path.join(BASE_DIR, 'doctor', 'nodes')
+RELATIONS_PATH = os.path.join(BASE_DIR, 'doctor', 'relations')
+
+
+def node_id(label, name):
+    """根据标签和名称生成稳定的节点ID，多次导出结果一致"""
+    return label + ':' + hashlib.md5(name.encode('utf-8')).hexdigest()[:16]
+
+
+def export_nodes(label, output_dir):
+    """流式导出单个节点类型，返回(标签, 名称集合, 统计信息)"""
+    config = NODE_CONFIGS[label]
+    file_path = os.path.join(NODES_PATH, config['file'])
+    properties = config['properties']
+    start = time.perf_counter()
+
+    header_path = os.path.join(output_dir, f'{label}_header.csv')
+    data_path = os.path.join(output_dir, f'{label}.csv')
+    with open(header_path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerow([f'id:ID({label})'] + properties)
+
+    reader, encoding = iter_csv_rows(file_path)
+    names = set()
+    stats = {'rows': 0, 'written': 0, 'duplicates': 0, 'empty': 0, 'encoding': encoding}
+    with open(data_path, 'w', encoding='utf-8', newline='') as dst:
+        writer = csv.writer(dst)
+        for row in reader:
+            stats['rows'] += 1
+            name = (row.get('name') or '').strip()
+            if not name:
+                stats['empty'] += 1
+                continue
+            if name in names:
+                stats['duplicates'] += 1
+                continue
+            names.add(name)
+            writer.writerow([node_id(label, name)] + [(row.get(prop) or '').strip() for prop in properties])
+            stats['written'] += 1
+
+    stats['elapsed'] = time.perf_counter() - start
+    return label, names, stats
+
+
+def export_relationships(rel_type, from_names, to_names, output_dir):
+    """流式导出单个关系类型，去除重复关系、悬空关系和自环，返回(关系类型, 统计信息)"""
+    config = RELATIONSHIP_CONFIGS[rel_type]
+    file_path = os.path.join(RELATIONS_PATH, config['file'])
+    from_type, to_type = config['from_type'], config['to_type']
+    start = time.perf_counter()
+
+    header_path = os.path.join(output_dir, f'{rel_type}_header.csv')
+    data_path = os.path.join(output_dir, f'{rel_type}.csv')
+    with open(header_path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerow([f':START_ID({from_type})', f':END_ID({to_type})'])
+
+    reader, encoding = iter_csv_rows(file_path)
+    stats = new_report()
+    with open(data_path, 'w', encoding='utf-8', newline='') as dst:
+        writer = csv.writer(dst)
+        for row in filter_relation_rows(reader, from_names, to_names, stats):
+            writer.writerow([node_id(from_type, row['from']), node_id(to_type, row['to'])])
+    stats['written'] = stats['valid']
+    stats['encoding'] = encoding
+
+    stats['elapsed'] = time.perf_counter() - start
+    return rel_type, stats
+
+
+def build_import_command(output_dir, labels, rel_types, database):
+    """生成neo4j-admin database import命令"""
+    args = ['neo4j-admin', 'database', 'import', 'full']
+    for label in labels:
+        args.append(f"--nodes={label}={os.path.join(output_dir, label + '_header.csv')},"
+                    f"{os.path.join(output_dir, label + '.csv')}")
+    for rel_type in rel_types:
+        args.append(f"--relationships={rel_type}={os.path.join(output_dir, rel_type + '_header.csv')},"
+                    f"{os.path.join(output_dir, rel_type + '.csv')}")
+    args += ['--multiline-fields=true', '--ignore-empty-strings=true', '--overwrite-destination=true', database]
+    return ' '.join(shlex.quote(arg) for arg in args)
+
+
+def export_all(output_dir, jobs=1, database='doctorss'):
+    """导出全部节点和关系，节点文件先行（关系过滤依赖节点名称集合），两个阶段内部并行"""
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    labels = []
+    for label, config in NODE_CONFIGS.items():
+        if os.path.exists(os.path.join(NODES_PATH, config['file'])):
+            labels.append(label)
+        else:
+            logger.warning(f"节点文件不存在：{config['file']}，引用{label}的关系将全部视为悬空关系")
+    rel_types = [rel_type for rel_type, config in RELATIONSHIP_CONFIGS.items()
+                 if os.path.exists(os.path.join(RELATIONS_PATH, config['file']))]
+
+    node_names = {}
+    with ProcessPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = [executor.submit(export_nodes, label, output_dir) for label in labels]
+        for future in futures:
+            label, names, stats = future.result()
+            node_names[label] = names
+            logger.info(f"✅ {label}节点导出完成（{stats['encoding']}）：读取{stats['rows']}行，写入{stats['written']}个，"
+                        f"重复{stats['duplicates']}，空行{stats['empty']}，耗时{stats['elapsed']:.2f}秒")
+
+        futures = []
+        for rel_type in rel_types:
+            config = RELATIONSHIP_CONFIGS[rel_type]
+            futures.append(executor.submit(
+                export_relationships, rel_type,
+                node_names.get(config['from_type'], set()),
+                node_names.get(config['to_type'], set()),
+                output_dir
+            ))
+        exported_rel_types = []
+        for future in futures:
+            rel_type, stats = future.result()
+            exported_rel_types.append(rel_type)
+            logger.info(f"✅ {rel_type}关系导出完成（{stats['encoding']}）：读取{stats['rows']}行，写入{stats['written']}个，"
+                        f"重复{stats['duplicates']}，悬空起点{stats['dangling_from']}，悬空终点{stats['dangling_to']}，"
+                        f"自环{stats['self_loops']}，空行{stats['empty']}，"
+                        f"耗时{stats['elapsed']:.2f}秒")
+
+    command = build_import_command(output_dir, labels, exported_rel_types, database)
+    command_path = os.path.join(output_dir, 'import_command.sh')
+    with open(command_path, 'w', encoding='utf-8') as f:
+        f.write(command + '\n')
+    logger.info(f"✅ 导出完成，耗时{time.perf_counter() - start:.2f}秒，导入命令已写入：{command_path}")
+    logger.info(command)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='导出neo4j-admin离线批量导入所需的CSV文件')
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'import'), help='导出目录')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='并行处理的文件数')
+    parser.add_argument('--database', default='doctorss', help='目标数据库名称')
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    try:
+        export_all(args.output, jobs=args.jobs, database=args.database)
+    except Exception as e:
+        logger.error(f"导出失败：{str(e)}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,22 @@ Neo4j数据库数据导入脚本 - 修复版
 """
 
 import os
-import csv
+import argparse
+import json
+import time
+import zlib
+import hashlib
+import itertools
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from py2neo import Graph
 from dotenv import load_dotenv
+from config import NODE_CONFIGS, RELATIONSHIP_CONFIGS, MATERIALIZED_PROPERTIES
+from csv_stream import iter_csv_rows
+from data_validation import RelationValidator
+from import_progress import ImportProgress
+from graph_cache import invalidate_graph_cache
 
 # 加载环境变量
 load_dotenv()
@@ -24,14 +36,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NODES_PATH = os.path.join(BASE_DIR, 'doctor', 'nodes')
+RELATIONS_PATH = os.path.join(BASE_DIR, 'doctor', 'relations')
+
+# 批量导入时每个事务提交的行数
+DEFAULT_BATCH_SIZE = 1000
+
+# 并行导入关系时的默认配置：工作线程数、大文件分区数、触发分区的行数阈值、死锁重试次数
+DEFAULT_WORKERS = 4
+DEFAULT_PARTITIONS = 4
+PARTITION_THRESHOLD = 20000
+MAX_DEADLOCK_RETRIES = 5
+
+# 增量导入清单：记录每个CSV文件的哈希，以及每一行的内容哈希 -> 关键字段
+# （节点为name，关系为from、to、type），删除行时只需要关键字段
+MANIFEST_FILE = 'import_manifest.json'
+MANIFEST_VERSION = 1
+
+# 唯一性约束与同一Label.name上的普通索引冲突时的错误码
+INDEX_CONFLICT_CODES = ('Neo.ClientError.Schema.IndexAlreadyExists',)
+
 
 class Neo4jImporterFixed:
     """Neo4j数据导入器 - 修复版，专门处理GBK编码"""
 
-    def __init__(self, database_name="doctorss"):
-        """初始化Neo4j连接"""
+    def __init__(self, database_name="doctorss", batch_size=DEFAULT_BATCH_SIZE, validate=True, resume=False):
+        """初始化Neo4j连接
+
+        validate=True时，批量/并行/增量导入前先在内存中校验关系文件，
+        悬空端点、重复关系和自环在发往Neo4j之前被过滤；
+        resume=True时批量/并行导入从上次检查点继续
+        """
         try:
             self.database_name = database_name
+            self.batch_size = batch_size
+            self.resume = resume
+            self.validator = RelationValidator(NODES_PATH, RELATIONS_PATH) if validate else None
+            self.progress = ImportProgress(database_name, resume=resume)
+            self.manifest_path = os.path.join(os.path.dirname(__file__), MANIFEST_FILE)
             self.graph = Graph(
                 os.getenv('NEO4J_URI'),
                 auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")),
@@ -48,55 +91,19 @@ class Neo4jImporterFixed:
             raise
 
     def read_csv_with_proper_encoding(self, file_path):
-        """使用正确的编码读取CSV文件"""
-        # 首先尝试UTF-8
-        encodings_to_try = ['utf-8', 'gbk', 'gb2312']
+        """使用正确的编码流式读取CSV文件
 
-        for encoding in encodings_to_try:
-            try:
-                # 先读取文件头检测是否为BOM
-                with open(file_path, 'rb') as f:
-                    raw_data = f.read()
-                    # 检测BOM
-                    if raw_data.startswith(b'\xef\xbb\xbf'):  # UTF-8 BOM
-                        encoding = 'utf-8-sig'
-                        raw_data = raw_data[3:]
-
-                # 使用检测到的编码读取
-                content = raw_data.decode(encoding)
-                reader = csv.DictReader(content.splitlines())
-                return reader, encoding
-
-            except (UnicodeDecodeError, UnicodeError):
-                continue
-
-        raise UnicodeDecodeError(f"无法读取文件：{file_path}")
+        只用文件前缀探测编码，之后增量解码逐行产出，返回(行字典生成器, 编码)；
+        解码失败时抛出带字节偏移和行号的CSVDecodeError
+        """
+        return iter_csv_rows(file_path)
 
     def create_nodes(self):
         """创建节点 - 修复版"""
         logger.info("开始创建节点...")
 
-        # 节点类型配置
-        node_configs = {
-            'Category': {'file': 'Category.csv', 'properties': ['name']},
-            'Check': {'file': 'Check.csv', 'properties': ['name']},
-            'Cureway': {'file': 'Cureway.csv', 'properties': ['name']},
-            'Department': {'file': 'Department.csv', 'properties': ['name']},
-            'Disease': {
-                'file': 'Disease.csv',
-                'properties': ['name', 'desc', 'prevent', 'cause', 'yibao_status',
-                             'get_prob', 'get_way', 'cure_lasttime', 'cured_prob', 'cost_money']
-            },
-            'Dishes': {'file': 'Dishes.csv', 'properties': ['name']},
-            'Drug': {'file': 'Drug.csv', 'properties': ['name']},
-            'Food': {'file': 'Food.csv', 'properties': ['name']},
-            'Symptom': {'file': 'Symptom.csv', 'properties': ['name']}
-        }
-
-        nodes_path = os.path.join(os.path.dirname(__file__), 'doctor', 'nodes')
-
-        for node_type, config in node_configs.items():
-            file_path = os.path.join(nodes_path, config['file'])
+        for node_type, config in NODE_CONFIGS.items():
+            file_path = os.path.join(NODES_PATH, config['file'])
             if not os.path.exists(file_path):
                 logger.warning(f"文件不存在：{file_path}")
                 continue
@@ -164,24 +171,8 @@ class Neo4jImporterFixed:
         """创建关系 - 修复版"""
         logger.info("开始创建关系...")
 
-        # 关系类型配置
-        relationship_configs = {
-            'DISEASE_ACOMPANY': {'from_type': 'Disease', 'to_type': 'Disease', 'file': 'DISEASE_ACOMPANY.csv'},
-            'DISEASE_CATEGORY': {'from_type': 'Disease', 'to_type': 'Category', 'file': 'DISEASE_CATEGORY.csv'},
-            'DISEASE_CHECK': {'from_type': 'Disease', 'to_type': 'Check', 'file': 'DISEASE_CHECK.csv'},
-            'DISEASE_CUREWAY': {'from_type': 'Disease', 'to_type': 'Cureway', 'file': 'DISEASE_CUREWAY.csv'},
-            'DISEASE_DEPARTMENT': {'from_type': 'Disease', 'to_type': 'Department', 'file': 'DISEASE_DEPARTMENT.csv'},
-            'DISEASE_DISHES': {'from_type': 'Disease', 'to_type': 'Dishes', 'file': 'DISEASE_DISHES.csv'},
-            'DISEASE_DO_EAT': {'from_type': 'Disease', 'to_type': 'Food', 'file': 'DISEASE_DO_EAT.csv'},
-            'DISEASE_DRUG': {'from_type': 'Disease', 'to_type': 'Drug', 'file': 'DISEASE_DRUG.csv'},
-            'DISEASE_NOT_EAT': {'from_type': 'Disease', 'to_type': 'Food', 'file': 'DISEASE_NOT_EAT.csv'},
-            'DISEASE_SYMPTOM': {'from_type': 'Disease', 'to_type': 'Symptom', 'file': 'DISEASE_SYMPTOM.csv'}
-        }
-
-        relations_path = os.path.join(os.path.dirname(__file__), 'doctor', 'relations')
-
-        for rel_type, config in relationship_configs.items():
-            file_path = os.path.join(relations_path, config['file'])
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            file_path = os.path.join(RELATIONS_PATH, config['file'])
             if not os.path.exists(file_path):
                 logger.warning(f"文件不存在：{file_path}")
                 continue
@@ -225,11 +216,650 @@ class Neo4jImporterFixed:
                 import traceback
                 logger.error(traceback.format_exc())
 
+    @staticmethod
+    def iter_batches(rows, batch_size):
+        """将行迭代器切分为固定大小的批次"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def resume_batches(self, key, rows):
+        """切分批次，产出(批次, 是否为重放批次)
+
+        上次中断时正在提交的批次可能已经写入，单独作为重放批次产出，由调用方幂等写入
+        """
+        pending = self.progress.pending_rows(key)
+        if pending:
+            yield list(itertools.islice(rows, pending)), True
+        for batch in self.iter_batches(rows, self.batch_size):
+            yield batch, False
+
+    def run_node_batch(self, node_type, batch, replay=False):
+        """写入一批节点；重放批次中有name的行用MERGE，避免重复创建中断前已提交的节点"""
+        create_query = f"UNWIND $rows AS row CREATE (n:{node_type}) SET n = row RETURN count(n) AS count"
+        if not replay:
+            return self.run_batch(create_query, batch)
+        merge_query = f"UNWIND $rows AS row MERGE (n:{node_type} {{name: row.name}}) SET n = row RETURN count(n) AS count"
+        named = [row for row in batch if 'name' in row]
+        unnamed = [row for row in batch if 'name' not in row]
+        count = self.run_batch(merge_query, named) if named else 0
+        return count + (self.run_batch(create_query, unnamed) if unnamed else 0)
+
+    @staticmethod
+    def iter_node_rows(reader, properties):
+        """从节点CSV中提取非空属性，确保所有值都是字符串类型"""
+        for row in reader:
+            node = {}
+            for prop in properties:
+                value = (row.get(prop) or '').strip()
+                if value:
+                    node[prop] = str(value)
+            if node:
+                yield node
+
+    @staticmethod
+    def iter_relation_rows(reader):
+        """从关系CSV中提取非空的from/to行"""
+        for row in reader:
+            from_name = (row.get('from') or '').strip()
+            to_name = (row.get('to') or '').strip()
+            if from_name and to_name:
+                yield {'from': from_name, 'to': to_name}
+
+    def valid_relation_rows(self, rel_type, reader):
+        """提取关系行，启用校验时过滤掉无法写入的行"""
+        rows = self.iter_relation_rows(reader)
+        if self.validator is None:
+            return rows
+        return self.validator.filter_rows(rel_type, rows)
+
+    @staticmethod
+    def relationship_batch_query(rel_type, config):
+        """构建关系类型的UNWIND语句，只统计两端节点都存在、真正写入的关系"""
+        return f"""
+            UNWIND $rows AS row
+            MATCH (from:{config['from_type']} {{name: row.from}})
+            MATCH (to:{config['to_type']} {{name: row.to}})
+            MERGE (from)-[r:{rel_type}]->(to)
+            RETURN count(r) AS count
+            """
+
+    def run_batch(self, query, rows):
+        """在一个显式事务中执行UNWIND批量语句，返回语句统计的行数"""
+        tx = self.graph.begin()
+        try:
+            result = tx.run(query, rows=rows).data()
+            self.graph.commit(tx)
+        except Exception:
+            self.graph.rollback(tx)
+            raise
+        return result[0]['count'] if result else 0
+
+    def estimate_total_rows(self):
+        """统计批量导入预计处理的总行数，用于计算进度和预计剩余时间"""
+        total = 0
+        for config in NODE_CONFIGS.values():
+            file_path = os.path.join(NODES_PATH, config['file'])
+            if os.path.exists(file_path):
+                reader, _ = self.read_csv_with_proper_encoding(file_path)
+                total += sum(1 for _ in self.iter_node_rows(reader, config['properties']))
+
+        reports = self.validator.reports if self.validator is not None else {}
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            file_path = os.path.join(RELATIONS_PATH, config['file'])
+            if rel_type in reports:
+                total += reports[rel_type]['valid']
+            elif os.path.exists(file_path):
+                reader, _ = self.read_csv_with_proper_encoding(file_path)
+                total += sum(1 for _ in self.iter_relation_rows(reader))
+        return total
+
+    def log_throughput(self, label, count, failed, elapsed):
+        """输出单个节点/关系类型的导入吞吐量"""
+        rate = count / elapsed if elapsed > 0 else 0.0
+        logger.info(f"✅ {label}导入完成，共导入{count}条，失败{failed}条，"
+                    f"耗时{elapsed:.2f}秒，吞吐量{rate:.1f}行/秒（批大小{self.batch_size}）")
+
+    def create_nodes_batched(self):
+        """批量创建节点：每个节点类型一条UNWIND语句，按批次提交事务"""
+        logger.info(f"开始批量创建节点（批大小：{self.batch_size}）...")
+
+        for node_type, config in NODE_CONFIGS.items():
+            file_path = os.path.join(NODES_PATH, config['file'])
+            if not os.path.exists(file_path):
+                logger.warning(f"文件不存在：{file_path}")
+                continue
+
+            key = f"nodes/{config['file']}"
+            position = self.progress.start_stream(key, self.file_hash(file_path))
+            if position is None:
+                continue
+            row_offset, first_batch = position
+
+            logger.info(f"正在批量导入{node_type}节点...")
+
+            try:
+                reader, encoding = self.read_csv_with_proper_encoding(file_path)
+                logger.info(f"成功以{encoding}编码读取文件：{config['file']}")
+
+                rows = itertools.islice(self.iter_node_rows(reader, config['properties']), row_offset, None)
+                count, failed = 0, 0
+                start = time.perf_counter()
+                for batch_id, (batch, replay) in enumerate(self.resume_batches(key, rows), start=first_batch):
+                    self.progress.begin_batch(key, len(batch))
+                    try:
+                        count += self.run_node_batch(node_type, batch, replay)
+                    except Exception as e:
+                        failed = len(batch)
+                        self.progress.fail_batch(key, len(batch))
+                        logger.error(f"{node_type}节点第{batch_id}批导入失败（{len(batch)}行），"
+                                     f"检查点停在该批次，修复后使用--resume重试，错误：{str(e)}")
+                        break
+                    self.progress.commit_batch(key, len(batch))
+                else:
+                    self.progress.finish_stream(key)
+                self.log_throughput(f"{node_type}节点", count, failed, time.perf_counter() - start)
+
+            except Exception as e:
+                logger.error(f"导入{node_type}节点时出错：{str(e)}")
+                import traceback
+                logger.error(traceback.format_exc())
+
+    def create_relationships_batched(self):
+        """批量创建关系：每个关系类型一条UNWIND语句，按批次提交事务"""
+        logger.info(f"开始批量创建关系（批大小：{self.batch_size}）...")
+
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            file_path = os.path.join(RELATIONS_PATH, config['file'])
+            if not os.path.exists(file_path):
+                logger.warning(f"文件不存在：{file_path}")
+                continue
+
+            key = f"relations/{config['file']}"
+            position = self.progress.start_stream(key, self.file_hash(file_path))
+            if position is None:
+                continue
+            row_offset, first_batch = position
+
+            logger.info(f"正在批量导入{rel_type}关系...")
+            query = self.relationship_batch_query(rel_type, config)
+
+            try:
+                reader, encoding = self.read_csv_with_proper_encoding(file_path)
+                logger.info(f"成功以{encoding}编码读取文件：{config['file']}")
+
+                rows = itertools.islice(self.valid_relation_rows(rel_type, reader), row_offset, None)
+                count, failed, total = 0, 0, 0
+                start = time.perf_counter()
+                # 关系用MERGE写入，中断时正在提交的批次直接重放即可
+                for batch_id, batch in enumerate(self.iter_batches(rows, self.batch_size), start=first_batch):
+                    total += len(batch)
+                    try:
+                        count += self.run_batch(query, batch)
+                    except Exception as e:
+                        failed = len(batch)
+                        self.progress.fail_batch(key, len(batch))
+                        logger.error(f"{rel_type}关系第{batch_id}批导入失败（{len(batch)}行），"
+                                     f"检查点停在该批次，修复后使用--resume重试，错误：{str(e)}")
+                        break
+                    self.progress.commit_batch(key, len(batch))
+                else:
+                    self.progress.finish_stream(key)
+                if count + failed < total:
+                    logger.warning(f"{rel_type}关系有{total - count - failed}行的端点节点不存在，已跳过")
+                self.log_throughput(f"{rel_type}关系", count, failed, time.perf_counter() - start)
+
+            except Exception as e:
+                logger.error(f"导入{rel_type}关系时出错：{str(e)}")
+                import traceback
+                logger.error(traceback.format_exc())
+
+    @staticmethod
+    def is_deadlock_error(error):
+        """判断是否为可重试的死锁/瞬时错误"""
+        message = str(error)
+        return 'DeadlockDetected' in message or 'TransientError' in type(error).__name__ \
+            or 'Neo.TransientError' in message
+
+    def run_batch_with_retry(self, query, rows, max_retries=MAX_DEADLOCK_RETRIES):
+        """执行批次，遇到死锁时按指数退避重试，返回(写入行数, 重试次数)"""
+        attempt = 0
+        while True:
+            try:
+                return self.run_batch(query, rows), attempt
+            except Exception as e:
+                if attempt >= max_retries or not self.is_deadlock_error(e):
+                    raise
+                attempt += 1
+                delay = min(0.1 * 2 ** attempt, 5.0)
+                logger.warning(f"批次发生死锁，{delay:.1f}秒后第{attempt}次重试：{str(e)}")
+                time.sleep(delay)
+
+    def plan_relationship_tasks(self, partitions=DEFAULT_PARTITIONS, partition_threshold=PARTITION_THRESHOLD):
+        """按关系类型拆分任务，行数超过阈值的文件再按from名称哈希分区
+
+        同一个from节点的关系总落在同一分区，减少不同工作线程争用同一节点的锁
+        """
+        tasks = []
+
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            file_path = os.path.join(RELATIONS_PATH, config['file'])
+            if not os.path.exists(file_path):
+                logger.warning(f"文件不存在：{file_path}")
+                continue
+
+            reader, encoding = self.read_csv_with_proper_encoding(file_path)
+            logger.info(f"成功以{encoding}编码读取文件：{config['file']}")
+            rows = list(self.valid_relation_rows(rel_type, reader))
+
+            if partitions > 1 and len(rows) > partition_threshold:
+                buckets = [[] for _ in range(partitions)]
+                for row in rows:
+                    buckets[zlib.crc32(row['from'].encode('utf-8')) % partitions].append(row)
+                logger.info(f"{rel_type}共{len(rows)}行，按from名称拆分为{partitions}个分区")
+            else:
+                buckets = [rows]
+
+            file_hash = self.file_hash(file_path)
+            for partition, bucket in enumerate(buckets):
+                # 分区划分是确定性的，检查点按分区记录
+                key = f"relations/{config['file']}#{partition}"
+                position = self.progress.start_stream(key, file_hash)
+                if position is None:
+                    continue
+                row_offset, first_batch = position
+                if row_offset < len(bucket):
+                    tasks.append({'rel_type': rel_type, 'config': config, 'partition': partition, 'key': key,
+                                  'rows': bucket[row_offset:], 'first_batch': first_batch})
+                else:
+                    self.progress.finish_stream(key)
+
+        # 大任务优先调度，缩短整体完成时间
+        tasks.sort(key=lambda task: len(task['rows']), reverse=True)
+        return tasks
+
+    def load_relationship_task(self, task, max_retries=MAX_DEADLOCK_RETRIES):
+        """工作线程执行单个关系任务，返回该任务的计时统计"""
+        rel_type = task['rel_type']
+        query = self.relationship_batch_query(rel_type, task['config'])
+        stats = {
+            'worker': threading.current_thread().name,
+            'rel_type': rel_type,
+            'partition': task['partition'],
+            'rows': len(task['rows']),
+            'count': 0,
+            'failed': 0,
+            'retries': 0,
+        }
+        start = time.perf_counter()
+        for batch_id, batch in enumerate(self.iter_batches(task['rows'], self.batch_size), start=task['first_batch']):
+            try:
+                count, retries = self.run_batch_with_retry(query, batch, max_retries)
+                stats['count'] += count
+                stats['retries'] += retries
+            except Exception as e:
+                stats['failed'] = len(batch)
+                self.progress.fail_batch(task['key'], len(batch))
+                logger.error(f"{rel_type}关系分区{task['partition']}第{batch_id}批导入失败（{len(batch)}行），"
+                             f"检查点停在该批次，修复后使用--resume重试，错误：{str(e)}")
+                break
+            self.progress.commit_batch(task['key'], len(batch))
+        else:
+            self.progress.finish_stream(task['key'])
+        stats['elapsed'] = time.perf_counter() - start
+        return stats
+
+    def create_relationships_parallel(self, workers=DEFAULT_WORKERS, partitions=DEFAULT_PARTITIONS,
+                                      partition_threshold=PARTITION_THRESHOLD, max_retries=MAX_DEADLOCK_RETRIES):
+        """并行创建关系：工作线程池按关系类型和from分区并发导入
+
+        每个批次在独立的显式事务中执行，由py2neo连接池为其分配会话；
+        线程池大小限制了并发事务数，死锁批次会自动重试
+        """
+        logger.info(f"开始并行创建关系（工作线程：{workers}，批大小：{self.batch_size}）...")
+
+        tasks = self.plan_relationship_tasks(partitions, partition_threshold)
+        summary = []
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rel-worker') as executor:
+            futures = {executor.submit(self.load_relationship_task, task, max_retries): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    logger.error(f"{task['rel_type']}关系分区{task['partition']}导入时出错：{str(e)}")
+                    continue
+                summary.append(stats)
+                self.log_throughput(f"{stats['rel_type']}关系分区{stats['partition']}",
+                                    stats['count'], stats['failed'], stats['elapsed'])
+
+        wall_time = time.perf_counter() - start
+        self.log_import_summary(summary, wall_time)
+        return summary
+
+    def log_import_summary(self, summary, wall_time):
+        """汇总输出各工作线程的导入耗时"""
+        logger.info("并行导入汇总：")
+        for stats in sorted(summary, key=lambda item: (item['rel_type'], item['partition'])):
+            logger.info(f"  {stats['worker']:<14} {stats['rel_type']:<20} 分区{stats['partition']} "
+                        f"行数{stats['rows']:>6} 导入{stats['count']:>6} 失败{stats['failed']:>5} "
+                        f"重试{stats['retries']:>3} 耗时{stats['elapsed']:.2f}秒")
+
+        total_count = sum(stats['count'] for stats in summary)
+        total_failed = sum(stats['failed'] for stats in summary)
+        busy_time = sum(stats['elapsed'] for stats in summary)
+        rate = total_count / wall_time if wall_time > 0 else 0.0
+        logger.info(f"✅ 并行导入完成，共导入{total_count}个关系，失败{total_failed}条，"
+                    f"墙钟耗时{wall_time:.2f}秒（累计工作耗时{busy_time:.2f}秒），吞吐量{rate:.1f}行/秒")
+
+    def create_constraints(self):
+        """为每个节点类型的name属性创建唯一性约束（增量导入的MERGE依赖该约束）"""
+        logger.info("开始创建唯一性约束...")
+
+        for node_type in NODE_CONFIGS:
+            query = f"CREATE CONSTRAINT {node_type.lower()}_name_unique IF NOT EXISTS " \
+                    f"FOR (n:{node_type}) REQUIRE n.name IS UNIQUE"
+            try:
+                self.graph.run(query)
+                logger.info(f"✅ 为{node_type}创建name唯一性约束成功")
+            except Exception as e:
+                if getattr(e, 'code', None) not in INDEX_CONFLICT_CODES:
+                    logger.error(f"为{node_type}创建唯一性约束失败（库中可能已有重复节点，请先全量重建）：{str(e)}")
+                    continue
+                # 旧版导入创建的普通索引与约束的后备索引冲突，先删除再重试
+                self.drop_plain_name_index(node_type)
+                try:
+                    self.graph.run(query)
+                    logger.info(f"✅ 已替换{node_type}.name普通索引为唯一性约束")
+                except Exception as retry_error:
+                    logger.error(f"为{node_type}创建唯一性约束失败：{str(retry_error)}")
+
+    def drop_plain_name_index(self, node_type):
+        """删除不属于约束的Label.name普通索引"""
+        indexes = self.graph.run(
+            "SHOW INDEXES YIELD name, labelsOrTypes, properties, owningConstraint "
+            "WHERE labelsOrTypes = [$label] AND properties = ['name'] AND owningConstraint IS NULL "
+            "RETURN name",
+            label=node_type
+        ).data()
+        for index in indexes:
+            self.graph.run(f"DROP INDEX `{index['name']}` IF EXISTS")
+            logger.info(f"已删除索引：{index['name']}")
+
+    @staticmethod
+    def file_hash(file_path):
+        """计算文件内容哈希，用于快速判断文件是否变化"""
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def row_hash(row):
+        """计算单行内容哈希"""
+        payload = json.dumps(row, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    def load_manifest(self):
+        """读取增量导入清单，数据库不一致或版本不符时返回空清单"""
+        empty = {'version': MANIFEST_VERSION, 'database': self.database_name, 'files': {}}
+        if not os.path.exists(self.manifest_path):
+            return empty
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"导入清单读取失败，将按全量差异处理：{str(e)}")
+            return empty
+        if manifest.get('version') != MANIFEST_VERSION or manifest.get('database') != self.database_name:
+            logger.warning("导入清单与当前数据库不匹配，将按全量差异处理")
+            return empty
+        return manifest
+
+    def save_manifest(self, manifest):
+        """原子写入增量导入清单"""
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def reset_manifest(self):
+        """清空数据库后删除旧清单"""
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def build_manifest(self):
+        """按当前CSV生成导入清单，全量导入成功后写入，之后的增量导入只推送相对它的差异"""
+        manifest = {'version': MANIFEST_VERSION, 'database': self.database_name, 'files': {}}
+
+        for node_type, config in NODE_CONFIGS.items():
+            file_path = os.path.join(NODES_PATH, config['file'])
+            if os.path.exists(file_path):
+                rows = self.read_file_rows(
+                    file_path, lambda reader, properties=config['properties']: self.iter_node_rows(reader, properties))
+                manifest['files'][f"nodes/{config['file']}"] = {
+                    'file_hash': self.file_hash(file_path),
+                    'rows': self.manifest_rows(rows, ('name',))
+                }
+
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            file_path = os.path.join(RELATIONS_PATH, config['file'])
+            if os.path.exists(file_path):
+                rows = self.read_file_rows(
+                    file_path, lambda reader, rel_type=rel_type: self.valid_relation_rows(rel_type, reader))
+                manifest['files'][f"relations/{config['file']}"] = {
+                    'file_hash': self.file_hash(file_path),
+                    'rows': self.manifest_rows(rows, ('from', 'to'), type=rel_type)
+                }
+        return manifest
+
+    def read_file_rows(self, file_path, row_iter):
+        """读取CSV并返回{行哈希: 行内容}，相同内容的重复行自然去重"""
+        reader, encoding = self.read_csv_with_proper_encoding(file_path)
+        logger.info(f"成功以{encoding}编码读取文件：{os.path.basename(file_path)}")
+        return {self.row_hash(row): row for row in row_iter(reader)}
+
+    @staticmethod
+    def manifest_rows(rows, fields, **extra):
+        """把{行哈希: 行内容}裁剪为{行哈希: 关键字段}写入清单，属性变化由行哈希体现"""
+        return {key_hash: {**{field: row[field] for field in fields if field in row}, **extra}
+                for key_hash, row in rows.items()}
+
+    def apply_delta(self, label, query, rows):
+        """分批执行增量语句，返回(写入行数, 失败行数)"""
+        count, failed = 0, 0
+        for batch_id, batch in enumerate(self.iter_batches(rows, self.batch_size)):
+            try:
+                count += self.run_batch_with_retry(query, batch)[0]
+            except Exception as e:
+                failed += len(batch)
+                logger.error(f"{label}第{batch_id}批增量写入失败（{len(batch)}行），错误：{str(e)}")
+        return count, failed
+
+    def sync_nodes(self, manifest, affected):
+        """按清单差异同步节点，返回每个节点类型新增和删除的名称集合
+
+        SET n = row会覆盖聚合属性，写入过的节点记入affected等待重新计算
+        """
+        logger.info("开始增量同步节点...")
+        added_names = {}
+        removed_names = {}
+
+        for node_type, config in NODE_CONFIGS.items():
+            file_path = os.path.join(NODES_PATH, config['file'])
+            key = f"nodes/{config['file']}"
+            if not os.path.exists(file_path):
+                logger.warning(f"文件不存在：{file_path}")
+                continue
+
+            file_hash = self.file_hash(file_path)
+            entry = manifest['files'].get(key, {})
+            if entry.get('file_hash') == file_hash:
+                logger.info(f"{node_type}节点文件未变化，跳过")
+                continue
+
+            start = time.perf_counter()
+            old_rows = entry.get('rows', {})
+            new_rows = self.read_file_rows(file_path, lambda reader: self.iter_node_rows(reader, config['properties']))
+            added = [row for key_hash, row in new_rows.items() if key_hash not in old_rows]
+            new_names = {row['name'] for row in new_rows.values() if 'name' in row}
+            # 属性变化的行会同时出现在新增和删除中，只删除名称已不存在的节点
+            removed = [{'name': row['name']} for key_hash, row in old_rows.items()
+                       if key_hash not in new_rows and row.get('name') not in new_names]
+            old_names = {row.get('name') for row in old_rows.values()}
+            added_names[node_type] = {row['name'] for row in added if row.get('name') not in old_names}
+            removed_names[node_type] = {row['name'] for row in removed}
+            if node_type in MATERIALIZED_PROPERTIES:
+                affected.setdefault(node_type, set()).update(row['name'] for row in added if 'name' in row)
+
+            upsert_query = f"UNWIND $rows AS row MERGE (n:{node_type} {{name: row.name}}) SET n = row RETURN count(n) AS count"
+            delete_query = f"UNWIND $rows AS row MATCH (n:{node_type} {{name: row.name}}) DETACH DELETE n RETURN count(*) AS count"
+            upserted, upsert_failed = self.apply_delta(f"{node_type}节点", upsert_query, [row for row in added if 'name' in row])
+            deleted, delete_failed = self.apply_delta(f"{node_type}节点", delete_query, removed)
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"✅ {node_type}节点增量同步完成：新增/更新{upserted}个，删除{deleted}个，"
+                        f"失败{upsert_failed + delete_failed}行，耗时{elapsed:.2f}秒")
+            # 有失败时不更新清单，下次运行重新推送（MERGE幂等）
+            if not upsert_failed and not delete_failed:
+                manifest['files'][key] = {'file_hash': file_hash, 'rows': self.manifest_rows(new_rows, ('name',))}
+
+        return added_names, removed_names
+
+    @staticmethod
+    def mark_affected(affected, rel_type, rows):
+        """记录关系变化影响到的聚合属性所在节点"""
+        for label, props in MATERIALIZED_PROPERTIES.items():
+            for prop_rel_type, direction in props.values():
+                if prop_rel_type == rel_type:
+                    endpoint = 'from' if direction == 'out' else 'to'
+                    affected.setdefault(label, set()).update(row[endpoint] for row in rows)
+
+    def sync_relationships(self, manifest, added_names, removed_names, affected):
+        """按清单差异同步关系
+
+        新增节点可能让此前悬空的旧关系行生效，这部分行也会重新MERGE；
+        变化的关系和被删除节点的旧关系都会记入affected
+        """
+        logger.info("开始增量同步关系...")
+        for rel_type, config in RELATIONSHIP_CONFIGS.items():
+            file_path = os.path.join(RELATIONS_PATH, config['file'])
+            key = f"relations/{config['file']}"
+            if not os.path.exists(file_path):
+                logger.warning(f"文件不存在：{file_path}")
+                continue
+
+            from_added = added_names.get(config['from_type'], set())
+            to_added = added_names.get(config['to_type'], set())
+            file_hash = self.file_hash(file_path)
+            entry = manifest['files'].get(key, {})
+
+            # 被DETACH DELETE的节点会带走关系，对端节点的聚合属性需要重新计算
+            from_removed = removed_names.get(config['from_type'], set())
+            to_removed = removed_names.get(config['to_type'], set())
+            if from_removed or to_removed:
+                self.mark_affected(affected, rel_type, [
+                    row for row in entry.get('rows', {}).values()
+                    if row['from'] in from_removed or row['to'] in to_removed
+                ])
+
+            if entry.get('file_hash') == file_hash and not from_added and not to_added:
+                logger.info(f"{rel_type}关系文件未变化，跳过")
+                continue
+
+            start = time.perf_counter()
+            old_rows = entry.get('rows', {})
+            new_rows = self.read_file_rows(file_path, lambda reader: self.valid_relation_rows(rel_type, reader))
+            added = [row for key_hash, row in new_rows.items()
+                     if key_hash not in old_rows or row['from'] in from_added or row['to'] in to_added]
+            removed = [{'from': row['from'], 'to': row['to']} for key_hash, row in old_rows.items()
+                       if key_hash not in new_rows]
+
+            delete_query = f"""
+            UNWIND $rows AS row
+            MATCH (from:{config['from_type']} {{name: row.from}})-[r:{rel_type}]->(to:{config['to_type']} {{name: row.to}})
+            DELETE r
+            RETURN count(*) AS count
+            """
+            merged, merge_failed = self.apply_delta(f"{rel_type}关系", self.relationship_batch_query(rel_type, config), added)
+            deleted, delete_failed = self.apply_delta(f"{rel_type}关系", delete_query, removed)
+            self.mark_affected(affected, rel_type, added + removed)
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"✅ {rel_type}关系增量同步完成：推送{len(added)}行（写入{merged}个），删除{deleted}个，"
+                        f"失败{merge_failed + delete_failed}行，耗时{elapsed:.2f}秒")
+            if not merge_failed and not delete_failed:
+                manifest['files'][key] = {'file_hash': file_hash,
+                                          'rows': self.manifest_rows(new_rows, ('from', 'to'), type=rel_type)}
+
+    def run_incremental_import(self):
+        """增量导入：唯一性约束 + MERGE，仅推送相对清单新增和删除的行"""
+        logger.info("开始执行增量导入...")
+        start = time.perf_counter()
+
+        self.create_constraints()
+        manifest = self.load_manifest()
+        affected = {}
+        added_names, removed_names = self.sync_nodes(manifest, affected)
+        # 节点变化先落盘，关系同步中断时不会重复推送节点差异
+        self.save_manifest(manifest)
+        self.sync_relationships(manifest, added_names, removed_names, affected)
+        self.materialize_aggregates(affected)
+        self.save_manifest(manifest)
+
+        logger.info(f"✅ 增量导入完成，耗时{time.perf_counter() - start:.2f}秒")
+
+    @staticmethod
+    def materialize_query(label, props):
+        """构建一次性写入某标签全部聚合属性的UNWIND语句"""
+        assignments = []
+        for prop, (rel_type, direction) in props.items():
+            pattern = f"(n)-[:{rel_type}]->(m)" if direction == 'out' else f"(n)<-[:{rel_type}]-(m)"
+            # 按邻居的度数降序排列，模板截取前k个时保留最常见的名称
+            assignments.append(f"n.{prop} = COLLECT {{ MATCH {pattern} WITH DISTINCT m "
+                               f"ORDER BY COUNT {{ (m)--() }} DESC, m.name RETURN m.name }}")
+        return f"""
+            UNWIND $rows AS row
+            MATCH (n:{label} {{name: row.name}})
+            SET {', '.join(assignments)}
+            RETURN count(n) AS count
+            """
+
+    def materialize_aggregates(self, names_by_label=None):
+        """预计算模板使用的邻居名称列表并写为节点属性
+
+        names_by_label为None时重新计算全部节点，否则只计算受影响的节点
+        """
+        logger.info("开始计算聚合属性..." if names_by_label is None else "开始增量计算聚合属性...")
+
+        for label, props in MATERIALIZED_PROPERTIES.items():
+            if names_by_label is None:
+                names = [row['name'] for row in self.graph.run(f"MATCH (n:{label}) RETURN n.name AS name").data()]
+            else:
+                names = sorted(names_by_label.get(label, ()))
+            if not names:
+                continue
+
+            start = time.perf_counter()
+            count, failed = self.apply_delta(f"{label}聚合属性", self.materialize_query(label, props),
+                                             [{'name': name} for name in names])
+            logger.info(f"✅ {label}聚合属性计算完成：{count}个节点，失败{failed}个，"
+                        f"耗时{time.perf_counter() - start:.2f}秒")
+
     def clear_database(self):
         """清空数据库（慎用）"""
         logger.warning("正在清空数据库...")
         try:
             self.graph.run("MATCH (n) DETACH DELETE n")
+            self.reset_manifest()
             logger.info("✅ 数据库已清空")
         except Exception as e:
             logger.error(f"清空数据库失败：{str(e)}")
@@ -268,40 +898,124 @@ class Neo4jImporterFixed:
         except Exception as e:
             logger.error(f"编码测试失败：{str(e)}")
 
-    def run_import(self, clear_db=False, test_encoding=True):
-        """执行完整的导入流程"""
+    def run_import(self, clear_db=False, test_encoding=True, batched=True, workers=1, incremental=False):
+        """执行完整的导入流程
+
+        batched=True时使用UNWIND批量导入，False时沿用逐行导入；
+        workers>1时关系由线程池并行导入；
+        incremental=True时基于唯一性约束和导入清单只同步变化的行
+        """
         logger.info("开始执行Neo4j数据导入...")
 
+        # 逐行导入沿用原有逻辑，其余模式先做不依赖数据库的引用完整性校验
+        if self.validator is not None and (batched or incremental):
+            self.validator.validate_all()
+
+        if batched and not incremental:
+            # 全量导入真正开始时才丢弃旧检查点；--resume时保留
+            if not self.resume:
+                self.progress.reset()
+            elif not self.progress.streams:
+                # 没有可用检查点时续传会在不清空数据库的情况下重新CREATE全部节点，产生重复数据
+                raise Exception("没有可用的导入检查点（不存在、上次已导入完成或属于其他数据库），无法续传；"
+                                "请去掉--resume重新执行全量导入，或使用--incremental同步变化")
+            self.progress.add_total(self.estimate_total_rows())
+
         if test_encoding:
             self.test_encoding()
 
+        if clear_db and self.progress.streams:
+            # 从检查点继续时不能清空已导入的数据
+            logger.warning("存在导入检查点，跳过清空数据库")
+            clear_db = False
+
         if clear_db:
             self.clear_database()
 
         try:
+            if incremental:
+                self.run_incremental_import()
+                return
+
             # 创建节点
-            self.create_nodes()
+            if batched:
+                self.create_nodes_batched()
+            else:
+                self.create_nodes()
+
+            if batched and not self.progress.complete():
+                # 关系MATCH不到缺失的端点节点，此时导入关系会把关系数据流标记为完成，续传时漏掉这些关系
+                self.progress.finish('incomplete')
+                logger.warning("⚠️ 部分节点批次导入失败，暂不导入关系，检查点已保留，修复后使用--resume继续")
+                return
 
             # 创建索引
             self.create_indexes()
 
             # 创建关系
-            self.create_relationships()
+            if batched and workers > 1:
+                self.create_relationships_parallel(workers=workers)
+            elif batched:
+                self.create_relationships_batched()
+            else:
+                self.create_relationships()
+
+            # 预计算模板使用的聚合属性
+            self.materialize_aggregates()
 
+            if batched and not self.progress.complete():
+                self.progress.finish('incomplete')
+                logger.warning("⚠️ 部分批次导入失败，检查点已保留，修复后使用--resume从失败的批次继续")
+                return
+            if batched:
+                self.progress.finish()
+                # 全量导入的结果作为增量导入的基线，首次--incremental不再重新MERGE全部行
+                self.save_manifest(self.build_manifest())
             logger.info("✅ 数据导入完成！")
 
         except Exception as e:
+            if batched and not incremental:
+                self.progress.finish('failed')
             logger.error(f"数据导入过程中出现错误：{str(e)}")
             raise
+        finally:
+            # 数据已变化（包括导入中途失败），失效问答服务的图谱结果缓存
+            invalidate_graph_cache()
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='导入doctor目录下的CSV数据到Neo4j')
+    parser.add_argument('--database', default='doctorss', help='目标数据库名称')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='每个事务提交的行数，设为0时使用逐行导入')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行导入关系的工作线程数，大于1时启用并行导入')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量导入：不清空数据库，只同步相对上次导入变化的行')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='跳过导入前的引用完整性校验和过滤')
+    parser.add_argument('--materialize-only', action='store_true',
+                        help='只重新计算聚合属性（用于给已导入的数据库补齐）')
+    parser.add_argument('--resume', action='store_true',
+                        help='从上次中断时最后提交的批次继续导入（不清空数据库）')
+    return parser.parse_args()
 
 
 def main():
     """主函数"""
+    args = parse_args()
     try:
         # 使用doctorss数据库
-        importer = Neo4jImporterFixed(database_name="doctorss")
-        # 注意：clear_db=True会清空数据库，请谨慎使用
-        importer.run_import(clear_db=True, test_encoding=True)
+        importer = Neo4jImporterFixed(database_name=args.database, batch_size=max(args.batch_size, 1),
+                                      validate=not args.skip_validation, resume=args.resume)
+        if args.materialize_only:
+            importer.materialize_aggregates()
+            invalidate_graph_cache()
+            return
+        # 注意：clear_db=True会清空数据库，请谨慎使用；增量模式和断点续传不清空
+        importer.run_import(clear_db=not (args.incremental or args.resume), test_encoding=True, batched=args.batch_size > 0,
+                            workers=args.workers, incremental=args.incremental)
     except Exception as e:
         logger.error(f"程序执行失败：{str(e)}")
         exit(1)
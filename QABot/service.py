@@ -3,29 +3,118 @@ from utils import *
 from agent import *
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+import asyncio
+import threading
+from answer_cache import get_answer_cache
+from streaming import AnswerStream, emit_status, set_current_stream
 
 class Service:
     def __init__(self):
         self.agent = Agent()
-
-    def get_summary_message(self, message, history):
-        llm = get_llm_model()
-        prompt = PromptTemplate.from_template(SUMMARY_PROMPT_TPL)
-        llm_chain = LLMChain(
-            llm=llm,
-            prompt=prompt,
+        self.summary_chain = LLMChain(
+            llm=get_llm_model(),
+            prompt=PromptTemplate.from_template(SUMMARY_PROMPT_TPL),
             verbose=os.getenv('VERBOSE')
         )
+
+    def warmup(self):
+        """预加载Agent依赖的索引和连接"""
+        self.agent.warmup()
+
+    @staticmethod
+    def format_history(history):
         chat_history = ''
         for q, a in history[-2:]:
             chat_history += f'问题：{q}, 答案：{a}\n'
-        return llm_chain.run(query=message, chat_history=chat_history)
+        return chat_history
+
+    def get_summary_message(self, message, history):
+        return self.summary_chain.run(query=message, chat_history=self.format_history(history))
+
+    async def aget_summary_message(self, message, history):
+        return await self.summary_chain.arun(query=message, chat_history=self.format_history(history))
 
     def answer(self, message, history):
         if history:
+            emit_status('正在结合上下文理解问题')
             message = self.get_summary_message(message=message, history=history)
             print(f'---message---{message}')
-        return self.agent.query(message)
+        # 先查答案缓存（精确 + 语义），未命中时把问题向量交给Agent路由复用
+        cache = get_answer_cache()
+        answer, query_vector = cache.lookup(message, self.agent.embeddings.embed_query)
+        if answer is not None:
+            print(f'---answer cache hit---{cache.stats()}')
+            return answer
+        answer, tools, finished = self.agent.query_with_tools(message, query_vector)
+        # 达到迭代上限等没有正常完成的回答不缓存，避免一次失败被复用到相似问题上
+        if finished:
+            cache.put(message, query_vector, answer, tools)
+        return answer
+
+    async def aanswer(self, message, history):
+        """answer的异步版本：大模型、嵌入、向量库和图谱请求都不阻塞事件循环"""
+        if history:
+            emit_status('正在结合上下文理解问题')
+            message = await self.aget_summary_message(message=message, history=history)
+            print(f'---message---{message}')
+        cache = get_answer_cache()
+        answer, query_vector = await cache.alookup(message, lambda text: aembed_query(self.agent.embeddings, text))
+        if answer is not None:
+            print(f'---answer cache hit---{cache.stats()}')
+            return answer
+        answer, tools, finished = await self.agent.aquery_with_tools(message, query_vector)
+        if finished:
+            cache.put(message, query_vector, answer, tools)
+        return answer
+
+    async def astream_answer(self, message, history):
+        """流式回答：产出(类型, 内容)事件
+
+        status为中间状态，token为最终答案的增量片段，done为完整答案（缓存命中时只有done）；
+        回答在事件循环中作为任务执行，不为每个请求占用线程。调用方关闭生成器（客户端断开、
+        用户发送了新消息）时取消任务，正在进行的大模型、检索请求随之中止
+        """
+        stream = AnswerStream()
+
+        async def run():
+            # 任务拥有独立的上下文副本，输出流只对本次回答可见
+            set_current_stream(stream)
+            try:
+                stream.finish(await self.aanswer(message, history))
+            except Exception as e:
+                stream.fail(e)
+
+        task = asyncio.create_task(run())
+        try:
+            async for event in stream:
+                yield event
+        finally:
+            if not task.done():
+                print('---answer cancelled---')
+                task.cancel()
+
+    @staticmethod
+    async def aclose():
+        """在服务的事件循环中关闭连接池（异步驱动只能在创建它的事件循环中关闭），供应用的关闭钩子调用"""
+        await aclose_neo4j_pools()
+
+
+_service = None
+_service_warmed = False
+_service_lock = threading.Lock()
+
+
+def get_service(warmup=False):
+    """获取进程级共享的Service，首次调用时创建；第一次以warmup=True调用时预热（无论实例是否已创建）"""
+    global _service, _service_warmed
+    if _service is None or (warmup and not _service_warmed):
+        with _service_lock:
+            if _service is None:
+                _service = Service()
+            if warmup and not _service_warmed:
+                _service.warmup()
+                _service_warmed = True
+    return _service
 
 
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+# streaming.py
+"""
+流式输出
+回答在事件循环中的任务里执行，大模型的token和中间状态（选择了哪个工具等）通过队列实时交给调用方；
+向量路由直接命中工具时，工具里总结答案的链就是最后一次大模型调用，其token直接输出；
+退回ReAct Agent时只输出“Final Answer:”之后的token
+"""
+
+import asyncio
+import contextvars
+from langchain.callbacks.base import BaseCallbackHandler
+
+FINAL_ANSWER_PREFIX = 'Final Answer:'
+
+# 当前请求的输出流，没有调用方订阅时为None
+_current_stream = contextvars.ContextVar('current_stream', default=None)
+
+
+class AnswerStream:
+    """传递回答事件的异步队列，事件为(类型, 内容)：status、token、done、error
+
+    langchain的同步回调可能在线程池中执行，入队统一通过call_soon_threadsafe交给事件循环，保持先后顺序
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.events = asyncio.Queue()
+
+    def put(self, kind, value):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (kind, value))
+
+    def status(self, text):
+        self.put('status', text)
+
+    def token(self, text):
+        if text:
+            self.put('token', text)
+
+    def finish(self, answer):
+        self.put('done', answer)
+
+    def fail(self, error):
+        self.put('error', error)
+
+    async def __aiter__(self):
+        """逐个产出事件，done之后结束，error时抛出回答任务中的异常"""
+        while True:
+            kind, value = await self.events.get()
+            if kind == 'error':
+                raise value
+            yield kind, value
+            if kind == 'done':
+                return
+
+
+class StreamingCallbackHandler(BaseCallbackHandler):
+    """把大模型的token写入输出流；设置prefix时只输出该前缀之后的内容"""
+
+    # 在事件循环中直接调用，不必为每个token切换到线程池
+    run_inline = True
+
+    def __init__(self, stream, prefix=None):
+        self.stream = stream
+        self.prefix = prefix
+        self.buffer = ''
+        self.started = prefix is None
+        # 前缀之后的空白可能落在后续token中，直到出现正文前都要去掉
+        self.leading = False
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        # ReAct每一步都是一次新的大模型调用，重新查找前缀
+        if self.prefix is not None:
+            self.buffer = ''
+            self.started = False
+
+    def on_llm_new_token(self, token, **kwargs):
+        if not self.started:
+            self.buffer += token
+            index = self.buffer.find(self.prefix)
+            if index < 0:
+                return
+            self.started = True
+            self.leading = True
+            token = self.buffer[index + len(self.prefix):]
+        if self.leading:
+            token = token.lstrip()
+            self.leading = not token
+        self.stream.token(token)
+
+    def on_agent_action(self, action, **kwargs):
+        self.stream.status(f'正在调用工具：{action.tool}')
+
+
+def get_current_stream():
+    return _current_stream.get()
+
+
+def set_current_stream(stream):
+    """设置当前上下文的输出流，返回用于恢复的token"""
+    return _current_stream.set(stream)
+
+
+def reset_current_stream(token):
+    _current_stream.reset(token)
+
+
+def emit_status(text):
+    """有订阅方时输出中间状态"""
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.status(text)
+
+
+def stream_callbacks(prefix=None):
+    """有订阅方时返回写入输出流的回调列表，否则返回None"""
+    stream = _current_stream.get()
+    if stream is None:
+        return None
+    return [StreamingCallbackHandler(stream, prefix)]
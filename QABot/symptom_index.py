@@ -0,0 +1,151 @@
+# symptom_index.py
+"""
+多症状诊断索引
+启动时从GRAPH_BACKEND所选的后端（Neo4j或内存图）一次性读取全部疾病-症状关系，
+构建“症状 -> 疾病ID有序数组”倒排表，之后的诊断在进程内完成，不再访问后端；
+症状权重取IDF（出现该症状的疾病越少越有区分度），
+一个问题中的多个症状先对有序数组求交集，再按IDF累加打分返回前k个疾病
+"""
+
+import os
+import math
+from array import array
+from graph_engine import load_graph_engine
+from index_cache import SharedInstance
+
+SYMPTOM_REL_TYPE = 'DISEASE_SYMPTOM'
+DEFAULT_TOP_K = int(os.getenv('SYMPTOM_TOP_K', 10))
+
+SYMPTOM_PAIRS_CYPHER = f"""
+MATCH (d:Disease)-[:{SYMPTOM_REL_TYPE}]->(s:Symptom)
+RETURN d.name AS disease, s.name AS symptom
+"""
+DISEASE_COUNT_CYPHER = "MATCH (d:Disease) RETURN count(d) AS count"
+
+
+def intersect_sorted(postings):
+    """多个有序ID数组求交集，从最短的数组开始逐个归并"""
+    postings = sorted(postings, key=len)
+    result = postings[0] if postings else array('I')
+    for other in postings[1:]:
+        merged = array('I')
+        i = j = 0
+        while i < len(result) and j < len(other):
+            if result[i] == other[j]:
+                merged.append(result[i])
+                i += 1
+                j += 1
+            elif result[i] < other[j]:
+                i += 1
+            else:
+                j += 1
+        result = merged
+        if not result:
+            break
+    return result
+
+
+class SymptomIndex:
+    """症状倒排表：diseases为疾病名称（按名称排序，ID即下标），symptom_ids为{症状名称: 症状ID}，
+    postings[症状ID]为疾病ID有序数组，idf[症状ID]为症状权重"""
+
+    def __init__(self, pairs, disease_count=None):
+        """由(疾病名称, 症状名称)对构建；disease_count为图谱中的疾病总数，用于计算IDF"""
+        pairs = set(pairs)
+        self.diseases = sorted({disease for disease, _ in pairs})
+        disease_ids = {name: i for i, name in enumerate(self.diseases)}
+        self.disease_count = max(disease_count or 0, len(self.diseases))
+        # 疾病的症状数，同分时症状更少（更具体）的疾病排前面
+        self.symptom_counts = [0] * len(self.diseases)
+        by_symptom = {}
+        for disease, symptom in pairs:
+            disease_id = disease_ids[disease]
+            by_symptom.setdefault(symptom, []).append(disease_id)
+            self.symptom_counts[disease_id] += 1
+
+        self.symptom_ids = {}
+        self.postings = []
+        self.idf = []
+        for symptom, ids in sorted(by_symptom.items()):
+            self.symptom_ids[symptom] = len(self.postings)
+            self.postings.append(array('I', sorted(ids)))
+            self.idf.append(math.log(1 + self.disease_count / len(ids)))
+
+    def diagnose(self, symptoms, k=DEFAULT_TOP_K):
+        """根据多个症状返回(排序后的疾病列表, 同时具有全部已知症状的疾病数)
+
+        每项为{'name', 'score', 'matched'}，matched为该疾病命中的症状名称
+        """
+        known = []
+        for name in dict.fromkeys(symptoms):
+            symptom_id = self.symptom_ids.get(name)
+            if symptom_id is not None:
+                known.append((name, symptom_id))
+        if not known:
+            return [], 0
+
+        # 全部症状都命中的疾病
+        full_matches = intersect_sorted([self.postings[symptom_id] for _, symptom_id in known])
+
+        # 部分命中按IDF累加打分，全部命中的疾病总分必然最高
+        scores = {}
+        matched = {}
+        for name, symptom_id in known:
+            weight = self.idf[symptom_id]
+            for disease_id in self.postings[symptom_id]:
+                scores[disease_id] = scores.get(disease_id, 0.0) + weight
+                matched.setdefault(disease_id, []).append(name)
+
+        ranked = sorted(scores, key=lambda i: (-scores[i], self.symptom_counts[i], i))
+        return [
+            {'name': self.diseases[i], 'score': round(scores[i], 4), 'matched': matched[i]}
+            for i in ranked[:k]
+        ], len(full_matches)
+
+
+def engine_pairs(engine):
+    """内存图中的全部(疾病名称, 症状名称)对"""
+    disease_names = engine.names.get('Disease', [])
+    symptom_names = engine.names.get('Symptom', [])
+    for disease_id, disease in enumerate(disease_names):
+        for symptom_id in engine.neighbor_ids(SYMPTOM_REL_TYPE, disease_id, 'out'):
+            yield disease, symptom_names[symptom_id]
+
+
+def load_symptom_index():
+    """按GRAPH_BACKEND从所选后端读取疾病-症状关系构建索引：neo4j（默认）不需要本机有CSV"""
+    if os.getenv('GRAPH_BACKEND', 'neo4j').lower() == 'memory':
+        # 用按CSV签名校验过的内存图，不用可能尚未重新加载的共享实例
+        engine = load_graph_engine()
+        return SymptomIndex(engine_pairs(engine), engine.node_count('Disease'))
+
+    from utils import get_neo4j_pool
+    pool = get_neo4j_pool()
+    rows = pool.read(SYMPTOM_PAIRS_CYPHER)
+    count = pool.read(DISEASE_COUNT_CYPHER)
+    return SymptomIndex(((row['disease'], row['symptom']) for row in rows), count[0]['count'] if count else None)
+
+
+_symptom_index = SharedInstance(load_symptom_index)
+
+
+def get_symptom_index():
+    """获取进程级共享的症状索引，首次调用时构建，图谱数据重新导入后重新构建"""
+    return _symptom_index.get()
+
+
+async def aget_symptom_index():
+    """get_symptom_index的异步版本：构建需要读取全部疾病-症状关系，放到线程池执行"""
+    return await _symptom_index.aget()
+
+
+if __name__ == '__main__':
+    import time
+    start = time.perf_counter()
+    index = get_symptom_index()
+    print(f'构建索引耗时：{time.perf_counter() - start:.3f}秒')
+    start = time.perf_counter()
+    diseases, full = index.diagnose(['头痛', '发烧', '咳嗽'])
+    print(f'诊断耗时：{(time.perf_counter() - start) * 1000:.3f}毫秒，全部命中{full}个')
+    for disease in diseases:
+        print(disease)
@@ -0,0 +1,119 @@
+# conftest.py
+"""
+测试公共配置：QABot下的模块按平铺方式互相导入，把上级目录加入sys.path；
+clock夹具替换time.monotonic，用于测试TTL和代际检查间隔；
+doctor_data夹具在临时目录生成一份小型GBK编码的doctor数据集，importer_factory用FakeGraph构建导入器
+"""
+
+import os
+import sys
+import time
+import functools
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, 'monotonic', fake)
+    return fake
+
+
+def touch_generation(path):
+    """模拟invalidate_graph_cache()：更新代际文件，修改时间与之前不同"""
+    stamp = os.stat(path).st_mtime_ns + 1_000_000 if os.path.exists(path) else time.time_ns()
+    with open(path, 'a'):
+        pass
+    os.utime(path, ns=(stamp, stamp))
+
+
+def write_csv(path, header, rows, encoding='gbk'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = [','.join(header)] + [','.join(row) for row in rows]
+    with open(path, 'wb') as f:
+        f.write(('\r\n'.join(lines) + '\r\n').encode(encoding))
+
+
+# 小型数据集：Category和Dishes节点文件缺失；关系中含重复行、悬空端点和自环
+DOCTOR_NODES = {
+    'Disease.csv': (['name', 'desc', 'prevent', 'cause', 'cured_prob'], [
+        ('感冒', '上呼吸道感染', '勤洗手', '病毒', '90%'),
+        ('鼻炎', '鼻腔炎症', '', '过敏', ''),
+        ('肺炎', '肺部感染', '接种疫苗', '细菌', '80%'),
+        ('百日咳', '呼吸道传染病', '', '', ''),
+    ]),
+    'Symptom.csv': (['name'], [('咳嗽',), ('发热',), ('鼻塞',), ('头痛',)]),
+    'Drug.csv': (['name'], [('阿莫西林',), ('感冒灵',)]),
+    'Food.csv': (['name'], [('梨',), ('辣椒',)]),
+    'Cureway.csv': (['name'], [('药物治疗',), ('休息',)]),
+    'Department.csv': (['name'], [('内科',), ('耳鼻喉科',)]),
+    'Check.csv': (['name'], [('血常规',)]),
+}
+DOCTOR_RELATIONS = {
+    'DISEASE_SYMPTOM.csv': [('感冒', '咳嗽'), ('感冒', '发热'), ('感冒', '鼻塞'), ('鼻炎', '鼻塞'), ('鼻炎', '头痛'),
+                            ('肺炎', '咳嗽'), ('肺炎', '发热'), ('百日咳', '咳嗽'),
+                            ('感冒', '咳嗽'), ('流感', '发热'), ('感冒', '腹泻'), ('', '咳嗽')],
+    'DISEASE_DRUG.csv': [('感冒', '感冒灵'), ('肺炎', '阿莫西林'), ('百日咳', '阿莫西林')],
+    'DISEASE_ACOMPANY.csv': [('肺炎', '感冒'), ('感冒', '感冒')],
+    'DISEASE_CUREWAY.csv': [('感冒', '休息'), ('肺炎', '药物治疗'), ('肺炎', '休息')],
+    'DISEASE_DO_EAT.csv': [('感冒', '梨'), ('肺炎', '梨')],
+    'DISEASE_NOT_EAT.csv': [('感冒', '辣椒')],
+    'DISEASE_DEPARTMENT.csv': [('感冒', '内科'), ('鼻炎', '耳鼻喉科')],
+    'DISEASE_CHECK.csv': [('肺炎', '血常规')],
+}
+# 校验后应写入的关系
+VALID_RELATIONS = {
+    (file[:-len('.csv')], from_name, to_name)
+    for file, rows in DOCTOR_RELATIONS.items() for from_name, to_name in rows
+    if from_name and from_name != to_name and from_name != '流感' and to_name != '腹泻'
+}
+
+
+@pytest.fixture
+def doctor_data(tmp_path):
+    """生成doctor/nodes和doctor/relations，返回doctor目录"""
+    root = tmp_path / 'doctor'
+    for file, (header, rows) in DOCTOR_NODES.items():
+        write_csv(str(root / 'nodes' / file), header, rows)
+    for file, rows in DOCTOR_RELATIONS.items():
+        write_csv(str(root / 'relations' / file), ['from', 'to'], rows)
+    return root
+
+
+@pytest.fixture
+def importer_factory(tmp_path, monkeypatch, doctor_data):
+    """返回importer_factory(graph, **kwargs)：数据目录、检查点、清单和代际文件都指向临时目录"""
+    pytest.importorskip('py2neo')
+    pytest.importorskip('dotenv')
+    # 导入器在模块导入时于当前目录创建日志文件
+    monkeypatch.chdir(tmp_path)
+    import graph_cache
+    import neo4j_import_fixed
+    from import_progress import ImportProgress
+
+    monkeypatch.setattr(neo4j_import_fixed, 'NODES_PATH', str(doctor_data / 'nodes'))
+    monkeypatch.setattr(neo4j_import_fixed, 'RELATIONS_PATH', str(doctor_data / 'relations'))
+    monkeypatch.setattr(neo4j_import_fixed, 'ImportProgress', functools.partial(
+        ImportProgress, checkpoint_path=str(tmp_path / 'checkpoint.json'), status_path=str(tmp_path / 'status.json')))
+    monkeypatch.setattr(graph_cache, 'GENERATION_FILE', str(tmp_path / 'generation'))
+    monkeypatch.setattr(neo4j_import_fixed.time, 'sleep', lambda seconds: None)
+
+    def factory(graph, **kwargs):
+        monkeypatch.setattr(neo4j_import_fixed, 'Graph', lambda *args, **options: graph)
+        importer = neo4j_import_fixed.Neo4jImporterFixed(**kwargs)
+        importer.manifest_path = str(tmp_path / 'import_manifest.json')
+        return importer
+    return factory
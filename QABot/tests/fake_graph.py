@@ -0,0 +1,150 @@
+# fake_graph.py
+"""
+py2neo Graph的内存替身，只理解导入器发出的几种UNWIND语句：
+节点的CREATE/MERGE/DETACH DELETE、关系的MERGE/DELETE，以及按名称查询节点；
+事务中的写入在commit时才生效，rollback时丢弃。fail回调可按语句和行注入异常（如死锁）
+"""
+
+import re
+import threading
+
+CREATE_NODE = re.compile(r'CREATE \(n:(\w+)\) SET n = row')
+MERGE_NODE = re.compile(r'MERGE \(n:(\w+) \{name: row\.name\}\) SET n = row')
+DELETE_NODE = re.compile(r'MATCH \(n:(\w+) \{name: row\.name\}\) DETACH DELETE n')
+MERGE_RELATIONSHIP = re.compile(r'MATCH \(from:(\w+) \{name: row\.from\}\)\s+MATCH \(to:(\w+) \{name: row\.to\}\)\s+'
+                                r'MERGE \(from\)-\[r:(\w+)\]->\(to\)')
+DELETE_RELATIONSHIP = re.compile(r'MATCH \(from:(\w+) \{name: row\.from\}\)-\[r:(\w+)\]->\(to:(\w+) \{name: row\.to\}\)\s+'
+                                 r'DELETE r')
+MATCH_NODE = re.compile(r'MATCH \(n:(\w+) \{name: row\.name\}\)')
+NODE_NAMES = re.compile(r'MATCH \(n:(\w+)\) RETURN n\.name AS name')
+
+
+class TransientError(Exception):
+    """与py2neo的瞬时错误同名，导入器按类名和错误码判断是否重试"""
+
+
+def deadlock():
+    return TransientError('Neo.TransientError.Transaction.DeadlockDetected: ForsetiClient can\'t acquire lock')
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+
+class FakeTransaction:
+    def __init__(self, graph):
+        self.graph = graph
+        self.operations = []
+
+    def run(self, query, **params):
+        rows = params.get('rows', [])
+        error = self.graph.fail(query, rows) if self.graph.fail else None
+        if error is not None:
+            raise error
+        count, operation = self.graph.plan(query, rows)
+        self.operations.append(operation)
+        return FakeResult([{'count': count}])
+
+
+class FakeGraph:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.nodes = {}             # 标签 -> 属性字典列表（CREATE可能产生同名节点）
+        self.relationships = set()  # (关系类型, 起点名称, 终点名称)
+        self.queries = []           # graph.run执行过的语句
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail = None
+
+    def names(self, label):
+        with self.lock:
+            return [node.get('name') for node in self.nodes.get(label, [])]
+
+    def has_node(self, label, name):
+        return any(node.get('name') == name for node in self.nodes.get(label, []))
+
+    def plan(self, query, rows):
+        """计算语句的返回行数，返回(行数, 提交时执行的写入函数)"""
+        with self.lock:
+            match = CREATE_NODE.search(query)
+            if match:
+                label = match.group(1)
+                return len(rows), lambda: self.nodes.setdefault(label, []).extend(dict(row) for row in rows)
+
+            match = MERGE_NODE.search(query)
+            if match:
+                label = match.group(1)
+
+                def merge():
+                    nodes = self.nodes.setdefault(label, [])
+                    for row in rows:
+                        existing = [node for node in nodes if node.get('name') == row['name']]
+                        if existing:
+                            existing[0].clear()
+                            existing[0].update(row)
+                        else:
+                            nodes.append(dict(row))
+                return len(rows), merge
+
+            match = DELETE_NODE.search(query)
+            if match:
+                label = match.group(1)
+                names = {row['name'] for row in rows}
+                count = sum(1 for node in self.nodes.get(label, []) if node.get('name') in names)
+
+                def delete():
+                    self.nodes[label] = [node for node in self.nodes.get(label, []) if node.get('name') not in names]
+                    self.relationships.difference_update(
+                        [rel for rel in self.relationships if rel[1] in names or rel[2] in names])
+                return count, delete
+
+            match = MERGE_RELATIONSHIP.search(query)
+            if match:
+                from_type, to_type, rel_type = match.groups()
+                matched = [(rel_type, row['from'], row['to']) for row in rows
+                           if self.has_node(from_type, row['from']) and self.has_node(to_type, row['to'])]
+                return len(matched), lambda: self.relationships.update(matched)
+
+            match = DELETE_RELATIONSHIP.search(query)
+            if match:
+                rel_type = match.group(2)
+                removed = {(rel_type, row['from'], row['to']) for row in rows} & self.relationships
+                return len(removed), lambda: self.relationships.difference_update(removed)
+
+            match = MATCH_NODE.search(query)
+            if match:
+                label = match.group(1)
+                return sum(1 for row in rows if self.has_node(label, row['name'])), lambda: None
+
+        raise AssertionError(f'FakeGraph不支持的语句：{query}')
+
+    def run(self, query, **params):
+        with self.lock:
+            self.queries.append(query)
+            if 'dbms.components' in query:
+                return FakeResult([{'name': 'Neo4j Kernel', 'version': '5.20.0'}])
+            if query.strip() == 'MATCH (n) DETACH DELETE n':
+                self.nodes.clear()
+                self.relationships.clear()
+                return FakeResult([])
+            match = NODE_NAMES.search(query)
+            if match:
+                return FakeResult([{'name': node.get('name')} for node in self.nodes.get(match.group(1), [])])
+            return FakeResult([])
+
+    def begin(self):
+        return FakeTransaction(self)
+
+    def commit(self, tx):
+        with self.lock:
+            for operation in tx.operations:
+                operation()
+            self.commits += 1
+
+    def rollback(self, tx):
+        with self.lock:
+            self.rollbacks += 1
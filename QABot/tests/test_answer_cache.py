@@ -0,0 +1,107 @@
+import numpy as np
+from conftest import touch_generation
+from answer_cache import AnswerCache
+from graph_cache import GENERATION_CHECK_INTERVAL
+
+ENTITIES = ('感冒', '鼻炎')
+
+
+def fake_signature(query):
+    """用固定的实体表代替实体词典"""
+    return frozenset(name for name in ENTITIES if name in query), ('不' in query,)
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def build_cache(tmp_path, **kwargs):
+    return AnswerCache(generation_path=str(tmp_path / 'generation'), signature=fake_signature, **kwargs)
+
+
+def test_exact_hit_skips_embedding(tmp_path, clock):
+    cache = build_cache(tmp_path)
+    vector = unit(1, 0, 0)
+    cache.put('感冒吃什么药？', vector, '答案', ['graph_func'])
+
+    def embed(query):
+        raise AssertionError('精确命中时不应计算问题向量')
+
+    # 标点、空白和全角字符归一化后命中
+    answer, hit_vector = cache.lookup(' 感冒吃什么药 ', embed)
+    assert answer == '答案'
+    assert hit_vector is vector
+    assert cache.stats()['exact_hits'] == 1
+
+
+def test_semantic_hit(tmp_path, clock):
+    cache = build_cache(tmp_path)
+    cache.put('感冒吃什么药', unit(1, 0, 0), '答案', ['graph_func'])
+    answer, vector = cache.lookup('感冒应该吃什么药', lambda query: [1.0, 0.05, 0.0])
+    assert answer == '答案'
+    assert np.allclose(vector, unit(1, 0.05, 0))
+    assert cache.stats()['semantic_hits'] == 1
+
+
+def test_semantic_miss_below_threshold(tmp_path, clock):
+    cache = build_cache(tmp_path)
+    cache.put('感冒吃什么药', unit(1, 0, 0), '答案', ['graph_func'])
+    assert cache.lookup('感冒怎么预防', lambda query: [1.0, 1.0, 0.0])[0] is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_semantic_requires_same_entities_and_negation(tmp_path, clock):
+    cache = build_cache(tmp_path)
+    cache.put('感冒吃什么药', unit(1, 0, 0), '答案', ['graph_func'])
+    # 向量几乎相同，但实体或否定词不同，不能复用
+    assert cache.lookup('鼻炎吃什么药', lambda query: [1.0, 0.0, 0.0])[0] is None
+    assert cache.lookup('感冒不能吃什么药', lambda query: [1.0, 0.0, 0.0])[0] is None
+
+
+def test_missing_signature_only_allows_exact_graph_hits(tmp_path, clock):
+    cache = AnswerCache(generation_path=str(tmp_path / 'generation'), signature=lambda query: None)
+    cache.put('感冒吃什么药', unit(1, 0, 0), '图谱答案', ['graph_func'])
+    cache.put('寻医问药网是什么', unit(0, 1, 0), '检索答案', ['retrival_func'])
+    assert cache.lookup('感冒该吃什么药', lambda query: [1.0, 0.0, 0.0])[0] is None
+    assert cache.lookup('寻医问药网是什么网站', lambda query: [0.0, 1.0, 0.0])[0] == '检索答案'
+
+
+def test_excluded_tools_and_empty_answers_are_not_cached(tmp_path, clock):
+    cache = build_cache(tmp_path, exclude_tools=['search_func'])
+    cache.put('今天天气', unit(1, 0, 0), '晴', ['search_func', 'generic_func'])
+    cache.put('你好', unit(0, 1, 0), '', [])
+    assert cache.stats()['size'] == 0
+
+
+def test_invalidate_by_tool(tmp_path, clock):
+    cache = build_cache(tmp_path)
+    cache.put('感冒吃什么药', unit(1, 0, 0), '图谱答案', ['graph_func'])
+    cache.put('寻医问药网是什么', unit(0, 1, 0), '检索答案', ['retrival_func'])
+    cache.put('你好', unit(0, 0, 1), '你好', [])
+
+    assert cache.invalidate('retrival_func') == 1
+    assert cache.lookup_exact('寻医问药网是什么') is None
+    assert cache.lookup_exact('感冒吃什么药')['answer'] == '图谱答案'
+    # 没有调用工具的答案记为agent
+    assert cache.invalidate('agent') == 1
+    assert cache.invalidate() == 1
+    assert cache.stats()['size'] == 0
+
+
+def test_generation_change_drops_graph_answers(tmp_path, clock):
+    cache = build_cache(tmp_path)
+    cache.put('感冒吃什么药', unit(1, 0, 0), '图谱答案', ['graph_func'])
+    cache.put('寻医问药网是什么', unit(0, 1, 0), '检索答案', ['retrival_func'])
+
+    touch_generation(tmp_path / 'generation')
+    clock.advance(GENERATION_CHECK_INTERVAL)
+    assert cache.lookup_exact('感冒吃什么药') is None
+    assert cache.lookup_exact('寻医问药网是什么')['answer'] == '检索答案'
+
+
+def test_ttl(tmp_path, clock):
+    cache = build_cache(tmp_path, ttl=60)
+    cache.put('感冒吃什么药', unit(1, 0, 0), '答案', ['graph_func'])
+    clock.advance(60)
+    assert cache.lookup('感冒吃什么药', lambda query: [1.0, 0.0, 0.0])[0] is None
@@ -0,0 +1,94 @@
+import codecs
+import pytest
+from csv_stream import CSVDecodeError, sniff_encoding, iter_decoded_lines, iter_csv_rows
+
+ROWS = [('name', 'desc'), ('感冒', '风寒感冒'), ('鼻炎', '鼻腔炎症')]
+
+
+def write_csv(path, encoding, prefix=b''):
+    text = ''.join(','.join(row) + '\n' for row in ROWS)
+    path.write_bytes(prefix + text.encode(encoding))
+    return path
+
+
+def test_sniff_gbk(tmp_path):
+    path = write_csv(tmp_path / 'gbk.csv', 'gbk')
+    assert sniff_encoding(path) == 'gbk'
+    reader, encoding = iter_csv_rows(path)
+    assert encoding == 'gbk'
+    assert [(row['name'], row['desc']) for row in reader] == ROWS[1:]
+
+
+def test_sniff_utf8_and_bom(tmp_path):
+    assert sniff_encoding(write_csv(tmp_path / 'utf8.csv', 'utf-8')) == 'utf-8'
+    path = write_csv(tmp_path / 'bom.csv', 'utf-8', prefix=codecs.BOM_UTF8)
+    assert sniff_encoding(path) == 'utf-8-sig'
+    reader, _ = iter_csv_rows(path)
+    assert reader.fieldnames == ['name', 'desc']
+
+
+def test_sniff_prefix_cut_inside_character(tmp_path):
+    # 探测前缀在多字节字符中间截断时不能误判
+    path = write_csv(tmp_path / 'gbk.csv', 'gbk')
+    assert sniff_encoding(path, sniff_bytes=len('name,desc\n') + 1) == 'gbk'
+
+
+@pytest.mark.parametrize('chunk_bytes', [3, 7, 1024])
+def test_lines_across_chunks(tmp_path, chunk_bytes):
+    path = write_csv(tmp_path / 'utf8.csv', 'utf-8')
+    lines = list(iter_decoded_lines(path, 'utf-8', chunk_bytes=chunk_bytes))
+    assert lines == [','.join(row) + '\n' for row in ROWS]
+
+
+@pytest.mark.parametrize('chunk_bytes', [3, 7, 1024])
+def test_decode_error_position(tmp_path, chunk_bytes):
+    head = 'name,desc\n感冒,风寒感冒\n'.encode('utf-8') + b'bad,'
+    path = tmp_path / 'broken.csv'
+    path.write_bytes(head + b'\xff\xfe\n')
+    with pytest.raises(CSVDecodeError) as info:
+        list(iter_decoded_lines(path, 'utf-8', chunk_bytes=chunk_bytes))
+    assert info.value.line_number == 3
+    assert info.value.byte_offset == len(head)
+    assert '第3行' in str(info.value)
+
+
+def write_mixed(path, head, tail):
+    """前缀只有ASCII（探测为utf-8），之后出现GBK内容"""
+    path.write_bytes(head.encode('ascii') + tail.encode('gbk'))
+    return path
+
+
+@pytest.mark.parametrize('chunk_bytes', [5, 1024])
+def test_fallback_to_next_encoding(tmp_path, chunk_bytes):
+    from csv_stream import iter_lines_with_fallback
+    path = write_mixed(tmp_path / 'mixed.csv', 'name,desc\nflu,cold\n', '感冒,风寒感冒\n')
+    lines = list(iter_lines_with_fallback(path, 'utf-8', chunk_bytes=chunk_bytes))
+    assert lines == ['name,desc\n', 'flu,cold\n', '感冒,风寒感冒\n']
+
+
+def test_fallback_beyond_sniff_prefix(tmp_path):
+    head = 'name,desc\n' + ''.join(f'n{i},d{i}\n' for i in range(8000))
+    path = write_mixed(tmp_path / 'mixed.csv', head, '感冒,风寒感冒\n')
+    assert len(head) > 64 * 1024
+    reader, encoding = iter_csv_rows(path)
+    rows = list(reader)
+    assert encoding == 'utf-8'
+    assert len(rows) == 8001 and rows[-1] == {'name': '感冒', 'desc': '风寒感冒'}
+
+
+def test_fallback_rejects_changed_prefix(tmp_path):
+    from csv_stream import iter_lines_with_fallback
+    # 已产出的UTF-8中文行在GBK下解码结果不同，不能静默切换
+    path = tmp_path / 'broken.csv'
+    path.write_bytes('name\n感冒\n'.encode('utf-8') + '鼻炎\n'.encode('gbk'))
+    with pytest.raises(CSVDecodeError) as info:
+        list(iter_lines_with_fallback(path, 'utf-8', chunk_bytes=4))
+    assert info.value.encoding == 'utf-8'
+    assert info.value.line_number == 3
+
+
+def test_explicit_encoding_does_not_fall_back(tmp_path):
+    path = write_mixed(tmp_path / 'mixed.csv', 'name\nflu\n', '感冒\n')
+    reader, _ = iter_csv_rows(path, encoding='utf-8')
+    with pytest.raises(CSVDecodeError):
+        list(reader)
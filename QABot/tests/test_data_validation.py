@@ -0,0 +1,50 @@
+from conftest import DOCTOR_RELATIONS, VALID_RELATIONS
+from data_validation import DANGLING_SAMPLES, new_report, filter_relation_rows, RelationValidator
+
+
+def test_filter_relation_rows():
+    rows = [{'from': ' 感冒 ', 'to': '咳嗽'}, {'from': '感冒', 'to': '咳嗽'}, {'from': '流感', 'to': '发热'},
+            {'from': '感冒', 'to': '腹泻'}, {'from': '流感', 'to': '腹泻'}, {'from': '', 'to': '咳嗽'},
+            {'from': '感冒', 'to': None}, {'from': '感冒', 'to': '感冒'}]
+    report = new_report()
+    valid = list(filter_relation_rows(rows, {'感冒'}, {'咳嗽', '发热', '感冒'}, report))
+
+    assert valid == [{'from': '感冒', 'to': '咳嗽'}]
+    assert report['rows'] == len(rows)
+    assert (report['valid'], report['duplicates'], report['empty'], report['self_loops']) == (1, 1, 2, 1)
+    # 两端都悬空的行同时计入起点和终点
+    assert (report['dangling_from'], report['dangling_to']) == (2, 2)
+    assert report['dangling_samples'] == ['流感 -> 发热', '感冒 -> 腹泻', '流感 -> 腹泻']
+
+
+def test_dangling_samples_are_bounded():
+    report = new_report()
+    rows = [{'from': f'病{i}', 'to': '咳嗽'} for i in range(DANGLING_SAMPLES + 3)]
+    assert list(filter_relation_rows(rows, set(), {'咳嗽'}, report)) == []
+    assert report['dangling_from'] == DANGLING_SAMPLES + 3
+    assert len(report['dangling_samples']) == DANGLING_SAMPLES
+
+
+def test_validate_all(doctor_data):
+    validator = RelationValidator(str(doctor_data / 'nodes'), str(doctor_data / 'relations'))
+    reports = validator.validate_all()
+
+    # 缺失的关系文件不出现在报告中，缺失的节点文件视为空集合
+    assert set(reports) == {file[:-len('.csv')] for file in DOCTOR_RELATIONS}
+    assert validator.node_names['Category'] == set()
+    for rel_type, report in reports.items():
+        assert report['valid'] == sum(1 for rel in VALID_RELATIONS if rel[0] == rel_type)
+        assert report['rows'] == len(DOCTOR_RELATIONS[rel_type + '.csv'])
+    symptom = reports['DISEASE_SYMPTOM']
+    assert (symptom['duplicates'], symptom['dangling_from'], symptom['dangling_to'], symptom['empty']) == (1, 1, 1, 1)
+    assert reports['DISEASE_ACOMPANY']['self_loops'] == 1
+
+
+def test_filter_rows_matches_validate_file(doctor_data):
+    validator = RelationValidator(str(doctor_data / 'nodes'), str(doctor_data / 'relations'))
+    rows = [{'from': from_name, 'to': to_name} for from_name, to_name in DOCTOR_RELATIONS['DISEASE_DRUG.csv']]
+    valid = list(validator.filter_rows('DISEASE_DRUG', rows + [{'from': '感冒', 'to': '布洛芬'}]))
+
+    assert {(row['from'], row['to']) for row in valid} == set(DOCTOR_RELATIONS['DISEASE_DRUG.csv'])
+    assert validator.reports['DISEASE_DRUG']['dangling_to'] == 1
+    assert validator.validate_file('DISEASE_DRUG')['dangling_to'] == 0
@@ -0,0 +1,50 @@
+from entity_linker import EntityLinker, max_edits
+
+
+def build_linker():
+    return EntityLinker().build({
+        'disease': ['鼻炎', '鼻病', '过敏性鼻炎', '急性支气管炎', '肺炎', '咽喉炎'],
+        'drug': ['阿莫西林胶囊', '阿莫西林颗粒'],
+    })
+
+
+def test_max_edits():
+    # 默认阈值0.75：4个字以下不允许编辑，4到7个字允许1处
+    assert [max_edits(length, 0.75) for length in (2, 3, 4, 7, 8)] == [0, 0, 1, 1, 2]
+
+
+def test_exact_match():
+    assert build_linker().link('disease', '鼻炎') == [('鼻炎', 1.0)]
+
+
+def test_short_mention_requires_exact_match():
+    linker = build_linker()
+    # 两个字的名称一个字不同就是另一种病，不做模糊链接
+    assert linker.link('disease', '胃炎') == []
+    assert linker.link('disease', '鼻') == []
+
+
+def test_three_char_mention_below_threshold():
+    # 3个字错1个字得分0.667，低于默认阈值
+    assert build_linker().link('disease', '咽喉痛') == []
+    assert build_linker().link('disease', '咽喉痛', threshold=0.6) == [('咽喉炎', 0.6667)]
+
+
+def test_fuzzy_match_on_long_mention():
+    linker = build_linker()
+    assert linker.link('disease', '急性气管炎') == [('急性支气管炎', 0.8333)]
+    assert linker.link('disease', '过敏鼻炎')[0] == ('过敏性鼻炎', 0.8)
+
+
+def test_candidates_never_shorter_than_exact_only_length():
+    # 长mention不会链接到只允许精确匹配的两字名称
+    assert all(len(name) > 2 for name, _ in build_linker().link('disease', '鼻炎病啊', threshold=0.5))
+
+
+def test_link_entities():
+    linked = build_linker().link_entities({
+        'disease': ['急性气管炎', '胃炎', '急性支气管炎'],
+        'drug': '阿莫西林胶',
+        'symptom': ['头疼'],
+    })
+    assert linked == {'disease': ['急性支气管炎'], 'drug': ['阿莫西林胶囊'], 'symptom': []}
@@ -0,0 +1,44 @@
+from entity_matcher import EntityMatcher
+
+
+def build_matcher():
+    return EntityMatcher().build({
+        'disease': {'鼻炎', '过敏性鼻炎', '感冒', '炎'},
+        'symptom': {'鼻塞', '炎症', '咳嗽'},
+        'drug': {'感冒灵', '咳嗽'},
+    })
+
+
+def test_longest_match_wins():
+    result = build_matcher().extract('过敏性鼻炎会鼻塞吗')
+    assert result == {'disease': ['过敏性鼻炎'], 'symptom': ['鼻塞'], 'drug': []}
+
+
+def test_leftmost_match_wins_on_overlap():
+    # “鼻炎”和“炎症”重叠，只保留起始位置更靠左的
+    result = build_matcher().extract('鼻炎症状')
+    assert result['disease'] == ['鼻炎']
+    assert result['symptom'] == []
+
+
+def test_longer_name_with_shorter_prefix():
+    # “感冒灵”包含“感冒”，最长匹配只识别为药品
+    result = build_matcher().extract('感冒灵怎么吃')
+    assert result['drug'] == ['感冒灵']
+    assert result['disease'] == []
+
+
+def test_name_in_several_slots():
+    result = build_matcher().extract('一直咳嗽')
+    assert result['symptom'] == ['咳嗽']
+    assert result['drug'] == ['咳嗽']
+
+
+def test_repeated_and_short_names():
+    # 单字名称不参与匹配，同一名称只输出一次
+    result = build_matcher().extract('感冒了，还是感冒')
+    assert result == {'disease': ['感冒'], 'symptom': [], 'drug': []}
+
+
+def test_no_match():
+    assert build_matcher().extract('你好') == {'disease': [], 'symptom': [], 'drug': []}
@@ -0,0 +1,58 @@
+from conftest import touch_generation
+from graph_cache import GENERATION_CHECK_INTERVAL, GraphResultCache
+
+POSITIVE = [{'name': '感冒', 'desc': '风寒感冒'}]
+NEGATIVE = [{'name': None}]
+
+
+def test_lru_eviction(tmp_path, clock):
+    cache = GraphResultCache(maxsize=2, generation_path=str(tmp_path / 'generation'))
+    cache.put('a', POSITIVE)
+    cache.put('b', POSITIVE)
+    assert cache.get('a') == (True, POSITIVE)
+    # a刚被访问过，淘汰最久未使用的b
+    cache.put('c', POSITIVE)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a')[0] and cache.get('c')[0]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_and_negative_ttl(tmp_path, clock):
+    cache = GraphResultCache(ttl=100, negative_ttl=10, generation_path=str(tmp_path / 'generation'))
+    cache.put('positive', POSITIVE)
+    cache.put('negative', NEGATIVE)
+    assert cache.get('negative') == (True, NEGATIVE)
+
+    clock.advance(10)
+    assert cache.get('negative') == (False, None)
+    assert cache.get('positive') == (True, POSITIVE)
+
+    clock.advance(90)
+    assert cache.get('positive') == (False, None)
+    stats = cache.stats()
+    assert (stats['hits'], stats['negative_hits'], stats['misses'], stats['size']) == (1, 1, 2, 0)
+
+
+def test_zero_size_disables_cache(tmp_path, clock):
+    cache = GraphResultCache(maxsize=0, generation_path=str(tmp_path / 'generation'))
+    cache.put('a', POSITIVE)
+    assert cache.get('a') == (False, None)
+
+
+def test_generation_invalidation(tmp_path, clock):
+    path = tmp_path / 'generation'
+    cache = GraphResultCache(generation_path=str(path))
+    cache.put('a', POSITIVE)
+
+    # 代际文件变化后，检查间隔内仍然使用本地缓存
+    touch_generation(path)
+    assert cache.get('a') == (True, POSITIVE)
+
+    clock.advance(GENERATION_CHECK_INTERVAL)
+    assert cache.get('a') == (False, None)
+    assert cache.stats()['invalidations'] == 1
+
+    # 代际不再变化时新写入的结果正常命中
+    cache.put('a', POSITIVE)
+    clock.advance(GENERATION_CHECK_INTERVAL)
+    assert cache.get('a') == (True, POSITIVE)
@@ -0,0 +1,84 @@
+import pytest
+from collections import Counter
+from config import RELATIONSHIP_CONFIGS
+from conftest import DOCTOR_NODES, VALID_RELATIONS
+from graph_engine import TEMPLATE_QUERIES, GraphEngine
+
+
+@pytest.fixture
+def engine(doctor_data):
+    return GraphEngine().load_csv(str(doctor_data / 'nodes'), str(doctor_data / 'relations'))
+
+
+def node_names(label):
+    return [row[0] for row in DOCTOR_NODES.get(label + '.csv', (None, []))[1]]
+
+
+# 按Cypher语义计算的期望结果：COUNT { (m)--() }是节点在全部关系上的度数
+DEGREES = Counter()
+for rel_type, from_name, to_name in VALID_RELATIONS:
+    DEGREES[RELATIONSHIP_CONFIGS[rel_type]['from_type'], from_name] += 1
+    DEGREES[RELATIONSHIP_CONFIGS[rel_type]['to_type'], to_name] += 1
+
+
+def cypher_neighbors(rel_type, name, direction):
+    config = RELATIONSHIP_CONFIGS[rel_type]
+    if direction == 'out':
+        label, names = config['to_type'], {to for rel, frm, to in VALID_RELATIONS if rel == rel_type and frm == name}
+    else:
+        label, names = config['from_type'], {frm for rel, frm, to in VALID_RELATIONS if rel == rel_type and to == name}
+    return sorted(names, key=lambda m: (-DEGREES[label, m], m))
+
+
+def cypher_template(key, value, limit=10):
+    spec = TEMPLATE_QUERIES[key]
+    if spec['kind'] in ('out', 'in'):
+        config = RELATIONSHIP_CONFIGS[spec['rel_type']]
+        if value not in node_names(config['from_type' if spec['kind'] == 'out' else 'to_type']):
+            return []
+        names = cypher_neighbors(spec['rel_type'], value, spec['kind'])
+        return [{'RES': '、'.join(names[:limit]), 'TOTAL': len(names)}]
+    groups = [cypher_neighbors(rel_type, value, 'out') for rel_type in spec['rel_types']]
+    if not all(groups):
+        return []
+    row = {column: '、'.join(group[:limit]) for column, group in zip(spec['columns'], groups)}
+    row.update({total: len(group) for total, group in zip(spec['totals'], groups)})
+    return [row]
+
+
+@pytest.mark.parametrize('key', [key for key, spec in TEMPLATE_QUERIES.items() if spec['kind'] != 'property'])
+@pytest.mark.parametrize('limit', [1, 10])
+def test_neighbor_templates_match_cypher(engine, key, limit):
+    values = {name for label in ('Disease', 'Symptom', 'Drug') for name in node_names(label)} | {'流感', '腹泻', '不存在'}
+    slot = TEMPLATE_QUERIES[key]['slot']
+    for value in values:
+        assert engine.run_template(key, {slot: value, 'limit': limit}) == cypher_template(key, value, limit), value
+
+
+def test_unknown_node_returns_no_rows(engine):
+    assert engine.run_template('desc', {'disease': '不存在'}) == []
+    assert engine.run_template('disease_symptom', {'disease': '不存在', 'limit': 10}) == []
+    assert engine.run_template('symptom', {'symptom': '不存在', 'limit': 10}) == []
+    assert engine.run_template('cure_way', {'disease': '不存在', 'limit': 10}) == []
+
+
+def test_known_node_without_neighbors_returns_empty_row(engine):
+    assert engine.run_template('not_eat', {'disease': '百日咳', 'limit': 10}) == [{'RES': '', 'TOTAL': 0}]
+    # cure_way要求三种关系都存在
+    assert engine.run_template('cure_way', {'disease': '鼻炎', 'limit': 10}) == []
+
+
+def test_properties(engine):
+    assert engine.run_template('desc', {'disease': '感冒'}) == [{'RES': '上呼吸道感染'}]
+    # 空值不写入节点，对应Cypher中的null
+    assert engine.run_template('prevent', {'disease': '鼻炎'}) == [{'RES': None}]
+
+
+def test_relations_are_filtered_like_the_importer(engine):
+    # 悬空端点不会创建节点，自环和重复关系被过滤
+    assert engine.node_id('Disease', '流感') is None
+    assert engine.node_id('Symptom', '腹泻') is None
+    assert engine.run_template('acompany', {'disease': '感冒', 'limit': 10}) == [{'RES': '', 'TOTAL': 0}]
+    assert engine.run_template('acompany', {'disease': '肺炎', 'limit': 10}) == [{'RES': '感冒', 'TOTAL': 1}]
+    assert engine.run_template('symptom', {'symptom': '咳嗽', 'limit': 10})[0]['TOTAL'] == 3
+    assert sorted(engine.names['Disease']) == sorted(node_names('Disease'))
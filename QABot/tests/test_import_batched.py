@@ -0,0 +1,53 @@
+import json
+from conftest import DOCTOR_NODES, VALID_RELATIONS
+from fake_graph import FakeGraph
+
+
+def node_names(file):
+    return sorted(row[0] for row in DOCTOR_NODES[file][1])
+
+
+def test_batched_import(importer_factory):
+    graph = FakeGraph()
+    importer = importer_factory(graph, batch_size=2)
+    importer.run_import(clear_db=True, test_encoding=False, batched=True)
+
+    assert sorted(graph.names('Disease')) == node_names('Disease.csv')
+    assert sorted(graph.names('Symptom')) == node_names('Symptom.csv')
+    assert graph.names('Category') == []
+    # 校验过滤掉重复、悬空和自环后的关系全部写入
+    assert graph.relationships == VALID_RELATIONS
+    # 空值属性不写入节点
+    disease = next(node for node in graph.nodes['Disease'] if node['name'] == '鼻炎')
+    assert disease == {'name': '鼻炎', 'desc': '鼻腔炎症', 'cause': '过敏'}
+    assert graph.rollbacks == 0
+
+
+def test_rows_are_committed_in_batches(importer_factory):
+    graph = FakeGraph()
+    batches = []
+    graph.fail = lambda query, rows: batches.append((query, len(rows)))
+    importer = importer_factory(graph, batch_size=3)
+    importer.create_nodes_batched()
+
+    disease_batches = [size for query, size in batches if 'CREATE (n:Disease)' in query]
+    assert disease_batches == [3, 1]
+    assert all(size <= 3 for _, size in batches)
+
+
+def test_failed_batch_stops_stream_and_marks_incomplete(importer_factory, tmp_path):
+    graph = FakeGraph()
+    graph.fail = lambda query, rows: RuntimeError('写入失败') \
+        if 'CREATE (n:Symptom)' in query and rows[0]['name'] == '鼻塞' else None
+    importer = importer_factory(graph, batch_size=2)
+    importer.run_import(clear_db=True, test_encoding=False, batched=True)
+
+    # 失败批次回滚，之后的批次不再提交，其他节点类型不受影响
+    assert graph.names('Symptom') == ['咳嗽', '发热']
+    assert sorted(graph.names('Disease')) == node_names('Disease.csv')
+    assert graph.rollbacks == 1
+    assert not importer.progress.complete()
+    status = json.loads((tmp_path / 'status.json').read_text(encoding='utf-8'))
+    assert status['state'] == 'incomplete'
+    assert status['rows_failed'] == 2
+    assert (tmp_path / 'checkpoint.json').exists()
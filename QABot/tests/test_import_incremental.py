@@ -0,0 +1,41 @@
+import json
+from conftest import DOCTOR_NODES, DOCTOR_RELATIONS, VALID_RELATIONS, write_csv
+from fake_graph import FakeGraph
+
+
+def load_manifest(tmp_path):
+    return json.loads((tmp_path / 'import_manifest.json').read_text(encoding='utf-8'))
+
+
+def test_manifest_keeps_only_key_fields(importer_factory, tmp_path):
+    importer_factory(FakeGraph(), batch_size=2).run_import(clear_db=True, test_encoding=False, batched=True)
+
+    files = load_manifest(tmp_path)['files']
+    diseases = files['nodes/Disease.csv']['rows']
+    assert sorted(row['name'] for row in diseases.values()) == sorted(row[0] for row in DOCTOR_NODES['Disease.csv'][1])
+    assert all(list(row) == ['name'] for row in diseases.values())
+    drugs = files['relations/DISEASE_DRUG.csv']['rows']
+    assert sorted(drugs.values(), key=lambda row: row['from']) == sorted([
+        {'from': '百日咳', 'to': '阿莫西林', 'type': 'DISEASE_DRUG'},
+        {'from': '肺炎', 'to': '阿莫西林', 'type': 'DISEASE_DRUG'},
+        {'from': '感冒', 'to': '感冒灵', 'type': 'DISEASE_DRUG'},
+    ], key=lambda row: row['from'])
+
+
+def test_incremental_import_applies_changes(importer_factory, doctor_data):
+    graph = FakeGraph()
+    importer_factory(graph, batch_size=2).run_import(clear_db=True, test_encoding=False, batched=True)
+
+    # 删除百日咳、修改鼻炎的描述，并新增一条关系
+    header, rows = DOCTOR_NODES['Disease.csv']
+    rows = [('鼻炎', '慢性鼻腔炎症', '', '过敏', '') if row[0] == '鼻炎' else row for row in rows if row[0] != '百日咳']
+    write_csv(str(doctor_data / 'nodes' / 'Disease.csv'), header, rows)
+    write_csv(str(doctor_data / 'relations' / 'DISEASE_DRUG.csv'), ['from', 'to'],
+              DOCTOR_RELATIONS['DISEASE_DRUG.csv'] + [('鼻炎', '感冒灵')])
+    importer_factory(graph, batch_size=2).run_import(test_encoding=False, incremental=True)
+
+    assert sorted(graph.names('Disease')) == sorted(['感冒', '鼻炎', '肺炎'])
+    disease = next(node for node in graph.nodes['Disease'] if node['name'] == '鼻炎')
+    assert disease['desc'] == '慢性鼻腔炎症'
+    expected = {rel for rel in VALID_RELATIONS if '百日咳' not in rel} | {('DISEASE_DRUG', '鼻炎', '感冒灵')}
+    assert graph.relationships == expected
@@ -0,0 +1,78 @@
+import itertools
+from conftest import VALID_RELATIONS
+from fake_graph import FakeGraph, TransientError, deadlock
+
+
+def test_parallel_import_matches_sequential(importer_factory):
+    sequential = FakeGraph()
+    importer_factory(sequential, batch_size=2).run_import(clear_db=True, test_encoding=False, batched=True)
+    parallel = FakeGraph()
+    importer_factory(parallel, batch_size=2).run_import(clear_db=True, test_encoding=False, batched=True, workers=3)
+
+    assert parallel.relationships == sequential.relationships == VALID_RELATIONS
+
+
+def test_partitions_keep_each_source_together(importer_factory):
+    importer = importer_factory(FakeGraph(), batch_size=2)
+    tasks = importer.plan_relationship_tasks(partitions=3, partition_threshold=2)
+
+    symptom_tasks = [task for task in tasks if task['rel_type'] == 'DISEASE_SYMPTOM']
+    assert len(symptom_tasks) > 1
+    assert {task['key'] for task in symptom_tasks} <= {f'relations/DISEASE_SYMPTOM.csv#{i}' for i in range(3)}
+    sources = [{row['from'] for row in task['rows']} for task in symptom_tasks]
+    assert all(not a & b for a, b in itertools.combinations(sources, 2))
+    rows = {('DISEASE_SYMPTOM', row['from'], row['to']) for task in symptom_tasks for row in task['rows']}
+    assert rows == {rel for rel in VALID_RELATIONS if rel[0] == 'DISEASE_SYMPTOM'}
+    # 大任务优先调度
+    assert [len(task['rows']) for task in tasks] == sorted((len(task['rows']) for task in tasks), reverse=True)
+
+
+def fail_times(times, error_factory, match='DISEASE_DRUG'):
+    """前times次执行匹配的语句时抛出异常"""
+    counter = itertools.count()
+    return lambda query, rows: error_factory() if match in query and next(counter) < times else None
+
+
+def test_deadlock_is_retried(importer_factory):
+    graph = FakeGraph()
+    graph.fail = fail_times(2, deadlock)
+    importer = importer_factory(graph, batch_size=10)
+    importer.create_nodes_batched()
+    summary = importer.create_relationships_parallel(workers=2, partitions=1)
+
+    stats = next(stats for stats in summary if stats['rel_type'] == 'DISEASE_DRUG')
+    assert (stats['retries'], stats['failed'], stats['count']) == (2, 0, 3)
+    assert graph.rollbacks == 2
+    assert importer.progress.complete()
+
+
+def test_retries_are_bounded(importer_factory):
+    graph = FakeGraph()
+    graph.fail = fail_times(10, deadlock)
+    importer = importer_factory(graph, batch_size=10)
+    importer.create_nodes_batched()
+    summary = importer.create_relationships_parallel(workers=2, partitions=1, max_retries=2)
+
+    stats = next(stats for stats in summary if stats['rel_type'] == 'DISEASE_DRUG')
+    assert (stats['count'], stats['failed']) == (0, 3)
+    assert graph.rollbacks == 3
+    assert not importer.progress.complete()
+
+
+def test_other_errors_are_not_retried(importer_factory):
+    graph = FakeGraph()
+    graph.fail = fail_times(1, lambda: RuntimeError('Neo.ClientError.Statement.SyntaxError'))
+    importer = importer_factory(graph, batch_size=10)
+    importer.create_nodes_batched()
+    summary = importer.create_relationships_parallel(workers=2, partitions=1)
+
+    stats = next(stats for stats in summary if stats['rel_type'] == 'DISEASE_DRUG')
+    assert (stats['retries'], stats['failed']) == (0, 3)
+    assert graph.rollbacks == 1
+
+
+def test_is_deadlock_error(importer_factory):
+    from neo4j_import_fixed import Neo4jImporterFixed
+    assert Neo4jImporterFixed.is_deadlock_error(deadlock())
+    assert Neo4jImporterFixed.is_deadlock_error(TransientError('Neo.TransientError.General.DatabaseUnavailable'))
+    assert not Neo4jImporterFixed.is_deadlock_error(RuntimeError('Neo.ClientError.Schema.ConstraintValidationFailed'))
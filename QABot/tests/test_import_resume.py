@@ -0,0 +1,59 @@
+import json
+import pytest
+from conftest import DOCTOR_NODES, VALID_RELATIONS
+from fake_graph import FakeGraph
+
+
+def fail_symptom_batch(query, rows):
+    if 'CREATE (n:Symptom)' in query and rows[0]['name'] == '鼻塞':
+        return RuntimeError('写入失败')
+    return None
+
+
+def test_resume_continues_after_partial_failure(importer_factory, tmp_path):
+    graph = FakeGraph()
+    graph.fail = fail_symptom_batch
+    importer_factory(graph, batch_size=2).run_import(clear_db=True, test_encoding=False, batched=True)
+    assert graph.names('Symptom') == ['咳嗽', '发热']
+
+    graph.fail = None
+    importer = importer_factory(graph, batch_size=2, resume=True)
+    importer.run_import(clear_db=False, test_encoding=False, batched=True)
+
+    # 只导入剩余的批次，已提交的节点不会重复创建
+    for file in ('Disease.csv', 'Symptom.csv'):
+        names = graph.names(file[:-len('.csv')])
+        assert sorted(names) == sorted(row[0] for row in DOCTOR_NODES[file][1])
+    assert graph.relationships == VALID_RELATIONS
+    assert importer.progress.rows_resumed > 0
+    assert not (tmp_path / 'checkpoint.json').exists()
+    assert json.loads((tmp_path / 'status.json').read_text(encoding='utf-8'))['state'] == 'finished'
+
+
+def test_resume_without_checkpoint_aborts(importer_factory):
+    graph = FakeGraph()
+    importer = importer_factory(graph, resume=True)
+    with pytest.raises(Exception, match='没有可用的导入检查点'):
+        importer.run_import(clear_db=False, test_encoding=False, batched=True)
+    assert graph.commits == 0 and not graph.nodes
+
+
+def test_resume_after_finished_import_aborts(importer_factory):
+    graph = FakeGraph()
+    importer_factory(graph).run_import(clear_db=True, test_encoding=False, batched=True)
+    commits = graph.commits
+
+    with pytest.raises(Exception, match='没有可用的导入检查点'):
+        importer_factory(graph, resume=True).run_import(clear_db=False, test_encoding=False, batched=True)
+    assert graph.commits == commits
+
+
+def test_resume_with_checkpoint_of_other_database_aborts(importer_factory, tmp_path):
+    (tmp_path / 'checkpoint.json').write_text(json.dumps({
+        'database': 'other', 'streams': {'nodes/Disease.csv': {'file_hash': 'x', 'row_offset': 2, 'batch_id': 1,
+                                                               'pending': 0, 'done': False}},
+    }), encoding='utf-8')
+    graph = FakeGraph()
+    with pytest.raises(Exception, match='没有可用的导入检查点'):
+        importer_factory(graph, resume=True).run_import(clear_db=False, test_encoding=False, batched=True)
+    assert graph.commits == 0
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+from conftest import touch_generation
+from index_cache import SharedInstance
+
+
+def make_shared(tmp_path):
+    loads = []
+
+    def loader():
+        loads.append(threading.get_ident())
+        return object()
+    return SharedInstance(loader, str(tmp_path / 'generation')), loads
+
+
+def test_get_reloads_after_generation_change(tmp_path, clock):
+    shared, loads = make_shared(tmp_path)
+    first = shared.get()
+    assert shared.get() is first and len(loads) == 1
+
+    touch_generation(str(tmp_path / 'generation'))
+    # 检查间隔内不读取代际文件
+    assert shared.get() is first
+    clock.advance(5)
+    assert shared.get() is not first and len(loads) == 2
+
+
+def test_aget_loads_off_the_event_loop(tmp_path, clock):
+    shared, loads = make_shared(tmp_path)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await shared.aget()
+        touch_generation(str(tmp_path / 'generation'))
+        clock.advance(5)
+        second = await shared.aget()
+        return loop_thread, first, second, await shared.aget()
+
+    loop_thread, first, second, third = asyncio.run(run())
+    assert first is not second and third is second
+    assert len(loads) == 2 and loop_thread not in loads
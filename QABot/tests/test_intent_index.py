@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from config import GRAPH_TEMPLATE
+from intent_index import IntentIndex, mask_query, template_variants, load_intent_index
+
+
+class CharEmbeddings:
+    """按字符计数的确定性嵌入，相同文本向量相同，共享字符越多越相似"""
+
+    def __init__(self):
+        self.documents = 0
+
+    @staticmethod
+    def embed_query(text):
+        vector = np.zeros(512, dtype=np.float32)
+        for char in text:
+            vector[ord(char) % 512] += 1
+        return vector
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return [self.embed_query(text) for text in texts]
+
+
+def test_template_variants_are_masked():
+    variants = template_variants()
+    assert {key for key, _ in variants} == set(GRAPH_TEMPLATE)
+    assert ('desc', '什么叫某种疾病?') in variants
+    assert ('indications', '某种药物能治那些病？') in variants
+    assert not any('%' in text for _, text in variants)
+
+
+def test_mask_query_replaces_longer_names_first():
+    entities = {'disease': ['感冒', '病毒性感冒'], 'symptom': ['咳嗽'], 'drug': [], 'other': ['感']}
+    assert mask_query('病毒性感冒和感冒都会咳嗽吗', entities) == '某种疾病和某种疾病都会某种症状吗'
+
+
+def test_rank_and_candidates():
+    embeddings = CharEmbeddings()
+    index = IntentIndex.build(embeddings)
+    query = embeddings.embed_query(mask_query('百日咳会有哪些症状？', {'disease': ['百日咳']}))
+
+    ranked = index.rank(query, k=3)
+    assert ranked[0] == 'disease_symptom' and len(ranked) == 3
+    assert index.rank(query, candidates=['cure_way', 'desc', '不存在'], k=5) == \
+        sorted(['cure_way', 'desc'], key=lambda key: -index.scores(query)[key])
+    # 同一模板的多个问法取最高分
+    assert index.scores(query)['disease_symptom'] == pytest.approx(1.0)
+
+
+def test_index_is_persisted_and_rebuilt_on_model_change(tmp_path, monkeypatch):
+    path = str(tmp_path / 'intent_index.npz')
+    monkeypatch.setenv('BAILIAN_EMBEDDINGS_MODEL', 'model-a')
+    embeddings = CharEmbeddings()
+    built = load_intent_index(embeddings, path)
+    computed = embeddings.documents
+
+    loaded = load_intent_index(embeddings, path)
+    assert embeddings.documents == computed
+    assert loaded.keys == built.keys and np.allclose(loaded.matrix, built.matrix)
+
+    monkeypatch.setenv('BAILIAN_EMBEDDINGS_MODEL', 'model-b')
+    assert load_intent_index(embeddings, path).model == 'model-b'
+    assert embeddings.documents == 2 * computed
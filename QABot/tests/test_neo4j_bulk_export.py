@@ -0,0 +1,66 @@
+import csv
+import shlex
+import pytest
+import neo4j_bulk_export
+from conftest import DOCTOR_NODES, VALID_RELATIONS
+from neo4j_bulk_export import node_id, export_nodes, export_relationships, build_import_command
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch, doctor_data):
+    monkeypatch.setattr(neo4j_bulk_export, 'NODES_PATH', str(doctor_data / 'nodes'))
+    monkeypatch.setattr(neo4j_bulk_export, 'RELATIONS_PATH', str(doctor_data / 'relations'))
+    output_dir = tmp_path / 'import'
+    output_dir.mkdir()
+    return output_dir
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_node_id_is_stable_and_label_scoped():
+    assert node_id('Disease', '感冒') == node_id('Disease', '感冒')
+    assert node_id('Disease', '感冒') != node_id('Disease', '肺炎')
+    assert node_id('Disease', '感冒').startswith('Disease:')
+    assert node_id('Drug', '感冒').split(':')[1] == node_id('Disease', '感冒').split(':')[1]
+
+
+def test_export_nodes(export_dir):
+    label, names, stats = export_nodes('Disease', str(export_dir))
+
+    assert label == 'Disease'
+    assert names == {row[0] for row in DOCTOR_NODES['Disease.csv'][1]}
+    assert (stats['rows'], stats['written'], stats['encoding']) == (4, 4, 'gbk')
+    properties = neo4j_bulk_export.NODE_CONFIGS['Disease']['properties']
+    assert read_csv(export_dir / 'Disease_header.csv') == [['id:ID(Disease)'] + properties]
+    rows = read_csv(export_dir / 'Disease.csv')
+    assert rows[0][0] == node_id('Disease', '感冒')
+    assert rows[0][properties.index('desc') + 1] == '上呼吸道感染'
+
+
+def test_export_relationships_filters_invalid_rows(export_dir):
+    disease_names = {row[0] for row in DOCTOR_NODES['Disease.csv'][1]}
+    symptom_names = {row[0] for row in DOCTOR_NODES['Symptom.csv'][1]}
+    rel_type, stats = export_relationships('DISEASE_SYMPTOM', disease_names, symptom_names, str(export_dir))
+
+    assert rel_type == 'DISEASE_SYMPTOM'
+    assert (stats['rows'], stats['written'], stats['duplicates'], stats['empty']) == (12, 8, 1, 1)
+    assert (stats['dangling_from'], stats['dangling_to']) == (1, 1)
+    assert read_csv(export_dir / 'DISEASE_SYMPTOM_header.csv') == [[':START_ID(Disease)', ':END_ID(Symptom)']]
+    expected = {(node_id('Disease', from_name), node_id('Symptom', to_name))
+                for rel, from_name, to_name in VALID_RELATIONS if rel == 'DISEASE_SYMPTOM'}
+    rows = read_csv(export_dir / 'DISEASE_SYMPTOM.csv')
+    assert len(rows) == len(expected) and set(map(tuple, rows)) == expected
+
+
+def test_build_import_command():
+    command = build_import_command('/data/import dir', ['Disease'], ['DISEASE_SYMPTOM'], 'doctorss')
+    args = shlex.split(command)
+
+    assert args[:4] == ['neo4j-admin', 'database', 'import', 'full']
+    assert '--nodes=Disease=/data/import dir/Disease_header.csv,/data/import dir/Disease.csv' in args
+    assert ('--relationships=DISEASE_SYMPTOM=/data/import dir/DISEASE_SYMPTOM_header.csv,'
+            '/data/import dir/DISEASE_SYMPTOM.csv') in args
+    assert args[-1] == 'doctorss'
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import pytest
+
+# utils在导入时依赖LLM客户端、neo4j驱动等，缺少时跳过
+for module in ('langchain', 'neo4j', 'py2neo', 'erniebot', 'dotenv', 'requests'):
+    pytest.importorskip(module)
+
+import utils  # noqa: E402
+
+
+class FakeAsyncDriver:
+    def __init__(self):
+        self.closed_in = None
+
+    async def close(self):
+        self.closed_in = asyncio.get_running_loop()
+
+
+@pytest.fixture
+def drivers(monkeypatch):
+    created = []
+
+    def driver(*args, **kwargs):
+        created.append(FakeAsyncDriver())
+        return created[-1]
+    monkeypatch.setattr(utils.AsyncGraphDatabase, 'driver', staticmethod(driver))
+    monkeypatch.setattr(utils, '_async_neo4j_pool', None)
+    monkeypatch.setattr(utils, '_neo4j_pool', None)
+    return created
+
+
+def test_aclose_closes_async_pool_on_its_loop(drivers):
+    async def run():
+        utils.get_async_neo4j_pool()
+        await utils.aclose_neo4j_pools()
+        return asyncio.get_running_loop()
+
+    loop = asyncio.run(run())
+    assert drivers[0].closed_in is loop
+    assert utils._async_neo4j_pool is None
+
+
+def test_atexit_closes_async_pool_from_another_thread(drivers):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        async def create():
+            return utils.get_async_neo4j_pool()
+        asyncio.run_coroutine_threadsafe(create(), loop).result(5)
+        # 模拟进程退出：在主线程中关闭，仍交给创建连接池的事件循环执行
+        utils.close_neo4j_pool()
+        assert drivers[0].closed_in is loop
+        assert utils._async_neo4j_pool is None
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
@@ -0,0 +1,24 @@
+from config import GRAPH_TEMPLATE, GRAPH_RESULT_LIMIT, render_graph_template, replace_token_in_string
+
+
+def test_render_graph_template(monkeypatch):
+    monkeypatch.delenv('GRAPH_RESULT_LIMIT', raising=False)
+    rendered = render_graph_template('desc', GRAPH_TEMPLATE['desc'], {'disease': '感冒'})
+
+    assert rendered['key'] == 'desc'
+    assert rendered['question'] == '什么叫感冒? / 感冒是一种什么病？'
+    assert rendered['answer'] == '【感冒】的定义：%RES%'
+    # Cypher保持参数化，实体值只出现在params中
+    assert rendered['cypher'] == GRAPH_TEMPLATE['desc']['cypher']
+    assert rendered['params'] == {'disease': '感冒', 'limit': GRAPH_RESULT_LIMIT}
+
+
+def test_limit_overrides(monkeypatch):
+    monkeypatch.setenv('GRAPH_RESULT_LIMIT', '3')
+    assert render_graph_template('desc', GRAPH_TEMPLATE['desc'], {'disease': '感冒'})['params']['limit'] == 3
+    template = dict(GRAPH_TEMPLATE['desc'], limit=7)
+    assert render_graph_template('desc', template, {'disease': '感冒'})['params']['limit'] == 7
+
+
+def test_replace_token_in_string_accepts_pairs():
+    assert replace_token_in_string('%RES1%，%RES2%', [('RES1', '休息'), ('RES2', '感冒灵')]) == '休息，感冒灵'
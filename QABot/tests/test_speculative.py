@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+# agent在导入时依赖langchain、网页抓取和neo4j驱动等，缺少时跳过
+for module in ('langchain', 'aiohttp', 'bs4', 'neo4j', 'py2neo', 'erniebot', 'dotenv', 'requests'):
+    pytest.importorskip(module)
+
+import agent  # noqa: E402
+from agent import NO_RESULT, Agent  # noqa: E402
+
+
+class FakeRouter:
+    def __init__(self, name, scores):
+        self.name = name
+        self.score_map = scores
+
+    def route(self, query_vector):
+        return self.name, self.score_map.get(self.name, 0.0)
+
+    def scores(self, query_vector):
+        return self.score_map
+
+
+class FakeChain:
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    async def arun(self, inputs, callbacks=None):
+        self.calls.append((self.name, inputs))
+        return f'{self.name}:{inputs["query_result"]}'
+
+
+def make_agent(monkeypatch, route, scores, evidence, delays=None):
+    """构建只包含推测执行所需部分的Agent；evidence为各分支的检索结果，delays为各分支的耗时"""
+    instance = Agent.__new__(Agent)
+    instance.embeddings = None
+    instance.calls = []
+    instance.cancelled = []
+    instance.graph_chain = FakeChain('graph_func', instance.calls)
+    instance.retrival_chain = FakeChain('retrival_func', instance.calls)
+
+    async def generic(query):
+        instance.calls.append(('generic_func', query))
+        return '你好'
+    instance.tools = [SimpleNamespace(name='generic_func', coroutine=generic)]
+
+    async def evidence_or_none(name, query, use_llm_ner=False):
+        try:
+            await asyncio.sleep((delays or {}).get(name, 0))
+        except asyncio.CancelledError:
+            instance.cancelled.append(name)
+            raise
+        result = evidence.get(name)
+        return {'query': query, 'query_result': result} if result is not None else None
+    instance.evidence_or_none = evidence_or_none
+    monkeypatch.setattr(agent, 'get_tool_router', lambda embeddings, tools: FakeRouter(route, scores))
+
+    async def aembed_query(embeddings, text):
+        # 嵌入期间两路检索已经开始执行
+        await asyncio.sleep(0)
+        return [0.0]
+    monkeypatch.setattr(agent, 'aembed_query', aembed_query)
+    return instance
+
+
+def speculate(instance, query='感冒吃什么药'):
+    async def run():
+        answer = await instance.aspeculate(query)
+        # 让被取消的分支处理CancelledError
+        await asyncio.sleep(0)
+        return answer
+    return asyncio.run(run())
+
+
+def test_routed_branch_wins_and_other_branch_is_cancelled(monkeypatch):
+    instance = make_agent(monkeypatch, 'graph_func', {'graph_func': 0.9, 'retrival_func': 0.2},
+                          {'graph_func': '感冒灵', 'retrival_func': '文档'}, delays={'retrival_func': 10})
+
+    assert speculate(instance) == 'graph_func:感冒灵'
+    assert instance.calls == [('graph_func', {'query': '感冒吃什么药', 'query_result': '感冒灵'})]
+    assert instance.cancelled == ['retrival_func']
+
+
+def test_routing_to_other_tool_cancels_both_branches(monkeypatch):
+    instance = make_agent(monkeypatch, 'generic_func', {'generic_func': 0.95},
+                          {'graph_func': '感冒灵', 'retrival_func': '文档'}, delays={'graph_func': 10, 'retrival_func': 10})
+
+    assert speculate(instance, '你好') == '你好'
+    assert instance.calls == [('generic_func', '你好')]
+    assert sorted(instance.cancelled) == ['graph_func', 'retrival_func']
+
+
+def test_low_confidence_falls_back_by_score(monkeypatch):
+    # 得分更高的图谱分支没有结果，采用向量库的结果
+    instance = make_agent(monkeypatch, None, {'graph_func': 0.6, 'retrival_func': 0.5},
+                          {'graph_func': NO_RESULT, 'retrival_func': '文档'})
+
+    assert speculate(instance) == 'retrival_func:文档'
+    assert [name for name, _ in instance.calls] == ['retrival_func']
+
+
+def test_both_branches_empty_returns_none(monkeypatch):
+    instance = make_agent(monkeypatch, None, {'graph_func': 0.6, 'retrival_func': 0.5}, {'graph_func': None})
+
+    assert speculate(instance) is None
+    assert instance.calls == []
+
+
+def test_branches_are_cancelled_when_answering_fails(monkeypatch):
+    instance = make_agent(monkeypatch, 'graph_func', {'graph_func': 0.9},
+                          {'graph_func': '感冒灵', 'retrival_func': '文档'}, delays={'retrival_func': 10})
+
+    async def fail(inputs, callbacks=None):
+        raise RuntimeError('大模型调用失败')
+    instance.graph_chain.arun = fail
+
+    with pytest.raises(RuntimeError):
+        speculate(instance)
+    assert instance.cancelled == ['retrival_func']
+
+
+def test_cancelling_the_request_cancels_branches(monkeypatch):
+    instance = make_agent(monkeypatch, 'graph_func', {'graph_func': 0.9},
+                          {'graph_func': '感冒灵', 'retrival_func': '文档'}, delays={'graph_func': 10, 'retrival_func': 10})
+
+    async def run():
+        task = asyncio.create_task(instance.aspeculate('感冒吃什么药'))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert sorted(instance.cancelled) == ['graph_func', 'retrival_func']
+    assert instance.calls == []
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip('langchain')
+
+from streaming import (FINAL_ANSWER_PREFIX, AnswerStream, StreamingCallbackHandler, emit_status,  # noqa: E402
+                       reset_current_stream, set_current_stream, stream_callbacks)
+
+
+class RecordingStream:
+    def __init__(self):
+        self.events = []
+
+    def token(self, text):
+        if text:
+            self.events.append(('token', text))
+
+    def status(self, text):
+        self.events.append(('status', text))
+
+    def tokens(self):
+        return ''.join(value for kind, value in self.events if kind == 'token')
+
+
+def feed(handler, tokens):
+    handler.on_llm_start({}, [])
+    for token in tokens:
+        handler.on_llm_new_token(token)
+
+
+def test_prefix_split_across_tokens():
+    stream = RecordingStream()
+    handler = StreamingCallbackHandler(stream, FINAL_ANSWER_PREFIX)
+    feed(handler, ['Thought: 已知', '答案\nFinal', ' Ans', 'wer', ':  感冒', '多休息', '。'])
+    assert stream.tokens() == '感冒多休息。'
+
+
+def test_tokens_before_prefix_are_dropped_per_llm_call():
+    stream = RecordingStream()
+    handler = StreamingCallbackHandler(stream, FINAL_ANSWER_PREFIX)
+    # 第一步只有Action，没有最终答案
+    feed(handler, ['Thought: 查询图谱\n', 'Action: graph_func'])
+    assert stream.events == []
+    feed(handler, ['Final Answer: ', '肺炎'])
+    assert stream.tokens() == '肺炎'
+
+
+def test_started_prefix_is_reset_on_next_llm_call():
+    stream = RecordingStream()
+    handler = StreamingCallbackHandler(stream, FINAL_ANSWER_PREFIX)
+    feed(handler, ['Final Answer: 第一次'])
+    feed(handler, ['Thought: 再想想'])
+    assert stream.tokens() == '第一次'
+
+
+def test_without_prefix_every_token_is_streamed():
+    stream = RecordingStream()
+    feed(StreamingCallbackHandler(stream), ['感冒', '是', '上呼吸道感染'])
+    assert stream.tokens() == '感冒是上呼吸道感染'
+
+
+def test_agent_action_emits_status():
+    stream = RecordingStream()
+    StreamingCallbackHandler(stream).on_agent_action(SimpleNamespace(tool='graph_func'))
+    assert stream.events == [('status', '正在调用工具：graph_func')]
+
+
+def test_answer_stream_and_context():
+    async def run():
+        assert stream_callbacks() is None
+        emit_status('没有订阅方时忽略')
+        stream = AnswerStream()
+        token = set_current_stream(stream)
+        try:
+            emit_status('正在识别实体')
+            handler, = stream_callbacks(FINAL_ANSWER_PREFIX)
+            feed(handler, ['Final Answer:', ' 感冒'])
+            stream.finish('感冒')
+        finally:
+            reset_current_stream(token)
+        assert stream_callbacks() is None
+        return [event async for event in stream]
+
+    assert asyncio.run(run()) == [('status', '正在识别实体'), ('token', '感冒'), ('done', '感冒')]
+
+
+def test_answer_stream_raises_error():
+    async def run():
+        stream = AnswerStream()
+        stream.token('部分')
+        stream.fail(RuntimeError('回答失败'))
+        return [event async for event in stream]
+
+    with pytest.raises(RuntimeError, match='回答失败'):
+        asyncio.run(run())
@@ -0,0 +1,51 @@
+import math
+from array import array
+from graph_engine import GraphEngine
+from symptom_index import SymptomIndex, intersect_sorted, engine_pairs
+
+PAIRS = [('感冒', '咳嗽'), ('感冒', '发热'), ('感冒', '鼻塞'), ('鼻炎', '鼻塞'), ('鼻炎', '头痛'),
+         ('肺炎', '咳嗽'), ('肺炎', '发热'), ('百日咳', '咳嗽'), ('感冒', '咳嗽')]
+
+
+def test_intersect_sorted():
+    assert list(intersect_sorted([array('I', [1, 3, 5, 7]), array('I', [3, 7, 9]), array('I', [0, 3, 7])])) == [3, 7]
+    assert list(intersect_sorted([array('I', [1, 2]), array('I', [3, 4]), array('I', [1])])) == []
+    assert list(intersect_sorted([array('I', [2, 4])])) == [2, 4]
+    assert list(intersect_sorted([])) == []
+
+
+def test_idf_weights_rare_symptoms_higher():
+    index = SymptomIndex(PAIRS, disease_count=10)
+    idf = {name: index.idf[symptom_id] for name, symptom_id in index.symptom_ids.items()}
+
+    # 重复的关系只计一次；疾病总数取传入值和实际出现的疾病数中较大的
+    assert index.disease_count == 10
+    assert idf['咳嗽'] == math.log(1 + 10 / 3)
+    assert idf['头痛'] == math.log(1 + 10 / 1)
+    assert idf['头痛'] > idf['鼻塞'] > idf['咳嗽']
+    assert SymptomIndex(PAIRS).disease_count == 4
+
+
+def test_diagnose_ranks_full_matches_first():
+    index = SymptomIndex(PAIRS, disease_count=4)
+    results, full = index.diagnose(['咳嗽', '发热', '不存在'])
+
+    assert full == 2
+    # 同分时症状更少（更具体）的疾病排前面
+    assert [result['name'] for result in results] == ['肺炎', '感冒', '百日咳']
+    assert results[0]['matched'] == ['咳嗽', '发热']
+    assert results[0]['score'] == round(index.idf[index.symptom_ids['咳嗽']] + index.idf[index.symptom_ids['发热']], 4)
+    assert results[2]['matched'] == ['咳嗽']
+
+
+def test_diagnose_partial_and_unknown():
+    index = SymptomIndex(PAIRS)
+    results, full = index.diagnose(['头痛', '发热', '头痛'], k=1)
+    assert full == 0 and len(results) == 1
+    assert results[0]['name'] == '鼻炎'
+    assert index.diagnose(['不存在']) == ([], 0)
+
+
+def test_engine_pairs(doctor_data):
+    engine = GraphEngine().load_csv(str(doctor_data / 'nodes'), str(doctor_data / 'relations'))
+    assert set(engine_pairs(engine)) == set(PAIRS)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from tool_router import ToolRouter
+
+NAMES = ['generic_func', 'retrival_func', 'graph_func']
+
+
+def build_router(threshold=0.6, margin=0.05):
+    return ToolRouter(NAMES, np.eye(3, dtype=np.float32), 'test-model', 'digest',
+                      threshold=threshold, margin=margin)
+
+
+def test_route_to_nearest_tool():
+    name, score = build_router().route([0.0, 0.0, 2.0])
+    assert name == 'graph_func'
+    assert score == pytest.approx(1.0)
+
+
+def test_below_threshold():
+    # 与三个质心的相似度都是0.577
+    name, score = build_router().route([1.0, 1.0, 1.0])
+    assert name is None
+    assert score == pytest.approx(1 / np.sqrt(3))
+
+
+def test_margin():
+    router = build_router()
+    # 得分0.743，领先第二名0.074，超过领先幅度
+    assert router.route([1.0, 0.9, 0.0])[0] == 'generic_func'
+    # 得分0.718，领先第二名0.036，不足领先幅度
+    name, score = router.route([1.0, 0.95, 0.0])
+    assert name is None
+    assert score > router.threshold
+
+
+def test_threshold_and_margin_are_configurable():
+    # 得分0.618，领先第二名0.062
+    assert build_router().route([1.0, 0.9, 0.9])[0] == 'generic_func'
+    assert build_router(threshold=0.65).route([1.0, 0.9, 0.9])[0] is None
+    assert build_router(margin=0.0).route([1.0, 0.95, 0.0])[0] == 'generic_func'
+
+
+def test_scores():
+    scores = build_router().scores([3.0, 4.0, 0.0])
+    assert scores == pytest.approx({'generic_func': 0.6, 'retrival_func': 0.8, 'graph_func': 0.0})
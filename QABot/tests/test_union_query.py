@@ -0,0 +1,64 @@
+import pytest
+
+# utils在导入时依赖LLM客户端、neo4j驱动等，缺少时跳过
+for module in ('langchain', 'neo4j', 'py2neo', 'erniebot', 'dotenv', 'requests'):
+    pytest.importorskip(module)
+
+from utils import Neo4jPool, build_union_query, prefix_parameters  # noqa: E402
+
+DISEASE_QUERY = "MATCH (n:Disease) WHERE n.name = $disease RETURN n.desc AS RES"
+SYMPTOM_QUERY = "MATCH (n:Disease)-[:DISEASE_SYMPTOM]->(m) WHERE n.name = $disease RETURN m.name AS RES LIMIT $limit"
+
+
+def test_parameters_are_prefixed_per_branch():
+    cypher, params = build_union_query([(DISEASE_QUERY, {'disease': '感冒'}),
+                                        (SYMPTOM_QUERY, {'disease': '肺炎', 'limit': 5})])
+
+    assert params == {'t0_disease': '感冒', 't1_disease': '肺炎', 't1_limit': 5}
+    assert 'n.name = $t0_disease' in cypher
+    assert 'n.name = $t1_disease' in cypher and 'LIMIT $t1_limit' in cypher
+    assert '$disease' not in cypher
+
+
+def test_union_all_shape():
+    cypher, _ = build_union_query([(DISEASE_QUERY, {'disease': '感冒'}), (SYMPTOM_QUERY, {'disease': '感冒'})])
+    branches = cypher.split('\nUNION ALL\n')
+
+    assert len(branches) == 2
+    for idx, branch in enumerate(branches):
+        assert branch.startswith('CALL {\n')
+        assert branch.endswith(f'}}\nRETURN {idx} AS idx, {{RES: RES}} AS data')
+
+
+def test_strings_comments_and_unknown_parameters_are_kept():
+    cypher = ("MATCH (n) WHERE n.name = $name AND n.desc <> '$name' AND n.cause <> \"it's $name\" "
+              "// $name\n/* $name */ RETURN n.`$name` AS x, $other AS y")
+    assert prefix_parameters(cypher, {'name': '感冒'}, 't0_') == (
+        "MATCH (n) WHERE n.name = $t0_name AND n.desc <> '$name' AND n.cause <> \"it's $name\" "
+        "// $name\n/* $name */ RETURN n.`$name` AS x, $other AS y")
+
+
+class FakePool(Neo4jPool):
+    """不连接数据库，read按语句返回预设结果"""
+
+    def __init__(self, read):
+        self.read = read
+
+
+def test_read_many_splits_rows_by_branch():
+    pool = FakePool(lambda cypher, params: [{'idx': 1, 'data': {'RES': '咳嗽'}}, {'idx': 1, 'data': {'RES': '发热'}}])
+    assert pool.read_many([(DISEASE_QUERY, {'disease': '流感'}), (SYMPTOM_QUERY, {'disease': '感冒'})]) == [
+        [], [{'RES': '咳嗽'}, {'RES': '发热'}]]
+
+
+def test_read_many_falls_back_to_single_queries():
+    def read(cypher, params):
+        if 'UNION ALL' in cypher:
+            raise RuntimeError('合并查询失败')
+        if 'LIMIT' in cypher:
+            raise RuntimeError('单条查询失败')
+        return [{'RES': params['disease']}]
+
+    results = FakePool(read).read_many([(DISEASE_QUERY, {'disease': '感冒'}), (SYMPTOM_QUERY, {'disease': '感冒'})])
+    assert results[0] == [{'RES': '感冒'}]
+    assert isinstance(results[1], RuntimeError)
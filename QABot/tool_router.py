@@ -0,0 +1,130 @@
+# tool_router.py
+"""
+基于向量的工具路由
+每个工具的描述和标注样例（data/router_examples.json）预先做嵌入并求平均得到质心，
+按嵌入模型版本持久化；每次请求只对问题做一次嵌入，与各质心计算余弦相似度，
+得分和领先幅度都足够时直接调用对应工具，否则退回ReAct Agent
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from intent_index import normalize, embedding_model_version
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES_PATH = os.path.join(BASE_DIR, 'data', 'router_examples.json')
+INDEX_PATH = os.path.join(BASE_DIR, 'data', 'router_index.npz')
+
+# 直接路由所需的最低相似度，以及第一名相对第二名的最小领先幅度
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_MARGIN = 0.05
+
+
+def load_examples(path=EXAMPLES_PATH):
+    """读取{工具名: 样例问题列表}，文件不存在时只用工具描述"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def router_texts(tools, examples):
+    """每个工具用于计算质心的文本：工具描述 + 标注样例"""
+    return {tool.name: [tool.description] + list(examples.get(tool.name, [])) for tool in tools}
+
+
+def texts_digest(texts):
+    """描述和样例的摘要，变化后质心需要重建"""
+    return hashlib.md5(json.dumps(texts, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ToolRouter:
+    """工具质心矩阵：names[i]为第i行质心对应的工具名"""
+
+    def __init__(self, names, centroids, model, digest, threshold=DEFAULT_THRESHOLD, margin=DEFAULT_MARGIN):
+        self.names = names
+        self.centroids = centroids
+        self.model = model
+        self.digest = digest
+        self.threshold = threshold
+        self.margin = margin
+
+    @classmethod
+    def build(cls, embeddings, texts):
+        """所有文本一次批量嵌入，每个工具取归一化向量的均值再归一化"""
+        names = list(texts)
+        flat = [text for name in names for text in texts[name]]
+        vectors = normalize(np.asarray(embeddings.embed_documents(flat), dtype=np.float32))
+        centroids = []
+        offset = 0
+        for name in names:
+            count = len(texts[name])
+            centroids.append(vectors[offset:offset + count].mean(axis=0))
+            offset += count
+        return cls(names, normalize(np.stack(centroids)), embedding_model_version(), texts_digest(texts))
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, centroids=self.centroids,
+                 meta=np.array(json.dumps({'names': self.names, 'model': self.model, 'digest': self.digest},
+                                          ensure_ascii=False)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta['names'], data['centroids'], meta['model'], meta['digest'])
+
+    def scores(self, query_vector):
+        """返回{工具名: 相似度}"""
+        similarities = self.centroids @ normalize(np.asarray(query_vector, dtype=np.float32))
+        return dict(zip(self.names, similarities.tolist()))
+
+    def route(self, query_vector):
+        """返回(工具名, 得分)；置信度不足时工具名为None"""
+        scores = self.scores(query_vector)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        name, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if score < self.threshold or score - runner_up < self.margin:
+            return None, score
+        return name, score
+
+
+def load_tool_router(embeddings, tools, path=INDEX_PATH, rebuild=False):
+    """加载路由质心：嵌入模型、工具描述和样例都未变化时直接读取，否则重新计算并保存"""
+    texts = router_texts(tools, load_examples())
+    router = None
+    if not rebuild and os.path.exists(path):
+        try:
+            router = ToolRouter.load(path)
+            if router.model != embedding_model_version() or router.digest != texts_digest(texts):
+                router = None
+        except Exception as e:
+            print(f'路由质心读取失败，重新构建：{str(e)}')
+            router = None
+
+    if router is None:
+        router = ToolRouter.build(embeddings, texts)
+        router.save(path)
+    router.threshold = float(os.getenv('ROUTER_THRESHOLD', DEFAULT_THRESHOLD))
+    router.margin = float(os.getenv('ROUTER_MARGIN', DEFAULT_MARGIN))
+    return router
+
+
+_tool_router = None
+_tool_router_lock = threading.Lock()
+
+
+def get_tool_router(embeddings, tools):
+    """获取进程级共享的工具路由，首次调用时加载"""
+    global _tool_router
+    if _tool_router is None:
+        with _tool_router_lock:
+            if _tool_router is None:
+                _tool_router = load_tool_router(embeddings, tools)
+    return _tool_router
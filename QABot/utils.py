@@ -2,10 +2,16 @@
 from langchain.embeddings import DashScopeEmbeddings
 from langchain.chat_models import ChatOpenAI
 from requests import auth
-from neo4j import GraphDatabase, exceptions
+from neo4j import GraphDatabase, AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS, exceptions
 from py2neo import Graph
 from config import *
+from graph_engine import get_graph_engine, aget_graph_engine
+from graph_cache import CachedGraphBackend, get_graph_cache
 import os
+import re
+import atexit
+import asyncio
+import threading
 import erniebot
 from dotenv import load_dotenv
 import requests
@@ -36,22 +42,52 @@ class BaiduEmbeddings:
 #     embedding = BaiduEmbeddings()
 #     return embedding
 
+# 模型客户端不保存请求状态，按名称缓存后在进程内复用，避免每次调用都新建HTTP客户端
+_model_clients = {}
+_model_clients_lock = threading.Lock()
+
+
+def get_cached_client(name, factory):
+    """按名称获取缓存的客户端，不存在时用factory创建"""
+    client = _model_clients.get(name)
+    if client is None:
+        with _model_clients_lock:
+            client = _model_clients.get(name)
+            if client is None:
+                client = factory()
+                _model_clients[name] = client
+    return client
+
+
 def get_embeddings_model():
-    return DashScopeEmbeddings(
+    return get_cached_client('embeddings', lambda: DashScopeEmbeddings(
         model = os.getenv('BAILIAN_EMBEDDINGS_MODEL')
-    )
+    ))
+
+async def aembed_query(embeddings, text):
+    """异步计算问题向量；嵌入客户端没有原生异步实现时放到线程池执行，不阻塞事件循环"""
+    try:
+        return await embeddings.aembed_query(text)
+    except (AttributeError, NotImplementedError):
+        return await asyncio.to_thread(embeddings.embed_query, text)
+
 
 def get_llm_model():
     model_map = {
-        "deepseek": ChatOpenAI(
+        "deepseek": lambda: ChatOpenAI(
             model=os.getenv('DP_LLM_MODEL'),
             temperature=os.getenv('TEMPERATURE'),
             max_tokens=os.getenv('MAX_TOKENS'),
             api_key=os.getenv('DeepSeek_API_KEY'),
-            base_url=os.getenv('DeepSeek_BASE_URL')
+            base_url=os.getenv('DeepSeek_BASE_URL'),
+            # 开启流式返回，有回调订阅时逐token输出，普通调用结果不变
+            streaming=True
         )
     }
-    return model_map.get(os.getenv('LLM_MODEL'))
+    factory = model_map.get(os.getenv('LLM_MODEL'))
+    if factory is None:
+        return None
+    return get_cached_client('llm:' + os.getenv('LLM_MODEL'), factory)
 
 def structured_output_parser(response_schemas):
     text = '''
@@ -63,16 +99,6 @@ def structured_output_parser(response_schemas):
         text += schema.name + ' 字段，表示: ' + schema.description + ', 类型为: ' + schema.type + '\n'
     return text
 
-# 该函数用于将字符串中的占位符替换为实际的值
-def replace_token_in_string(string, slots):
-    # 如果 slots 是列表，转换为字典
-    if isinstance(slots, list):
-        slots = dict(slots)
-    
-    for key, value in slots.items():
-        string = string.replace('%' + key + '%', value)
-    return string
-
 
 def get_neo4j_conn():
     return Graph(
@@ -80,6 +106,288 @@ def get_neo4j_conn():
         auth = (os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))
     )
 
+class Neo4jPool:
+    """进程级共享的Neo4j连接池（官方neo4j驱动）
+
+    驱动内部维护连接池，借出连接前做存活检查；只读查询走读会话，
+    集群部署时会被路由到从节点
+    """
+
+    def __init__(self, uri, auth, database=None, max_pool_size=50, liveness_check_timeout=30.0,
+                 acquisition_timeout=30.0):
+        self.database = database
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=auth,
+            max_connection_pool_size=max_pool_size,
+            liveness_check_timeout=liveness_check_timeout,
+            connection_acquisition_timeout=acquisition_timeout
+        )
+
+    def session(self, readonly=True):
+        """借出一个会话，用with语句归还到连接池"""
+        return self.driver.session(
+            database=self.database,
+            default_access_mode=READ_ACCESS if readonly else WRITE_ACCESS
+        )
+
+    def read(self, cypher, parameters=None):
+        """在只读事务中执行查询，返回字典列表；瞬时错误由驱动自动重试"""
+        with self.session(readonly=True) as session:
+            return session.execute_read(lambda tx: tx.run(cypher, parameters or {}).data())
+
+    def read_many(self, queries):
+        """一次网络往返执行多条只读查询，返回与queries一一对应的结果列表
+
+        每条查询包装成CALL子查询并用UNION ALL拼接，各分支行数互不影响；
+        合并查询失败时逐条重试，单条失败以异常对象的形式返回，不影响其他查询
+        """
+        if not queries:
+            return []
+        batch_cypher, batch_params = build_union_query(queries)
+        try:
+            rows = self.read(batch_cypher, batch_params)
+        except Exception as e:
+            print(f'合并图谱查询失败，改为逐条执行：{str(e)}')
+            return [self.read_isolated(cypher, parameters) for cypher, parameters in queries]
+
+        results = [[] for _ in queries]
+        for row in rows:
+            results[row['idx']].append(row['data'])
+        return results
+
+    def read_isolated(self, cypher, parameters=None):
+        """执行单条查询，失败时返回异常对象而不是抛出"""
+        try:
+            return self.read(cypher, parameters)
+        except Exception as e:
+            return e
+
+    def profile(self, cypher, parameters=None):
+        """用PROFILE执行查询，返回执行计划树（含各算子的dbHits和rows）"""
+        with self.session(readonly=True) as session:
+            return session.run('PROFILE ' + cypher, parameters or {}).consume().profile
+
+    def write(self, cypher, parameters=None):
+        """在写事务中执行查询，返回字典列表"""
+        with self.session(readonly=False) as session:
+            return session.execute_write(lambda tx: tx.run(cypher, parameters or {}).data())
+
+    def verify(self):
+        """检查连接是否可用"""
+        self.driver.verify_connectivity()
+
+    def close(self):
+        """关闭驱动，释放连接池中的所有连接"""
+        self.driver.close()
+
+
+class AsyncNeo4jPool:
+    """Neo4jPool的异步版本（AsyncGraphDatabase），供asyncio请求路径使用
+
+    异步驱动的连接绑定在创建它的事件循环上，只在同一个事件循环中使用（包括关闭）
+    """
+
+    def __init__(self, uri, auth, database=None, max_pool_size=50, liveness_check_timeout=30.0,
+                 acquisition_timeout=30.0):
+        self.database = database
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+        self.driver = AsyncGraphDatabase.driver(
+            uri,
+            auth=auth,
+            max_connection_pool_size=max_pool_size,
+            liveness_check_timeout=liveness_check_timeout,
+            connection_acquisition_timeout=acquisition_timeout
+        )
+
+    def session(self, readonly=True):
+        """借出一个异步会话，用async with语句归还到连接池"""
+        return self.driver.session(
+            database=self.database,
+            default_access_mode=READ_ACCESS if readonly else WRITE_ACCESS
+        )
+
+    async def read(self, cypher, parameters=None):
+        """在只读事务中执行查询，返回字典列表；瞬时错误由驱动自动重试"""
+        async def work(tx):
+            result = await tx.run(cypher, parameters or {})
+            return await result.data()
+
+        async with self.session(readonly=True) as session:
+            return await session.execute_read(work)
+
+    async def read_many(self, queries):
+        """同Neo4jPool.read_many：一次网络往返执行多条只读查询，失败时逐条重试"""
+        if not queries:
+            return []
+        batch_cypher, batch_params = build_union_query(queries)
+        try:
+            rows = await self.read(batch_cypher, batch_params)
+        except Exception as e:
+            print(f'合并图谱查询失败，改为逐条执行：{str(e)}')
+            return list(await asyncio.gather(*(self.read_isolated(cypher, parameters) for cypher, parameters in queries)))
+
+        results = [[] for _ in queries]
+        for row in rows:
+            results[row['idx']].append(row['data'])
+        return results
+
+    async def read_isolated(self, cypher, parameters=None):
+        """执行单条查询，失败时返回异常对象而不是抛出"""
+        try:
+            return await self.read(cypher, parameters)
+        except Exception as e:
+            return e
+
+    async def close(self):
+        """关闭驱动，释放连接池中的所有连接"""
+        await self.driver.close()
+
+    def close_threadsafe(self, timeout=5.0):
+        """从其他线程（如atexit）关闭：创建连接池的事件循环仍在运行时提交到该循环，否则在新的事件循环中关闭"""
+        if self.loop is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(timeout)
+        else:
+            asyncio.run(self.close())
+
+
+# Cypher中的字符串、反引号标识符、注释和$参数；只有最后一种会被改写
+CYPHER_TOKENS = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`|//[^\n]*|/\*.*?\*/|\$(\w+)""", re.DOTALL)
+
+
+def prefix_parameters(cypher, params, prefix):
+    """给查询中的$参数加上前缀：跳过字符串、反引号标识符和注释，只改写params中存在的参数"""
+    def rename(match):
+        name = match.group(1)
+        return '$' + prefix + name if name in params else match.group(0)
+    return CYPHER_TOKENS.sub(rename, cypher)
+
+
+def cypher_return_columns(cypher):
+    """解析查询最后一个RETURN子句中的列别名"""
+    return_clause = re.split(r'\bRETURN\b', cypher, flags=re.IGNORECASE)[-1]
+    return re.findall(r'\bAS\s+(\w+)', return_clause, flags=re.IGNORECASE)
+
+
+def build_union_query(queries):
+    """把多条查询拼成一条UNION ALL查询，参数加上t{序号}_前缀避免同名冲突"""
+    branches = []
+    parameters = {}
+    for idx, (cypher, params) in enumerate(queries):
+        prefix = f't{idx}_'
+        body = prefix_parameters(cypher.strip(), params or {}, prefix)
+        columns = cypher_return_columns(cypher)
+        data = ', '.join(f'{column}: {column}' for column in columns)
+        branches.append(f'CALL {{\n{body}\n}}\nRETURN {idx} AS idx, {{{data}}} AS data')
+        for key, value in (params or {}).items():
+            parameters[prefix + key] = value
+    return '\nUNION ALL\n'.join(branches), parameters
+
+
+_neo4j_pool = None
+_neo4j_pool_lock = threading.Lock()
+
+
+def get_neo4j_pool():
+    """获取进程级共享连接池，首次调用时创建"""
+    global _neo4j_pool
+    if _neo4j_pool is None:
+        with _neo4j_pool_lock:
+            if _neo4j_pool is None:
+                _neo4j_pool = Neo4jPool(
+                    os.getenv('NEO4J_URI'),
+                    auth=(os.getenv('NEO4J_USERNAME'), os.getenv('NEO4J_PASSWORD')),
+                    database=os.getenv('NEO4J_DATABASE') or None,
+                    max_pool_size=int(os.getenv('NEO4J_POOL_SIZE', 50)),
+                    liveness_check_timeout=float(os.getenv('NEO4J_LIVENESS_CHECK_TIMEOUT', 30)),
+                    acquisition_timeout=float(os.getenv('NEO4J_ACQUISITION_TIMEOUT', 30))
+                )
+    return _neo4j_pool
+
+
+_async_neo4j_pool = None
+
+
+def get_async_neo4j_pool():
+    """获取异步连接池，首次调用时创建；配置与get_neo4j_pool相同"""
+    global _async_neo4j_pool
+    if _async_neo4j_pool is None:
+        with _neo4j_pool_lock:
+            if _async_neo4j_pool is None:
+                _async_neo4j_pool = AsyncNeo4jPool(
+                    os.getenv('NEO4J_URI'),
+                    auth=(os.getenv('NEO4J_USERNAME'), os.getenv('NEO4J_PASSWORD')),
+                    database=os.getenv('NEO4J_DATABASE') or None,
+                    max_pool_size=int(os.getenv('NEO4J_POOL_SIZE', 50)),
+                    liveness_check_timeout=float(os.getenv('NEO4J_LIVENESS_CHECK_TIMEOUT', 30)),
+                    acquisition_timeout=float(os.getenv('NEO4J_ACQUISITION_TIMEOUT', 30))
+                )
+    return _async_neo4j_pool
+
+
+class Neo4jGraphBackend:
+    """基于Neo4j连接池的图谱后端"""
+
+    def run_templates(self, templates):
+        return get_neo4j_pool().read_many([(template['cypher'], template['params']) for template in templates])
+
+    async def arun_templates(self, templates):
+        return await get_async_neo4j_pool().read_many([(template['cypher'], template['params']) for template in templates])
+
+
+def get_graph_backend():
+    """根据GRAPH_BACKEND环境变量选择图谱后端：neo4j（默认）或memory（进程内图引擎）
+
+    GRAPH_CACHE_SIZE大于0（默认）时在后端前加一层结果缓存
+    """
+    if os.getenv('GRAPH_BACKEND', 'neo4j').lower() == 'memory':
+        return with_graph_cache(get_graph_engine())
+    return with_graph_cache(Neo4jGraphBackend())
+
+
+async def aget_graph_backend():
+    """get_graph_backend的异步版本：内存图需要（重新）加载时在线程池中执行"""
+    if os.getenv('GRAPH_BACKEND', 'neo4j').lower() == 'memory':
+        return with_graph_cache(await aget_graph_engine())
+    return with_graph_cache(Neo4jGraphBackend())
+
+
+def with_graph_cache(backend):
+    """GRAPH_CACHE_SIZE大于0时在后端前加一层结果缓存"""
+    cache = get_graph_cache()
+    if cache.maxsize > 0:
+        return CachedGraphBackend(backend, cache)
+    return backend
+
+
+@atexit.register
+def close_neo4j_pool():
+    """进程退出时优雅关闭同步和异步连接池"""
+    global _neo4j_pool, _async_neo4j_pool
+    with _neo4j_pool_lock:
+        pool, _neo4j_pool = _neo4j_pool, None
+        async_pool, _async_neo4j_pool = _async_neo4j_pool, None
+    if pool is not None:
+        pool.close()
+    if async_pool is not None:
+        try:
+            async_pool.close_threadsafe()
+        except Exception as e:
+            print(f'异步连接池关闭失败：{str(e)}')
+
+
+async def aclose_neo4j_pools():
+    """在创建异步连接池的事件循环中关闭全部连接池，供应用的关闭钩子调用"""
+    global _async_neo4j_pool
+    with _neo4j_pool_lock:
+        async_pool, _async_neo4j_pool = _async_neo4j_pool, None
+    if async_pool is not None:
+        await async_pool.close()
+    close_neo4j_pool()
+
 def check_neo4j_connection():
     """
     验证Neo4j连接是否成功（基于py2neo）